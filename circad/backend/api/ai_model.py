@@ -1,27 +1,20 @@
 # circad/backend/api/ai_model.py
-import pandas as pd
+import os
 import numpy as np
 import json
 from pathlib import Path
-from sklearn.linear_model import LinearRegression
+from django.conf import settings
 
 from . import model_utils
+from . import preprocessing
+from . import storage_usage
 from .alerts import send_alert_email
 import logging
 
 logger = logging.getLogger(__name__)
 
-def compute_basic_features(df, resistance_col):
-    mean_r = float(df[resistance_col].mean())
-    std_r = float(df[resistance_col].std(ddof=0) if not pd.isna(df[resistance_col].std(ddof=0)) else 0.0)
-    min_r = float(df[resistance_col].min())
-    max_r = float(df[resistance_col].max())
-    try:
-        y = pd.to_numeric(df[resistance_col], errors="coerce").dropna().values
-        slope = float(np.polyfit(np.arange(len(y)), y, 1)[0]) if len(y) >= 2 else 0.0
-    except Exception:
-        slope = 0.0
-    return mean_r, std_r, min_r, max_r, slope
+# bump whenever a change here alters analysis output; invalidates api.result_cache
+ANALYSIS_VERSION = "3"
 
 def compute_feature_importance_from_model(pkg, features_array):
     """
@@ -45,47 +38,185 @@ def compute_feature_importance_from_model(pkg, features_array):
         logger.exception("Feature importance error: %s", e)
         return None
 
+def history_sums(history):
+    """Least-squares sums (n, Σx, Σy, Σxy, Σx²) of history against its index 0..n-1."""
+    y = np.array(history, dtype=float)
+    x = np.arange(y.size, dtype=float)
+    return (int(y.size), float(x.sum()), float(y.sum()), float(x @ y), float(x @ x))
+
+def add_to_sums(sums, value):
+    """Append one observation (at x = n) to a sums tuple."""
+    n, sum_x, sum_y, sum_xy, sum_xx = sums
+    return (n + 1, sum_x + n, sum_y + value, sum_xy + n * value, sum_xx + n * n)
+
+def forecast_from_sums(n, sum_x, sum_y, sum_xy, sum_xx):
+    """
+    Closed-form least-squares line through the history sums, extrapolated to
+    the next position (x = n). Needs at least 3 points, like forecast_mean.
+    """
+    if n < 3:
+        return None
+    denom = n * sum_xx - sum_x * sum_x
+    if denom == 0:
+        return None
+    slope = (n * sum_xy - sum_x * sum_y) / denom
+    intercept = (sum_y - slope * sum_x) / n
+    return float(intercept + slope * n)
+
 def forecast_mean(history):
+    """Linear trend over history (oldest first), extrapolated one step ahead."""
     try:
         if not history or len(history) < 3:
             return None
-        X = np.arange(len(history)).reshape(-1, 1)
-        y = np.array(history, dtype=float)
-        model = LinearRegression().fit(X, y)
-        next_val = model.predict([[len(history)]])[0]
-        return float(next_val)
+        return forecast_from_sums(*history_sums(history))
     except Exception as e:
         logger.exception("Forecast failed: %s", e)
         return None
 
-def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_confidence_threshold=0.6):
+def _streaming_threshold():
+    return getattr(settings, "CIRCAD_STREAMING_INGEST_BYTES", 32 * 1024 * 1024)
+
+def _chart_points():
+    return getattr(settings, "CIRCAD_CHART_POINTS", 300)
+
+def _phase_profile(features):
+    """PhaseProfile for a series with these summary features (threshold needs the minimum)."""
+    mean_r, std_r, min_r, max_r, slope = features
+    threshold = preprocessing.phase_threshold(min_r, mean_r, getattr(settings, "CIRCAD_ARCING_FACTOR", 2.0))
+    return preprocessing.PhaseProfile(threshold, getattr(settings, "CIRCAD_SPIKE_SIGMA", 3.0) * std_r)
+
+def _sidecar_enabled():
+    return getattr(settings, "CIRCAD_COLUMNAR_SIDECAR", True)
+
+def _stream_features(read_chunks, has_time, chart_points=300, sidecar_for=None):
     """
-    Analyze DCRM file and return structured JSON.
-      - alert_recipients: list of emails; if forecast crosses threshold, will send alert
-      - ml_confidence_threshold: only report predicted_condition if confidence >= threshold
+    Bounded-memory ingest: fold the series chunk by chunk into running statistics,
+    then make a second pass for the contact phases and the chart downsampling
+    (skipped when the whole series fit in the first chart_points samples).
+      - read_chunks: callable returning a fresh iterator of (resistance, time) chunks
+      - sidecar_for: CSV path whose columnar sidecar is written during the second pass
+    returns: (features tuple or None if no numeric data, (time, resistance) arrays, phases)
+    """
+    stats = preprocessing.RunningStats()
+    head_t, head_y = [], []
+    for y, t in read_chunks():
+        take = min(chart_points - stats.n, y.size)
+        if take > 0:
+            head_y.append(y[:take])
+            head_t.append(t[:take] if t is not None else np.arange(stats.n, stats.n + take, dtype=float))
+        stats.update(y)
+    if stats.n == 0:
+        return None, None, None
+    features = stats.features()
+    phases = _phase_profile(features)
+    if stats.n <= chart_points:
+        t, y = np.concatenate(head_t), np.concatenate(head_y)
+        phases.update(y, t if has_time else None)
+        if sidecar_for:
+            storage_usage.record_path(sidecar_for, *preprocessing.save_sidecar(sidecar_for, y, t if has_time else None))
+        return features, (t, y), phases.summary()
+
+    decimator = preprocessing.MinMaxDecimator(stats.n, chart_points)
+    writer = preprocessing.SidecarWriter(sidecar_for, stats.n, has_time) if sidecar_for else None
+    try:
+        for y, t in read_chunks():
+            decimator.update(y, t)
+            phases.update(y, t)
+            if writer:
+                writer.write(y, t)
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+    if writer:
+        storage_usage.record_path(sidecar_for, *writer.close())
+    return features, decimator.points(), phases.summary()
+
+def _extract(file_path, streaming=None, chart_points=None):
     """
+    Parse one DCRM file into its summary features and chart waveform.
+    Reads the typed columnar sidecar when one is up to date, and writes it
+    on the first analysis otherwise (see preprocessing.open_sidecar).
+    returns: (invalid-data result or None, ((mean, std, min, max, slope), data_points, phases))
+    """
+    if chart_points is None:
+        chart_points = _chart_points()
+
+    sidecar = preprocessing.open_sidecar(file_path) if _sidecar_enabled() else None
+    if sidecar is not None:
+        y_col, t_col = sidecar
+        logger.info("Loaded sidecar for: %s, samples=%d", file_path, y_col.shape[0])
+        features, chart, phases = _stream_features(
+            lambda: preprocessing.iter_array_chunks(y_col, t_col), t_col is not None, chart_points
+        )
+        return None, (features, preprocessing.to_data_points(*chart), phases)
+
     try:
-        df = pd.read_csv(file_path)
-        logger.info("Loaded file: %s, columns=%s", file_path, df.columns.tolist())
+        columns = preprocessing.read_header(file_path)
+        logger.info("Loaded file: %s, columns=%s", file_path, columns)
     except Exception as e:
         logger.exception("Failed to read CSV %s: %s", file_path, e)
-        return {"status": "Invalid data", "message": "Could not read CSV"}
+        return {"status": "Invalid data", "message": "Could not read CSV"}, None
 
-    resistance_col = next((col for col in df.columns if "resistance" in col.lower()), None)
-    time_col = next((col for col in df.columns if "time" in col.lower()), None)
+    resistance_col, time_col = preprocessing.detect_columns(columns)
 
     if resistance_col is None:
-        return {"status": "Invalid data", "message": "No 'Resistance' column found"}
+        return {"status": "Invalid data", "message": "No 'Resistance' column found"}, None
+
+    if streaming is None:
+        streaming = os.path.getsize(file_path) > _streaming_threshold()
+
+    if streaming:
+        try:
+            features, chart, phases = _stream_features(
+                lambda: preprocessing.iter_dcrm_chunks(file_path, resistance_col, time_col),
+                time_col is not None,
+                chart_points,
+                sidecar_for=file_path if _sidecar_enabled() else None,
+            )
+        except Exception as e:
+            logger.exception("Failed to read CSV %s: %s", file_path, e)
+            return {"status": "Invalid data", "message": "Could not read CSV"}, None
+        if features is None:
+            return {"status": "Invalid data", "mean_resistance": None, "message": "No numeric resistance data"}, None
+    else:
+        import pandas as pd
+        try:
+            df = pd.read_csv(file_path)
+        except Exception as e:
+            logger.exception("Failed to read CSV %s: %s", file_path, e)
+            return {"status": "Invalid data", "message": "Could not read CSV"}, None
+
+        df[resistance_col] = pd.to_numeric(df[resistance_col], errors="coerce")
+        if time_col:
+            df[time_col] = pd.to_numeric(df[time_col], errors="coerce")
 
-    df[resistance_col] = pd.to_numeric(df[resistance_col], errors="coerce")
-    if time_col:
-        df[time_col] = pd.to_numeric(df[time_col], errors="coerce")
+        df = df.dropna(subset=[resistance_col])
+        if df.empty:
+            return {"status": "Invalid data", "mean_resistance": None, "message": "No numeric resistance data"}, None
 
-    df = df.dropna(subset=[resistance_col])
-    if df.empty:
-        return {"status": "Invalid data", "mean_resistance": None, "message": "No numeric resistance data"}
+        y = df[resistance_col].to_numpy(dtype=float)
+        t = df[time_col].to_numpy(dtype=float) if time_col else None
+        features = preprocessing.compute_basic_features(y)
+        phases = _phase_profile(features).update(y, t).summary()
+        chart = preprocessing.downsample(y, t, chart_points)
+        if _sidecar_enabled():
+            storage_usage.record_path(file_path, *preprocessing.save_sidecar(file_path, y, t))
 
-    mean_r, std_r, min_r, max_r, slope = compute_basic_features(df, resistance_col)
+    # whole waveform reduced to chart_points (min/max per bucket)
+    return None, (features, preprocessing.to_data_points(*chart), phases)
+
+def _model_row(features):
+    """Order the summary features the way the classifier was trained: [mean, std, slope, min, max]."""
+    mean_r, std_r, min_r, max_r, slope = features
+    return [mean_r, std_r, slope, min_r, max_r]
+
+def _build_result(file_path, features, data_points, phases, entry, prediction, past_means, alert_recipients, ml_confidence_threshold, past_sums=None):
+    """
+    Turn extracted features + a (label, confidence) prediction into the result JSON.
+    entry: the model_utils.ModelEntry that produced the prediction (or None)
+    """
+    mean_r, std_r, min_r, max_r, slope = features
 
     # classification thresholds (same as earlier)
     if mean_r <= 55:
@@ -95,24 +226,6 @@ def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_conf
     else:
         status = "Faulty"
 
-    # gather data points for chart
-    data_points = []
-    if time_col:
-        limited_df = df[[time_col, resistance_col]].head(300)
-        for _, row in limited_df.iterrows():
-            try:
-                data_points.append({"time": float(row[time_col]), "resistance": float(row[resistance_col])})
-            except Exception:
-                continue
-    else:
-        # if no time column, use index as time
-        limited = df[resistance_col].head(300)
-        for i, val in enumerate(limited):
-            try:
-                data_points.append({"time": float(i), "resistance": float(val)})
-            except Exception:
-                continue
-
     # ML prediction & confidence (gated)
     predicted_condition = None
     predicted_confidence = None
@@ -120,19 +233,20 @@ def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_conf
     model_metadata = None
 
     try:
-        features = [mean_r, std_r, slope, min_r, max_r]
-        pkg = model_utils.load_model_package()
-        if pkg:
-            label, conf = model_utils.predict_with_confidence(features)
+        if entry:
+            label, conf = prediction
             model_metadata = {
-                "model_name": getattr(pkg.get("meta", {}), "get", lambda k, d=None: pkg.get(k, None))("name", None) if isinstance(pkg, dict) else None
+                "model_name": entry.model_name,
+                "model_version": entry.version,
+                "model_sha256": entry.sha256,
             }
             # compute feature importance if possible
-            fi = compute_feature_importance_from_model(pkg, features)
+            fi = compute_feature_importance_from_model(entry.pkg, _model_row(features))
             if fi:
                 feature_importance = {
                     "feature_names": ["mean", "std", "slope", "min", "max"],
-                    "importances": fi
+                    # rounded so chunked and in-memory ingest agree to the last digit
+                    "importances": [round(float(v), 6) for v in fi]
                 }
 
             if label is not None and conf is not None:
@@ -147,14 +261,17 @@ def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_conf
     except Exception as e:
         logger.exception("Model prediction error: %s", e)
 
-    # Forecast using past means (if provided), including this mean
+    # Forecast using past means / history sums (if provided), including this mean
     forecast_next = None
     try:
-        history = list(past_means) if past_means else []
-        if history and isinstance(history, list):
-            history = [float(v) for v in history if v is not None]
-        history.append(mean_r)
-        forecast_next = forecast_mean(history)
+        if past_sums is not None:
+            forecast_next = forecast_from_sums(*add_to_sums(past_sums, mean_r))
+        else:
+            history = list(past_means) if past_means else []
+            if history and isinstance(history, list):
+                history = [float(v) for v in history if v is not None]
+            history.append(mean_r)
+            forecast_next = forecast_mean(history)
     except Exception as e:
         logger.exception("Forecast error: %s", e)
 
@@ -165,6 +282,7 @@ def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_conf
         "min_resistance": round(float(min_r), 3),
         "max_resistance": round(float(max_r), 3),
         "slope": round(float(slope), 6),
+        "phases": phases,
         "predicted_condition": predicted_condition,
         "predicted_confidence": predicted_confidence,
         "feature_importance": feature_importance,
@@ -184,3 +302,83 @@ def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_conf
         logger.exception("Failed to send alert: %s", e)
 
     return json.loads(json.dumps(result, allow_nan=False))
+
+def analyze_dcrm(file_path: str, past_means=None, alert_recipients=None, ml_confidence_threshold=0.6, streaming=None, chart_points=None, past_sums=None):
+    """
+    Analyze DCRM file and return structured JSON.
+      - past_means / past_sums: asset history for the forecast, either as a list of
+        means or as (n, Σx, Σy, Σxy, Σx²) sums (see api.forecasting)
+      - alert_recipients: list of emails; if forecast crosses threshold, will send alert
+      - ml_confidence_threshold: only report predicted_condition if confidence >= threshold
+      - streaming: fold the CSV chunk by chunk instead of loading it whole;
+        None picks streaming for files above CIRCAD_STREAMING_INGEST_BYTES
+      - chart_points: size of the downsampled data_points waveform (default CIRCAD_CHART_POINTS)
+    """
+    invalid, extracted = _extract(file_path, streaming, chart_points)
+    if invalid is not None:
+        return invalid
+    features, data_points, phases = extracted
+
+    # one registry lookup, so the version recorded is the one that scored
+    entry = None
+    prediction = (None, None)
+    try:
+        entry = model_utils.get_model()
+        if entry:
+            prediction = model_utils.predict_with_confidence(_model_row(features), entry)
+    except Exception as e:
+        logger.exception("Model prediction error: %s", e)
+
+    return _build_result(file_path, features, data_points, phases, entry, prediction, past_means, alert_recipients, ml_confidence_threshold, past_sums)
+
+def analyze_dcrm_batch(paths, past_means_list=None, alert_recipients=None, ml_confidence_threshold=0.6, streaming=None, chart_points=None, past_sums_list=None, asset_keys=None):
+    """
+    Analyze many DCRM files with a single classifier call on the stacked
+    feature matrix. Each entry equals what analyze_dcrm returns for that file.
+      - paths: list of CSV paths
+      - past_means_list: optional list (same length as paths) of past_means per file
+      - past_sums_list: optional list of history sums per file (see analyze_dcrm)
+      - asset_keys: optional list of asset ids per file; files sharing a key
+        share one history, each folded into it in order, as if they had been
+        analyzed one after another (the first one's past_sums is used)
+    returns: list of result dicts, in the same order as paths
+    """
+    paths = list(paths)
+    if past_means_list is None:
+        past_means_list = [None] * len(paths)
+    if past_sums_list is None:
+        past_sums_list = [None] * len(paths)
+    if asset_keys is None:
+        asset_keys = [None] * len(paths)
+
+    extracted = [_extract(p, streaming, chart_points) for p in paths]
+    valid = [i for i, (invalid, _) in enumerate(extracted) if invalid is None]
+
+    entry = None
+    predictions = {}
+    try:
+        entry = model_utils.get_model()
+        if entry and valid:
+            rows = [_model_row(extracted[i][1][0]) for i in valid]
+            predictions = dict(zip(valid, model_utils.predict_batch_with_confidence(rows, entry)))
+    except Exception as e:
+        logger.exception("Model prediction error: %s", e)
+
+    results = []
+    running = {}    # asset key -> history sums including the batch's earlier files
+    for i, path in enumerate(paths):
+        invalid, data = extracted[i]
+        if invalid is not None:
+            results.append(invalid)
+            continue
+        features, data_points, phases = data
+        key = asset_keys[i]
+        past_sums = running.get(key, past_sums_list[i]) if key is not None else past_sums_list[i]
+        results.append(_build_result(
+            path, features, data_points, phases, entry, predictions.get(i, (None, None)),
+            past_means_list[i], alert_recipients, ml_confidence_threshold, past_sums,
+        ))
+        if key is not None and past_sums is not None:
+            running[key] = add_to_sums(past_sums, features[0])
+    logger.info("Batch analysis: %d files, %d valid", len(paths), len(valid))
+    return results
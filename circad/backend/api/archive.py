@@ -0,0 +1,431 @@
+# circad/backend/api/archive.py
+"""
+Monthly archive of old analyses.
+
+archive_before(cutoff) moves every AnalysisResult created before cutoff
+(rounded down to a month boundary, UTC) out of the hot table into one
+compressed columnar file per month, CIRCAD_ARCHIVE_DIR/results-YYYY-MM.npz
+(plain numpy arrays, no pickles), then deletes the rows in batches of
+CIRCAD_ARCHIVE_BATCH. A month's file is written and read back before any
+of its rows is deleted, and archiving a month again merges into its file,
+so an interrupted run is finished by running it again. manifest.json holds
+each month's row count, id range and the files it has rows of.
+
+rows() reads the months overlapping a created_at range in the hot table's
+(created_at, id) order, with the same keyset bounds, so list_results and
+generate_csv_report merge both sources when a date range reaches back into
+the archive (covers()). find() serves result_detail for an archived id;
+drop_file() removes a deleted file's rows.
+Breaker measurements stay in the database with their analysis link
+cleared, so breaker trends and forecasts keep the whole history.
+"""
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import fleet_stats, forecasting
+from .models import RESULT_COLUMNS, AnalysisResult, AnalysisWaveform, BreakerMeasurement
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+FLOAT_COLUMNS = ("mean_resistance", "std_dev", "min_resistance", "max_resistance", "forecast_next_mean")
+TEXT_COLUMNS = ("file_name", "status", "model_version")
+# variable-length columns: values concatenated, with a per-row length column
+SEGMENTS = (("json", "json_len"), ("wave_time", "wave_n"), ("wave_res", "wave_n"))
+
+
+def archive_dir():
+    return Path(getattr(settings, "CIRCAD_ARCHIVE_DIR", settings.BASE_DIR / "data" / "archive"))
+
+
+def _batch_size():
+    return int(getattr(settings, "CIRCAD_ARCHIVE_BATCH", 2000))
+
+
+def _us(dt):
+    return (dt - EPOCH) // timedelta(microseconds=1)
+
+
+def _dt(us):
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+def month_start(dt):
+    return dt.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(start):
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def default_cutoff(now=None):
+    """returns: the start of the month CIRCAD_ARCHIVE_AFTER_DAYS ago; older results are archived"""
+    days = int(getattr(settings, "CIRCAD_ARCHIVE_AFTER_DAYS", 365))
+    return month_start((now or timezone.now()) - timedelta(days=days))
+
+
+def _path(key):
+    return archive_dir() / f"results-{key}.npz"
+
+
+# === manifest ===
+def manifest():
+    """returns: {"YYYY-MM": {"rows", "first_id", "last_id", "bytes", "files"}, ...}"""
+    try:
+        with open(archive_dir() / "manifest.json") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_manifest(data):
+    path = archive_dir() / "manifest.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(data, fh, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def count():
+    return sum(m["rows"] for m in manifest().values())
+
+
+def _months(start=None, end=None):
+    """Archived month keys overlapping [start, end], oldest first."""
+    keys = []
+    for key in sorted(manifest()):
+        first = datetime.strptime(key, "%Y-%m").replace(tzinfo=dt_timezone.utc)
+        if (end is None or first <= end) and (start is None or _next_month(first) > start):
+            keys.append(key)
+    return keys
+
+
+def covers(start, end=None):
+    """
+    Whether a created_at range reaches archived months. A missing start means
+    from the first archived month; no bounds at all means no range (hot only).
+    """
+    return (start is not None or end is not None) and bool(_months(start, end))
+
+
+# === reading ===
+@lru_cache(maxsize=8)
+def _load(path, mtime_ns):
+    with np.load(path, allow_pickle=False) as z:
+        return {name: z[name] for name in z.files}
+
+
+def load(key):
+    """returns: the month's columns (cached until the file changes)"""
+    path = _path(key)
+    return _load(str(path), path.stat().st_mtime_ns)
+
+
+def _offsets(lengths):
+    return np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+
+def _row(cols, i, json_off, wave_off):
+    def num(name):
+        v = cols[name][i]
+        return None if np.isnan(v) else float(v)
+
+    row = {
+        "id": int(cols["id"][i]),
+        "dcrm_file_id": int(cols["dcrm_file_id"][i]),
+        "file": str(cols["file_name"][i]),
+        "created_at": _dt(cols["created_us"][i]),
+        "status": str(cols["status"][i]) or None,
+        "model_version": str(cols["model_version"][i]) or None,
+        "result_json": json.loads(cols["json"][json_off[i]:json_off[i + 1]].tobytes()),
+        "_wave": (cols, wave_off[i], wave_off[i + 1], bool(cols["wave_has_time"][i])),
+    }
+    for name in FLOAT_COLUMNS:
+        row[name] = num(name)
+    return row
+
+
+def data_points(row):
+    """The archived waveform of a rows() row, as AnalysisResult.data_points() returns it."""
+    cols, a, b, has_time = row["_wave"]
+    res = [float(str(v)) for v in cols["wave_res"][a:b]]
+    t = [float(str(v)) for v in cols["wave_time"][a:b]] if has_time else [None] * len(res)
+    return [{"time": ti, "resistance": ri} for ti, ri in zip(t, res)]
+
+
+def rows(start=None, end=None, status=None, ids=None, newest_first=False, before=None, after=None, limit=None):
+    """
+    Archived rows with created_at in [start, end], in (created_at, id) order.
+      - status / ids: like the hot table filters
+      - before / after: (created_at, id) keyset bounds, exclusive
+    yields: dicts with the AnalysisResult fields, plus "file"
+    """
+    keys = _months(start or (after[0] if after else None), end or (before[0] if before else None))
+    if newest_first:
+        keys.reverse()
+    left = limit
+    for key in keys:
+        cols = load(key)
+        created, pk = cols["created_us"], cols["id"]
+        mask = np.ones(pk.shape[0], dtype=bool)
+        if start is not None:
+            mask &= created >= _us(start)
+        if end is not None:
+            mask &= created <= _us(end)
+        if status:
+            mask &= cols["status"] == status
+        if ids is not None:
+            mask &= np.isin(pk, np.asarray(list(ids), dtype=np.int64))
+        if before is not None:
+            c, i = _us(before[0]), before[1]
+            mask &= (created < c) | ((created == c) & (pk < i))
+        if after is not None:
+            c, i = _us(after[0]), after[1]
+            mask &= (created > c) | ((created == c) & (pk > i))
+        index = np.flatnonzero(mask)
+        if newest_first:
+            index = index[::-1]
+        if left is not None:
+            index = index[:left]
+            left -= index.size
+        json_off, wave_off = _offsets(cols["json_len"]), _offsets(cols["wave_n"])
+        for i in index.tolist():
+            yield _row(cols, i, json_off, wave_off)
+        if left is not None and left <= 0:
+            return
+
+
+def instance(row):
+    """An unsaved AnalysisResult for a rows() row (serializers)."""
+    return AnalysisResult(
+        id=row["id"], dcrm_file_id=row["dcrm_file_id"], result_json=row["result_json"], created_at=row["created_at"],
+        **{name: row[name] for name in RESULT_COLUMNS},
+    )
+
+
+def find(analysis_id):
+    """returns: the archived row for an id, or None"""
+    for key, month in manifest().items():
+        if month["first_id"] <= analysis_id <= month["last_id"]:
+            cols = load(key)
+            hit = np.flatnonzero(cols["id"] == analysis_id)
+            if hit.size:
+                return _row(cols, int(hit[0]), _offsets(cols["json_len"]), _offsets(cols["wave_n"]))
+    return None
+
+
+# === writing ===
+def _columns(ids, using):
+    """Columns for the given hot rows (in ids order)."""
+    values = {
+        r[0]: r for r in AnalysisResult.objects.using(using).filter(id__in=ids).values_list(
+            "id", "dcrm_file_id", "dcrm_file__file", "created_at", "result_json", *RESULT_COLUMNS,
+            "dcrm_file__original_name",
+        )
+    }
+    waves = {
+        w[0]: w for w in AnalysisWaveform.objects.using(using).filter(analysis_id__in=ids).values_list(
+            "analysis_id", "n_points", "time", "resistance",
+        )
+    }
+    records = [values[i] for i in ids if i in values]
+    names = ("id", "dcrm_file_id", "file_name", "created_at", "result_json") + RESULT_COLUMNS + ("original_name",)
+    by_name = {name: [r[k] for r in records] for k, name in enumerate(names)}
+    # the name it was uploaded under; blobs are named by their digest
+    by_name["file_name"] = [o or f for f, o in zip(by_name["file_name"], by_name["original_name"])]
+
+    blobs = [json.dumps(r, separators=(",", ":")).encode() for r in by_name["result_json"]]
+    wave_n, wave_time, wave_res, has_time = [], [], [], []
+    for pk in by_name["id"]:
+        _, n, t, res = waves.get(pk, (pk, 0, None, b""))
+        res = np.frombuffer(bytes(res), dtype=AnalysisWaveform.DTYPE)
+        wave_n.append(res.size)
+        wave_res.append(res)
+        has_time.append(t is not None)
+        wave_time.append(np.frombuffer(bytes(t), dtype=AnalysisWaveform.DTYPE) if t is not None else np.full(res.size, np.nan, dtype=AnalysisWaveform.DTYPE))
+
+    cols = {
+        "id": np.array(by_name["id"], dtype=np.int64),
+        "dcrm_file_id": np.array(by_name["dcrm_file_id"], dtype=np.int64),
+        "created_us": np.array([_us(dt) for dt in by_name["created_at"]], dtype=np.int64),
+        "json": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "json_len": np.array([len(b) for b in blobs], dtype=np.int64),
+        "wave_n": np.array(wave_n, dtype=np.int64),
+        "wave_has_time": np.array(has_time, dtype=bool),
+        "wave_time": np.concatenate(wave_time) if wave_time else np.zeros(0, AnalysisWaveform.DTYPE),
+        "wave_res": np.concatenate(wave_res) if wave_res else np.zeros(0, AnalysisWaveform.DTYPE),
+    }
+    for name in FLOAT_COLUMNS:
+        cols[name] = np.array([np.nan if v is None else v for v in by_name[name]], dtype=np.float64)
+    for name in TEXT_COLUMNS:
+        cols[name] = np.array([v or "" for v in by_name[name]], dtype=str)
+    return cols
+
+
+def _concat(parts):
+    return {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+
+def _take(cols, index):
+    """Rows `index` of cols, segments included."""
+    out = {name: cols[name][index] for name in cols if name not in {seg for seg, _ in SEGMENTS}}
+    for seg, length in SEGMENTS:
+        off = _offsets(cols[length])
+        out[seg] = np.concatenate([cols[seg][off[i]:off[i + 1]] for i in index.tolist()] or [cols[seg][:0]])
+    return out
+
+
+def _write_month(key, cols):
+    """Merge cols into the month's file (rows of the same id are replaced). returns: file size"""
+    path = _path(key)
+    if path.exists():
+        old = load(key)
+        keep = np.flatnonzero(~np.isin(old["id"], cols["id"]))
+        cols = _concat([_take(old, keep), cols])
+    order = np.lexsort((cols["id"], cols["created_us"]))
+    if not np.array_equal(order, np.arange(order.size)):
+        cols = _take(cols, order)
+    return _save_month(key, cols)
+
+
+def _save_month(key, cols):
+    """Replace the month's file with cols (sorted) and record it in the manifest. returns: file size"""
+    path = _path(key)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.savez_compressed(fh, **cols)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+    # read it back before anything is deleted from the hot table
+    written = load(key)
+    if not np.array_equal(written["id"], cols["id"]):
+        raise RuntimeError(f"archive {path.name} did not read back intact")
+    data = manifest()
+    data[key] = {
+        "rows": int(cols["id"].size),
+        "first_id": int(cols["id"].min()),
+        "last_id": int(cols["id"].max()),
+        "bytes": path.stat().st_size,
+        # so drop_file only opens the months holding a file's rows
+        "files": np.unique(cols["dcrm_file_id"]).tolist(),
+    }
+    _save_manifest(data)
+    return data[key]["bytes"]
+
+
+def _delete(ids, using):
+    """Remove archived rows from the hot table in one transaction, without per-row signals."""
+    with transaction.atomic(using=using):
+        gone = list(AnalysisResult.objects.using(using).filter(id__in=ids).only("id", "dcrm_file_id", "status", "mean_resistance"))
+        BreakerMeasurement.objects.using(using).filter(analysis_id__in=ids).update(analysis=None)
+        AnalysisWaveform.objects.using(using).filter(analysis_id__in=ids).delete()
+        # a plain DELETE: the fleet counters and forecast state are adjusted once per batch below
+        from .resets import delete_rows
+        delete_rows(AnalysisResult, "id", ids, using)
+        fleet_stats.remove_results(gone, using)
+        forecasting.invalidate_files({r.dcrm_file_id for r in gone}, using)
+    return len(gone)
+
+
+@contextmanager
+def _exclusive(wait=False):
+    archive_dir().mkdir(parents=True, exist_ok=True)
+    with open(archive_dir() / ".lock", "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("another archive run is in progress")
+        yield
+
+
+def archive_before(cutoff=None, using="default", batch_size=None, dry_run=False, progress=None):
+    """
+    Archive every result created before the month boundary at or below cutoff.
+      - cutoff: default default_cutoff()
+      - progress: callable(month key, rows) after each month
+    returns: [(month key, rows, archive bytes), ...]
+    """
+    cutoff = month_start(cutoff or default_cutoff())
+    batch_size = batch_size or _batch_size()
+    old = AnalysisResult.objects.using(using).filter(created_at__lt=cutoff)
+    first = old.order_by("created_at").values_list("created_at", flat=True).first()
+    done = []
+    if first is None:
+        return done
+    with _exclusive():
+        month = month_start(first)
+        while month < cutoff:
+            nxt = _next_month(month)
+            key = f"{month:%Y-%m}"
+            ids = list(old.filter(created_at__gte=month, created_at__lt=nxt).order_by("created_at", "id").values_list("id", flat=True))
+            month = nxt
+            if not ids:
+                continue
+            if dry_run:
+                done.append((key, len(ids), 0))
+                continue
+            batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+            size = _write_month(key, _concat([_columns(batch, using) for batch in batches]))
+            for batch in batches:
+                _delete(batch, using)
+            logger.info("Archived %d results of %s (%d bytes)", len(ids), key, size)
+            done.append((key, len(ids), size))
+            if progress:
+                progress(key, len(ids))
+    return done
+
+
+def drop_file(dcrm_file_id):
+    """
+    Remove a deleted file's analyses from the archive (delete_file), waiting
+    for a running archive job. Only the months listing the file in the
+    manifest are loaded (all of them for a manifest written without "files").
+    returns: rows removed
+    """
+    if not manifest():
+        return 0
+    removed = 0
+    with _exclusive(wait=True):
+        for key, month in sorted(manifest().items()):
+            if "files" in month and dcrm_file_id not in month["files"]:
+                continue
+            cols = load(key)
+            gone = cols["dcrm_file_id"] == dcrm_file_id
+            if not gone.any():
+                continue
+            removed += int(gone.sum())
+            keep = np.flatnonzero(~gone)
+            if keep.size:
+                _save_month(key, _take(cols, keep))
+            else:
+                data = manifest()
+                data.pop(key, None)
+                _save_manifest(data)
+                _path(key).unlink()
+    if removed:
+        logger.info("Removed %d archived results of file %s", removed, dcrm_file_id)
+    return removed
+
+
+def clear():
+    """Delete every archive file (full resets)."""
+    folder = archive_dir()
+    if not folder.exists():
+        return
+    for path in folder.glob("results-*.npz"):
+        path.unlink()
+    (folder / "manifest.json").unlink(missing_ok=True)
+    _load.cache_clear()
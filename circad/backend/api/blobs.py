@@ -0,0 +1,125 @@
+# circad/backend/api/blobs.py
+"""
+Content-addressed storage of uploaded CSVs.
+
+Every upload path (upload_dcrm, chunked uploads, bulk archives) hashes the
+bytes while they stream to a temp file under uploads/blobs/tmp and then
+adopts it as uploads/blobs/<2 hex>/<sha256>.csv. When those bytes were
+uploaded before, the blob is already there: the temp copy is dropped and
+the new DCRMFile points at the existing blob (and at its analysis sidecar).
+DCRMFile.original_name keeps the name the file was uploaded under.
+
+A blob's reference count is the number of DCRMFile rows pointing at it;
+release() removes it from disk only with the last one. Adopting a blob and
+committing the row that points at it happen under claim(), which release()
+takes too, so a blob is never removed between the two.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from django.core.files.storage import default_storage
+
+from . import storage_usage
+from .models import DCRMFile
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "uploads/blobs"
+
+
+def blob_name(digest):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}.csv"
+
+
+def temp_file():
+    """An open temp file inside MEDIA_ROOT (so adopting it is a rename), for callers that hash as they write."""
+    folder = default_storage.path(f"{BLOB_DIR}/tmp")
+    os.makedirs(folder, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=folder, suffix=".part", delete=False)
+
+
+@contextmanager
+def claim(digests):
+    """
+    Lock the blobs of these digests against release() while they are adopted
+    and the DCRMFile rows pointing at them are committed. The lock is the
+    blob's <2 hex> directory; they are taken in order, so claims never deadlock.
+    """
+    with ExitStack() as stack:
+        for prefix in sorted({digest[:2] for digest in digests}):
+            folder = default_storage.path(f"{BLOB_DIR}/{prefix}")
+            os.makedirs(folder, exist_ok=True)
+            fd = os.open(folder, os.O_RDONLY)
+            stack.callback(os.close, fd)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+
+
+def adopt(path, digest, keep=False):
+    """
+    Make the file at path the blob for digest, or drop it when that blob
+    exists. Call it under claim(digest) and create the DCRMFile there too.
+      - keep: leave the file at path in place (the caller removes it once its row is committed)
+    returns: (storage name, created)
+    """
+    name = blob_name(digest)
+    target = default_storage.path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    size = os.path.getsize(path)
+    try:
+        # link() fails if the blob exists, so two concurrent uploads of the same bytes cannot both count it
+        os.link(path, target)
+        created = True
+    except FileExistsError:
+        created = False
+    if not keep:
+        os.remove(path)
+    if created:
+        storage_usage.record_path(target, size, 1)
+    return name, created
+
+
+def discard(name):
+    """Undo an adopt() that created the blob when its DCRMFile was not committed (still under claim())."""
+    storage_usage.remove_upload(default_storage.path(name))
+
+
+def spool(chunks):
+    """
+    Write an upload (UploadedFile.chunks()) to a temp file, hashing it on the way.
+    returns: (temp path, hex sha256); adopt() it under claim()
+    """
+    h = hashlib.sha256()
+    with temp_file() as out:
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                h.update(chunk)
+        except BaseException:
+            out.close()
+            os.remove(out.name)
+            raise
+    return out.name, h.hexdigest()
+
+
+def references(name, digest, using="default"):
+    """returns: how many DCRMFiles point at this file (the sha256 index narrows the lookup)"""
+    return DCRMFile.objects.using(using).filter(sha256=digest, file=name).count()
+
+
+def release(name, digest, using="default"):
+    """
+    Remove a file (and its sidecar) once no DCRMFile points at it. Call it
+    after deleting a DCRMFile row.
+    returns: bytes freed
+    """
+    if not name:
+        return 0
+    with claim([digest] if digest else []):
+        if references(name, digest, using):
+            return 0
+        return storage_usage.remove_upload(default_storage.path(name), using)
@@ -0,0 +1,126 @@
+# circad/backend/api/breakers.py
+"""
+Breaker assets and their test history.
+
+An upload names its breaker by asset id (resolve). Every AnalysisResult of
+a linked file adds one BreakerMeasurement row (api.signals; bulk_create
+calls add_measurements), so a breaker's history spans all of its uploads
+and is read with an index range scan on (breaker, tested_at).
+"""
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import forecasting
+from .models import Breaker, BreakerMeasurement, DCRMFile
+
+ASSET_ID_MAX_LENGTH = Breaker._meta.get_field("asset_id").max_length
+
+
+def resolve(asset_id, using="default"):
+    """
+    returns: the Breaker for asset_id (created on first use), or None if asset_id is blank
+    raises: ValueError if asset_id is too long
+    """
+    asset_id = (asset_id or "").strip()
+    if not asset_id:
+        return None
+    if len(asset_id) > ASSET_ID_MAX_LENGTH:
+        raise ValueError(f"asset_id longer than {ASSET_ID_MAX_LENGTH} characters")
+    breaker, _ = Breaker.objects.using(using).get_or_create(asset_id=asset_id)
+    return breaker
+
+
+def parse_when(value, name="tested_at", end=False):
+    """
+    value: ISO date or datetime string (naive values are in TIME_ZONE), or blank
+    end: a bare date means the end of that day (inclusive upper bounds)
+    returns: an aware datetime, or None if value is blank
+    raises: ValueError if value is not a date
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    # a bare date first: parse_datetime also accepts one, as midnight
+    day = parse_date(value)
+    parsed = datetime.combine(day, time.max if end else time.min) if day else parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO date or datetime")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _measurement(result, breaker_id, tested_at):
+    slope = result.result_json.get("slope") if isinstance(result.result_json, dict) else None
+    return BreakerMeasurement(
+        breaker_id=breaker_id,
+        analysis_id=result.id,
+        dcrm_file_id=result.dcrm_file_id,
+        tested_at=tested_at,
+        status=result.status,
+        mean_resistance=result.mean_resistance,
+        std_dev=result.std_dev,
+        min_resistance=result.min_resistance,
+        max_resistance=result.max_resistance,
+        slope=float(slope) if isinstance(slope, (int, float)) and not isinstance(slope, bool) else None,
+    )
+
+
+def record_analysis(result, using="default"):
+    """Add the measurement for a newly created result (post_save) if its file is linked to a breaker."""
+    dcrm = result.dcrm_file
+    if dcrm.breaker_id is None:
+        return None
+    measurement = _measurement(result, dcrm.breaker_id, dcrm.tested_at or dcrm.uploaded_at)
+    measurement.save(using=using)
+    return measurement
+
+
+def add_measurements(results, using="default"):
+    """
+    Measurements for results created with bulk_create (no signals): one
+    bulk insert, and the affected breakers' forecast state is rebuilt lazily.
+    returns: ids of the breakers touched
+    """
+    if not results:
+        return set()
+    files = (
+        DCRMFile.objects.using(using)
+        .filter(id__in={r.dcrm_file_id for r in results}, breaker__isnull=False)
+        .only("id", "breaker_id", "tested_at", "uploaded_at")
+        .in_bulk()
+    )
+    rows = []
+    for r in results:
+        dcrm = files.get(r.dcrm_file_id)
+        if dcrm is not None:
+            rows.append(_measurement(r, dcrm.breaker_id, dcrm.tested_at or dcrm.uploaded_at))
+    breaker_ids = {m.breaker_id for m in rows}
+    with transaction.atomic(using=using):
+        BreakerMeasurement.objects.using(using).bulk_create(rows)
+        for breaker_id in breaker_ids:
+            forecasting.invalidate_breaker(breaker_id, using=using)
+    return breaker_ids
+
+
+def trend(breaker, start=None, end=None, limit=500):
+    """
+    A breaker's measurements in [start, end], oldest first; the newest
+    `limit` of them when the range holds more (one index range scan).
+    returns: list of dicts
+    """
+    qs = BreakerMeasurement.objects.filter(breaker=breaker)
+    if start is not None:
+        qs = qs.filter(tested_at__gte=start)
+    if end is not None:
+        qs = qs.filter(tested_at__lte=end)
+    rows = list(
+        qs.order_by("-tested_at", "-id").values(
+            "tested_at", "analysis_id", "status",
+            "mean_resistance", "std_dev", "min_resistance", "max_resistance", "slope",
+        )[:limit]
+    )
+    rows.reverse()
+    return rows
+
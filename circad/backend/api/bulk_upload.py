@@ -0,0 +1,208 @@
+# circad/backend/api/bulk_upload.py
+"""
+Bulk upload of a zip or tar of DCRM CSVs.
+
+ingest() reads the archive entry by entry: zip members through
+ZipFile.open, tar (plain or compressed) as a forward-only stream. Each
+CSV is copied into its content-addressed blob (api.blobs) in blocks
+while its SHA-256 is computed, so neither the archive nor a member is
+ever held in memory (the upload itself spools to a temp file above
+FILE_UPLOAD_MAX_MEMORY_SIZE). The DCRMFile rows are created with one
+bulk_create, tied to an UploadBatch.
+
+dispatch() queues the analysis as one Celery group of
+analyze_files_batch_task, CIRCAD_BULK_UPLOAD_TASK_FILES files per task,
+so the batch spreads over every worker and each task still makes one
+batched model call (bytes analyzed before come from api.result_cache).
+describe() is the batch's aggregate progress.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import tarfile
+import zipfile
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+
+from . import blobs
+from .models import DCRMFile, UploadBatch
+
+logger = logging.getLogger(__name__)
+
+COPY_BLOCK = 1024 * 1024
+# a broken or truncated archive surfaces as any of these while reading; zipfile
+# raises RuntimeError for encrypted members and NotImplementedError for
+# compression methods it does not support
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError, RuntimeError, NotImplementedError)
+
+
+def _max_files():
+    return int(getattr(settings, "CIRCAD_BULK_UPLOAD_MAX_FILES", 1000))
+
+
+def _max_bytes():
+    return int(getattr(settings, "CIRCAD_BULK_UPLOAD_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+
+
+def _max_file_bytes():
+    return int(getattr(settings, "CIRCAD_MAX_UPLOAD_BYTES", 5 * 1024 * 1024))
+
+
+def _task_files():
+    return max(1, int(getattr(settings, "CIRCAD_BULK_UPLOAD_TASK_FILES", 16)))
+
+
+def _entries(fileobj):
+    """
+    yields: (name, readable) for every regular member of a zip or tar archive
+    raises: ValueError if fileobj is neither
+    """
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as fh:
+                        yield info.filename, fh
+        return
+    fileobj.seek(0)
+    try:
+        tf = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise ValueError("Upload a .zip or .tar(.gz/.bz2/.xz) archive of CSV files")
+    with tf:
+        for member in tf:
+            if member.isfile():
+                yield member.name, tf.extractfile(member)
+
+
+def _is_csv(name):
+    base = os.path.basename(name)
+    # skip macOS resource forks and hidden files along with non-CSVs
+    return base.lower().endswith(".csv") and not base.startswith(".") and "__MACOSX/" not in name
+
+
+def _spool(name, fh, limit, budget):
+    """
+    Copy an archive member to a temp file for its content-addressed blob (api.blobs).
+      - limit: the per-file limit (CIRCAD_MAX_UPLOAD_BYTES)
+      - budget: what is left of the archive's total (CIRCAD_BULK_UPLOAD_MAX_BYTES)
+    returns: (temp path, bytes, hex sha256)
+    raises: ValueError if the member is larger than either
+    """
+    h, size = hashlib.sha256(), 0
+    with blobs.temp_file() as out:
+        try:
+            for block in iter(lambda: fh.read(COPY_BLOCK), b""):
+                size += len(block)
+                if size > limit:
+                    raise ValueError(f"{name}: over the upload size limit ({limit // (1024 * 1024)} MB per file)")
+                if size > budget:
+                    raise ValueError(
+                        f"{name}: the archive's CSV files are over the bulk upload limit "
+                        f"({_max_bytes() // (1024 * 1024)} MB per archive)"
+                    )
+                out.write(block)
+                h.update(block)
+        except BaseException:
+            out.close()
+            os.remove(out.name)
+            raise
+    return out.name, size, h.hexdigest()
+
+
+def ingest(fileobj, archive_name, breaker=None, tested_at=None):
+    """
+    Store every CSV in the archive and create their DCRMFiles in one batch.
+      - breaker / tested_at: set on every file, as upload_dcrm does for one
+    returns: the UploadBatch (its files are batch.files)
+    raises: ValueError for an unreadable archive, one without CSVs or over the limits
+            (CIRCAD_MAX_UPLOAD_BYTES per file, CIRCAD_BULK_UPLOAD_MAX_BYTES / _MAX_FILES
+            per archive); nothing is kept in that case
+    """
+    spooled, originals, skipped, total = [], [], [], 0
+    adopted = []
+    max_files, max_bytes, max_file = _max_files(), _max_bytes(), _max_file_bytes()
+    try:
+        try:
+            for name, fh in _entries(fileobj):
+                if not _is_csv(name):
+                    skipped.append(name)
+                    continue
+                if len(spooled) >= max_files:
+                    raise ValueError(f"Too many CSV files (max {max_files} per archive)")
+                entry = _spool(name, fh, max_file, max_bytes - total)
+                spooled.append(entry)
+                originals.append(os.path.basename(name))
+                total += entry[1]
+        except ARCHIVE_ERRORS as e:
+            raise ValueError(f"Unreadable archive: {e}")
+        if not spooled:
+            raise ValueError("No CSV files in the archive")
+        with blobs.claim({digest for _, _, digest in spooled}), transaction.atomic():
+            for path, _, digest in spooled:
+                adopted.append((blobs.adopt(path, digest)[0], digest))
+            batch = UploadBatch.objects.create(archive_name=archive_name[:255], total=len(spooled), skipped=skipped[:1000])
+            DCRMFile.objects.bulk_create([
+                DCRMFile(
+                    file=name, sha256=digest, original_name=original[:255],
+                    breaker=breaker, tested_at=tested_at, batch=batch,
+                )
+                for (name, digest), original in zip(adopted, originals)
+            ])
+    except BaseException:
+        for path, _, _ in spooled:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        # blobs this archive added and nothing else points at
+        for name, digest in adopted:
+            blobs.release(name, digest)
+        raise
+    logger.info("Bulk upload %s: %d files (%d bytes) from %s", batch.id, len(spooled), total, archive_name)
+    return batch
+
+
+def dispatch(batch, force=False):
+    """
+    Queue the batch's analysis as one Celery group.
+    returns: the group id
+    """
+    from celery import group
+    from .tasks import analyze_files_batch_task
+
+    ids = list(batch.files.order_by("id").values_list("id", flat=True))
+    size = _task_files()
+    result = group(
+        analyze_files_batch_task.s(ids[i:i + size], force=force, batch_id=batch.id)
+        for i in range(0, len(ids), size)
+    ).apply_async()
+    UploadBatch.objects.filter(id=batch.id).update(group_id=result.id or "")
+    batch.group_id = result.id or ""
+    return batch.group_id
+
+
+def describe(batch):
+    """The batch's aggregate progress (the status endpoint)."""
+    analyzed = batch.files.filter(results__isnull=False).distinct().count()
+    finished = min(batch.total, analyzed + batch.failed)
+    if finished < batch.total:
+        state = "running" if finished else "queued"
+    else:
+        state = "failed" if batch.failed == batch.total else "done"
+    return {
+        "batch_id": batch.id,
+        "archive_name": batch.archive_name,
+        "status": state,
+        "total": batch.total,
+        "analyzed": analyzed,
+        "failed": batch.failed,
+        "pending": batch.total - finished,
+        "progress": round(100 * finished / batch.total, 1) if batch.total else 100.0,
+        "skipped": batch.skipped,
+        "group_id": batch.group_id,
+        "created_at": batch.created_at,
+    }
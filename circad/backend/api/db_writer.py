@@ -0,0 +1,239 @@
+# circad/backend/api/db_writer.py
+"""
+Single-writer path for analysis results.
+
+On SQLite every commit takes the one database write lock, so Celery
+workers that each insert their own AnalysisResult (plus its waveform, the
+fleet counters and forecast state) queue on it one small transaction at a
+time. With CIRCAD_DB_WRITER on, workers send their rows to the writer
+process (manage.py run_db_writer) instead. It takes every request waiting
+(for at most CIRCAD_DB_WRITER_MAX_WAIT_MS, up to CIRCAD_DB_WRITER_BATCH
+rows), inserts them with one bulk_create in one transaction and answers
+each worker with its ids.
+
+The transport is multiprocessing.connection on CIRCAD_DB_WRITER_ADDRESS
+(a Unix socket path, or host:port) with a key derived from SECRET_KEY.
+When the writer is not running, save_results() writes directly.
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def enabled():
+    return bool(getattr(settings, "CIRCAD_DB_WRITER", False))
+
+
+def _address(address=None):
+    address = str(address or getattr(settings, "CIRCAD_DB_WRITER_ADDRESS", settings.BASE_DIR / "data" / "db_writer.sock"))
+    if not address.startswith(("/", ".")) and ":" in address:
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return address
+
+
+def _authkey():
+    return hashlib.sha256(f"circad-db-writer:{settings.SECRET_KEY}".encode()).digest()
+
+
+def _timeout():
+    return float(getattr(settings, "CIRCAD_DB_WRITER_TIMEOUT", 30))
+
+
+def insert(rows, using="default"):
+    """
+    rows: [(dcrm_file_id, result_json), ...]
+    Insert them in one transaction (bulk_create also stores the waveforms
+    and updates fleet stats, breaker measurements and forecast state).
+    returns: [(id, created_at), ...] in order
+    """
+    objs = [AnalysisResult(dcrm_file_id=file_id, result_json=result) for file_id, result in rows]
+    AnalysisResult.objects.using(using).bulk_create(objs)
+    return [(obj.id, obj.created_at) for obj in objs]
+
+
+# === client (Celery workers) ===
+def _connection(address=None):
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = Client(_address(address), authkey=_authkey())
+    return conn
+
+
+def _drop():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def submit(rows, address=None):
+    """
+    Have the writer insert rows ([(dcrm_file_id, result_json), ...]).
+    returns: [(id, created_at), ...]
+    raises: ConnectionRefusedError / FileNotFoundError if no writer is listening;
+            RuntimeError if it could not insert them; TimeoutError, EOFError
+    """
+    conn = _connection(address)
+    try:
+        conn.send(rows)
+        if not conn.poll(_timeout()):
+            # the rows may still be committed: never retry them elsewhere
+            raise TimeoutError("database writer did not answer")
+        ok, payload = conn.recv()
+    except BaseException:
+        _drop()
+        raise
+    if not ok:
+        raise RuntimeError(f"database writer: {payload}")
+    return payload
+
+
+def save_results(pairs, using="default"):
+    """
+    Store one AnalysisResult per (dcrm_file, result_json) pair: through the
+    writer when CIRCAD_DB_WRITER is on and it is listening, else directly.
+    returns: the AnalysisResult instances, in order
+    """
+    if enabled():
+        try:
+            saved = submit([(dcrm.id, result) for dcrm, result in pairs])
+        except (ConnectionRefusedError, FileNotFoundError) as e:
+            # nothing was sent: safe to write here instead
+            logger.warning("Database writer unavailable (%s); writing directly", e)
+        else:
+            recs = []
+            for (dcrm, result), (pk, created_at) in zip(pairs, saved):
+                rec = AnalysisResult(id=pk, dcrm_file=dcrm, result_json=result, created_at=created_at)
+                rec.split_waveform()
+                rec.sync_columns()
+                rec._state.adding, rec._state.db = False, using
+                recs.append(rec)
+            return recs
+    return [AnalysisResult.objects.using(using).create(dcrm_file=dcrm, result_json=result) for dcrm, result in pairs]
+
+
+# === server (manage.py run_db_writer) ===
+class Writer:
+    """
+    Accepts worker connections (a reader thread each) and commits their
+    requests in batches from the calling thread; see serve().
+    """
+
+    def __init__(self, address=None, using="default", batch_size=None, max_wait_ms=None):
+        self.address = _address(address)
+        self.using = using
+        self.batch_size = int(batch_size or getattr(settings, "CIRCAD_DB_WRITER_BATCH", 500))
+        self.max_wait = float(getattr(settings, "CIRCAD_DB_WRITER_MAX_WAIT_MS", 2.0) if max_wait_ms is None else max_wait_ms) / 1000
+        self.pending = queue.Queue()
+        self.stopping = threading.Event()
+        self.rows = self.batches = self.errors = 0
+
+    def _read(self, conn):
+        try:
+            while True:
+                self.pending.put((conn, conn.recv()))
+        except (EOFError, OSError):
+            conn.close()
+
+    def _accept(self, listener):
+        while not self.stopping.is_set():
+            try:
+                conn = listener.accept()
+            except OSError:
+                if self.stopping.is_set():
+                    return
+                logger.exception("Database writer: accept failed")
+                continue
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _gather(self):
+        try:
+            batch = [self.pending.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        n = len(batch[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.batch_size:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(item)
+            n += len(item[1])
+        return batch
+
+    def flush(self, batch):
+        """Commit a batch of (conn, rows) requests and answer each connection."""
+        rows = [row for _, request in batch for row in request]
+        replies = []
+        try:
+            with transaction.atomic(using=self.using):
+                saved = insert(rows, self.using)
+            start = 0
+            for _, request in batch:
+                replies.append((True, saved[start:start + len(request)]))
+                start += len(request)
+        except Exception:
+            logger.exception("Database writer: batch of %d rows failed; retrying per request", len(rows))
+            # one bad request must only fail its own sender
+            replies = []
+            for _, request in batch:
+                try:
+                    with transaction.atomic(using=self.using):
+                        replies.append((True, insert(request, self.using)))
+                except Exception as e:
+                    self.errors += 1
+                    replies.append((False, str(e)))
+        for (conn, _), reply in zip(batch, replies):
+            try:
+                conn.send(reply)
+            except OSError:
+                pass   # the worker went away; its rows are committed
+        self.rows += len(rows)
+        self.batches += 1
+
+    def serve(self, ready=None):
+        """
+        Listen and commit until stop() (or KeyboardInterrupt).
+          - ready: threading/multiprocessing Event set once listening
+        """
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)   # stale socket from an earlier run
+        listener = Listener(self.address, authkey=_authkey())
+        threading.Thread(target=self._accept, args=(listener,), daemon=True).start()
+        if ready is not None:
+            ready.set()
+        try:
+            while not self.stopping.is_set():
+                batch = self._gather()
+                if batch:
+                    self.flush(batch)
+        finally:
+            self.stopping.set()
+            listener.close()
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,112 @@
+# circad/backend/api/flat_forest.py
+import numpy as np
+
+
+class FlatForest:
+    """
+    A fitted sklearn RandomForestClassifier packed into flat NumPy arrays.
+
+    All trees share one node table (feature, threshold, left, right, value)
+    with global child indices; leaves point at themselves so a fixed number
+    of vectorized steps (the deepest tree's depth) walks every sample down
+    every tree at once. value holds per-leaf class probabilities, so
+    predict_proba is the mean over trees of the reached leaves - the same
+    computation sklearn does, without per-estimator dispatch.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes_ = classes
+        self.n_features = int(n_features)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        forest: fitted RandomForestClassifier / ExtraTreesClassifier (single output)
+        raises: ValueError if the estimator cannot be flattened
+        """
+        estimators = getattr(forest, "estimators_", None)
+        if not estimators or getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("need a fitted single-output tree ensemble")
+        n_classes = len(forest.classes_)
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left < 0
+            own = np.arange(n, dtype=np.int64)
+            lefts.append(np.where(leaf, own, left) + offset)
+            rights.append(np.where(leaf, own, right) + offset)
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            v = tree.value[:, 0, :n_classes].astype(np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0] = 1.0
+            values.append(v / norm)
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds),
+            np.concatenate(lefts), np.concatenate(rights),
+            np.concatenate(values), np.array(roots, dtype=np.int64),
+            depth, np.asarray(forest.classes_), forest.n_features_in_,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def predict_proba(self, X):
+        """
+        X: (n_samples, n_features) array-like
+        returns: (n_samples, n_classes) class probabilities, like sklearn's predict_proba
+        """
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
+
+def parity_error(flat, forest, X):
+    """Largest absolute difference between flat and sklearn probabilities on X."""
+    return float(np.max(np.abs(flat.predict_proba(X) - forest.predict_proba(np.asarray(X, dtype=float)))))
+
+
+def probe_rows(flat, n=256, seed=0):
+    """
+    Rows that exercise the forest: each feature is drawn from around the
+    split thresholds the trees actually use.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n, flat.n_features))
+    internal = flat.left != np.arange(len(flat.left))
+    for f in range(flat.n_features):
+        thr = flat.threshold[internal & (flat.feature == f)]
+        if len(thr):
+            lo, hi = thr.min(), thr.max()
+            pad = max(hi - lo, abs(hi), 1.0) * 0.1
+            X[:, f] = rng.uniform(lo - pad, hi + pad, n)
+            # land exactly on some thresholds to pin down the <= convention
+            X[: n // 8, f] = rng.choice(thr, n // 8)
+        else:
+            X[:, f] = rng.normal(0, 1, n)
+    return X
@@ -0,0 +1,165 @@
+# circad/backend/api/fleet_stats.py
+"""
+Materialized fleet statistics.
+
+FleetStats holds per-status counts, the sum and count of mean resistances
+and the scores of the newest CIRCAD_HEALTH_WINDOW results. api.signals
+adjusts it inside the transaction that creates or deletes a file or
+result, so system_status, reset_circad --status and the health index read
+one row. `manage.py repair_fleet_stats` recomputes it from the tables.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import AnalysisResult, DCRMFile, FleetStats
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELDS = {"Healthy": "healthy", "Warning": "warning", "Faulty": "faulty"}
+HEALTH_SCORES = {"Healthy": 2, "Warning": 1, "Faulty": 0, "High Contact Resistance": 0}
+
+
+def _window_size():
+    return int(getattr(settings, "CIRCAD_HEALTH_WINDOW", 50))
+
+
+def _counts_mean(mean):
+    # same rule the old Python loop used: `if mean:`
+    return mean is not None and mean != 0
+
+
+def _newest_window(using):
+    """Scores of the newest results, oldest first, straight from the table."""
+    rows = (
+        AnalysisResult.objects.using(using).order_by("-created_at", "-id")
+        .values_list("id", "status")[:_window_size()]
+    )
+    return [[rid, HEALTH_SCORES.get(st, 0)] for rid, st in reversed(list(rows))]
+
+
+def _locked(using):
+    """
+    returns: (stats row locked for update, fresh); a fresh row was just
+    computed from the tables, which already reflect the change being recorded
+    """
+    stats = FleetStats.objects.using(using).select_for_update().filter(pk=1).first()
+    if stats is not None:
+        return stats, False
+    return _compute(using), True
+
+
+def _apply(stats, result, sign):
+    stats.analyses += sign
+    field = STATUS_FIELDS.get(result.status)
+    if field:
+        setattr(stats, field, getattr(stats, field) + sign)
+    if _counts_mean(result.mean_resistance):
+        stats.mean_sum += sign * float(result.mean_resistance)
+        stats.mean_count += sign
+
+
+def add_results(results, using="default"):
+    """Count newly created results (post_save, bulk_create)."""
+    if not results:
+        return
+    with transaction.atomic(using=using):
+        stats, fresh = _locked(using)
+        if fresh:
+            stats.save(using=using)
+            return
+        for r in results:
+            _apply(stats, r, +1)
+            stats.window.append([r.id, HEALTH_SCORES.get(r.status, 0)])
+        stats.window = stats.window[-_window_size():]
+        stats.window_score = sum(score for _, score in stats.window)
+        stats.save(using=using)
+
+
+def remove_result(result, using="default"):
+    """Uncount a deleted result (post_delete)."""
+    with transaction.atomic(using=using):
+        stats, fresh = _locked(using)
+        if not fresh:
+            _apply(stats, result, -1)
+            if any(rid == result.id for rid, _ in stats.window):
+                # refill from the next-newest results still in the table
+                stats.window = _newest_window(using)
+                stats.window_score = sum(score for _, score in stats.window)
+        stats.save(using=using)
+
+
+def remove_results(results, using="default"):
+    """Uncount results deleted in bulk without signals (api.archive), in one transaction."""
+    if not results:
+        return
+    with transaction.atomic(using=using):
+        stats, fresh = _locked(using)
+        if not fresh:
+            for r in results:
+                _apply(stats, r, -1)
+            gone = {r.id for r in results}
+            if any(rid in gone for rid, _ in stats.window):
+                stats.window = _newest_window(using)
+                stats.window_score = sum(score for _, score in stats.window)
+        stats.save(using=using)
+
+
+def add_file(using="default", count=1):
+    with transaction.atomic(using=using):
+        stats, fresh = _locked(using)
+        if not fresh:
+            stats.files += count
+        stats.save(using=using)
+
+
+def remove_file(using="default"):
+    add_file(using, count=-1)
+
+
+def _compute(using="default"):
+    """An unsaved FleetStats (pk=1) computed from the tables."""
+    results = AnalysisResult.objects.using(using)
+    agg = results.aggregate(
+        analyses=Count("id"),
+        healthy=Count("id", filter=Q(status="Healthy")),
+        warning=Count("id", filter=Q(status="Warning")),
+        faulty=Count("id", filter=Q(status="Faulty")),
+        mean_sum=Sum("mean_resistance", filter=~Q(mean_resistance=0)),
+        mean_count=Count("mean_resistance", filter=~Q(mean_resistance=0)),
+    )
+    window = _newest_window(using)
+    return FleetStats(
+        pk=1,
+        files=DCRMFile.objects.using(using).count(),
+        analyses=agg["analyses"], healthy=agg["healthy"], warning=agg["warning"], faulty=agg["faulty"],
+        mean_sum=agg["mean_sum"] or 0.0, mean_count=agg["mean_count"],
+        window=window, window_score=sum(score for _, score in window),
+    )
+
+
+def rebuild(using="default"):
+    """Recompute FleetStats from scratch (repair_fleet_stats)."""
+    with transaction.atomic(using=using):
+        FleetStats.objects.using(using).filter(pk=1).delete()
+        stats = _compute(using)
+        stats.save(using=using, force_insert=True)
+    return stats
+
+
+def snapshot(using="default"):
+    """returns: the current FleetStats row (created from the tables if missing)"""
+    stats = FleetStats.objects.using(using).filter(pk=1).first()
+    return stats if stats is not None else rebuild(using)
+
+
+def avg_mean(stats):
+    return round(stats.mean_sum / stats.mean_count, 2) if stats.mean_count else 0
+
+
+def health_index(stats):
+    if not stats.window:
+        return 0.0
+    return round(stats.window_score / (2 * len(stats.window)) * 100, 2)
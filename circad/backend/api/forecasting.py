@@ -0,0 +1,135 @@
+# circad/backend/api/forecasting.py
+"""
+Per-asset forecasting state.
+
+Each asset keeps a ForecastState row with the least-squares sums of its
+mean-resistance history. The asset is the file's breaker when the upload
+is linked to one (history = its BreakerMeasurement rows in tested_at
+order, across all uploads), otherwise the file itself (history = its
+AnalysisResults). A new point is added with a single UPDATE (see
+api.signals), and a forecast is one row read plus
+ai_model.forecast_from_sums. Deleting a point drops the state row; it is
+rebuilt from the remaining history, with one index range scan, the next
+time it is needed.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from . import ai_model
+from .models import AnalysisResult, BreakerMeasurement, ForecastState
+
+logger = logging.getLogger(__name__)
+
+
+def _history(dcrm_file_id, using="default"):
+    means = (
+        AnalysisResult.objects.using(using).filter(dcrm_file_id=dcrm_file_id)
+        .order_by("created_at", "id")
+        .values_list("mean_resistance", flat=True)
+    )
+    return [float(m) for m in means if m is not None]
+
+
+def _breaker_history(breaker_id, using="default"):
+    means = (
+        BreakerMeasurement.objects.using(using).filter(breaker_id=breaker_id, mean_resistance__isnull=False)
+        .order_by("tested_at", "id")
+        .values_list("mean_resistance", flat=True)
+    )
+    return [float(m) for m in means]
+
+
+def rebuild_state(dcrm_file_id, using="default"):
+    """Recompute a file's sums from its full history."""
+    n, sum_x, sum_y, sum_xy, sum_xx = ai_model.history_sums(_history(dcrm_file_id, using))
+    state, _ = ForecastState.objects.using(using).update_or_create(
+        dcrm_file_id=dcrm_file_id,
+        defaults={"n": n, "sum_x": sum_x, "sum_y": sum_y, "sum_xy": sum_xy, "sum_xx": sum_xx},
+    )
+    return state
+
+
+def rebuild_breaker_state(breaker_id, using="default"):
+    """Recompute a breaker's sums from its measurements."""
+    n, sum_x, sum_y, sum_xy, sum_xx = ai_model.history_sums(_breaker_history(breaker_id, using))
+    last = BreakerMeasurement.objects.using(using).filter(breaker_id=breaker_id).aggregate(last=Max("tested_at"))["last"]
+    state, _ = ForecastState.objects.using(using).update_or_create(
+        breaker_id=breaker_id,
+        defaults={"n": n, "sum_x": sum_x, "sum_y": sum_y, "sum_xy": sum_xy, "sum_xx": sum_xx, "last_tested_at": last},
+    )
+    return state
+
+
+def history_sums(dcrm_file_id, breaker_id=None):
+    """
+    (n, Σx, Σy, Σxy, Σx²) of the asset's history; one row read once the state exists.
+    breaker_id: the file's breaker, whose history is used instead when set
+    """
+    if breaker_id is not None:
+        state = ForecastState.objects.filter(breaker_id=breaker_id).first()
+        if state is None:
+            state = rebuild_breaker_state(breaker_id)
+        return state.sums()
+    state = ForecastState.objects.filter(dcrm_file_id=dcrm_file_id).first()
+    if state is None:
+        state = rebuild_state(dcrm_file_id)
+    return state.sums()
+
+
+def forecast_next(dcrm_file_id, breaker_id=None):
+    """Forecast of the asset's next mean resistance from its stored sums."""
+    return ai_model.forecast_from_sums(*history_sums(dcrm_file_id, breaker_id))
+
+
+def _fold(mean):
+    return dict(
+        n=F("n") + 1,
+        sum_x=F("sum_x") + F("n"),
+        sum_y=F("sum_y") + mean,
+        sum_xy=F("sum_xy") + F("n") * mean,
+        sum_xx=F("sum_xx") + F("n") * F("n"),
+    )
+
+
+def record(dcrm_file_id, mean, using="default"):
+    """Append one mean to the file's sums (x = current n) in a single UPDATE."""
+    if mean is None:
+        return
+    mean = float(mean)
+    with transaction.atomic(using=using):
+        updated = ForecastState.objects.using(using).filter(dcrm_file_id=dcrm_file_id).update(**_fold(mean))
+        if not updated:
+            # no state yet (new asset or dropped after a delete): the history already holds this point
+            rebuild_state(dcrm_file_id, using)
+
+
+def record_measurement(breaker_id, mean, tested_at, using="default"):
+    """
+    Append one measurement to the breaker's sums in a single UPDATE. A test
+    older than the newest point already folded in changes every later x, so
+    the sums are rebuilt from the measurements instead.
+    """
+    if mean is None:
+        return
+    mean = float(mean)
+    with transaction.atomic(using=using):
+        updated = ForecastState.objects.using(using).filter(
+            Q(last_tested_at__isnull=True) | Q(last_tested_at__lte=tested_at), breaker_id=breaker_id,
+        ).update(last_tested_at=tested_at, **_fold(mean))
+        if not updated:
+            rebuild_breaker_state(breaker_id, using)
+
+
+def invalidate(dcrm_file_id, using="default"):
+    ForecastState.objects.using(using).filter(dcrm_file_id=dcrm_file_id).delete()
+
+
+def invalidate_files(dcrm_file_ids, using="default"):
+    """Drop the state of several files at once (results added with bulk_create)."""
+    ForecastState.objects.using(using).filter(dcrm_file_id__in=dcrm_file_ids).delete()
+
+
+def invalidate_breaker(breaker_id, using="default"):
+    ForecastState.objects.using(using).filter(breaker_id=breaker_id).delete()
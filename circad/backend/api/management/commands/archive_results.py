@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive
+from api.breakers import parse_when
+
+
+class Command(BaseCommand):
+    help = """
+    Move old analyses out of the AnalysisResult table into monthly compressed
+    archive files (api.archive, CIRCAD_ARCHIVE_DIR). Celery beat runs the same
+    job every CIRCAD_ARCHIVE_SECONDS (api.tasks.archive_results_task).
+
+    Usage examples:
+      python manage.py archive_results                        → Archive whole months older than CIRCAD_ARCHIVE_AFTER_DAYS
+      python manage.py archive_results --before 2025-01-01    → Archive everything before January 2025
+      python manage.py archive_results --dry-run              → Show what would be archived
+      python manage.py archive_results --list                 → List the archive files
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", help="Cutoff date (rounded down to the start of its month, UTC)")
+        parser.add_argument("--batch-size", type=int, help="Rows deleted per transaction (default CIRCAD_ARCHIVE_BATCH)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows per month")
+        parser.add_argument("--list", action="store_true", help="List archived months")
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            return self.list_months()
+        try:
+            cutoff = parse_when(options["before"], "--before") or archive.default_cutoff()
+        except ValueError as e:
+            raise CommandError(str(e))
+        cutoff = archive.month_start(cutoff)
+        self.stdout.write(f"🗃️  Archiving results created before {cutoff:%Y-%m-%d} (UTC)")
+        try:
+            months = archive.archive_before(
+                cutoff, batch_size=options["batch_size"], dry_run=options["dry_run"],
+                progress=lambda key, rows: self.stdout.write(f"  {key}: {rows} results archived"),
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        total = sum(rows for _, rows, _ in months)
+        if options["dry_run"]:
+            for key, rows, _ in months:
+                self.stdout.write(f"  {key}: {rows} results")
+            self.stdout.write(self.style.WARNING(f"🔎 Dry run: {total} results in {len(months)} months would be archived."))
+        elif months:
+            self.stdout.write(self.style.SUCCESS(f"✅ Archived {total} results in {len(months)} months."))
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ Nothing to archive."))
+
+    def list_months(self):
+        months = archive.manifest()
+        if not months:
+            self.stdout.write("📭 No archived months.")
+            return
+        for key in sorted(months):
+            m = months[key]
+            self.stdout.write(f"  {key}: {m['rows']:>9} results  {m['bytes'] / (1024 * 1024):8.2f} MB  ids {m['first_id']}–{m['last_id']}")
+        self.stdout.write(f"📦 {archive.count()} archived results in {len(months)} months ({archive.archive_dir()})")
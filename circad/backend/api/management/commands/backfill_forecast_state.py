@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import ai_model, forecasting
+from api.models import AnalysisResult, DCRMFile, ForecastState
+
+
+class Command(BaseCommand):
+    help = """
+    Build the per-asset forecasting state (api.models.ForecastState) from existing analyses.
+
+    Usage examples:
+      python manage.py backfill_forecast_state            → Rebuild state for every file (single pass over results)
+      python manage.py backfill_forecast_state --file 12  → Rebuild state for file ID 12 only
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', type=int, help='Rebuild only this DCRMFile ID')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        if options['file']:
+            if not DCRMFile.objects.filter(id=options['file']).exists():
+                self.stderr.write(self.style.ERROR(f"❌ File ID {options['file']} not found."))
+                return
+            state = forecasting.rebuild_state(options['file'])
+            self.stdout.write(self.style.SUCCESS(f"✅ File {options['file']}: {state.n} points."))
+            return
+
+        # one ordered pass over all results, accumulating each file's history
+        histories = {}
+        rows = (
+            AnalysisResult.objects.order_by("dcrm_file_id", "created_at", "id")
+            .values_list("dcrm_file_id", "mean_resistance")
+            .iterator(chunk_size=5000)
+        )
+        for file_id, mean in rows:
+            history = histories.setdefault(file_id, [])
+            if mean is not None:
+                history.append(float(mean))
+
+        states = []
+        for file_id, history in histories.items():
+            n, sum_x, sum_y, sum_xy, sum_xx = ai_model.history_sums(history)
+            states.append(ForecastState(dcrm_file_id=file_id, n=n, sum_x=sum_x, sum_y=sum_y, sum_xy=sum_xy, sum_xx=sum_xx))
+
+        with transaction.atomic():
+            ForecastState.objects.all().delete()
+            ForecastState.objects.bulk_create(states, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Forecast state rebuilt for {len(states)} files."))
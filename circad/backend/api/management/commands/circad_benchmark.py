@@ -0,0 +1,998 @@
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import ai_model, flat_forest, model_utils, preprocessing
+
+SUITES = ("ingest", "downsample", "features", "sidecar", "inference", "forest", "imports", "columns", "payload", "storage", "pages", "export", "report", "writers", "archive", "bulk")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_isolated(fn, *args):
+    """
+    Run fn(*args) in a forked child so peak RSS is measured per case.
+    returns: (fn result, wall seconds, baseline RSS MB, peak RSS MB)
+    """
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+
+    def child():
+        base = _peak_rss_mb()
+        t0 = time.perf_counter()
+        out = fn(*args)
+        queue.put((out, time.perf_counter() - t0, base, _peak_rss_mb()))
+
+    proc = ctx.Process(target=child)
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+# startup paths whose import cost is budgeted (CIRCAD_IMPORT_BUDGET_MS)
+IMPORT_TARGETS = {
+    "web app": ["-c", "import circad_backend.wsgi, api.routing; from django.urls import get_resolver; get_resolver().url_patterns"],
+    "reset_circad --status": ["manage.py", "reset_circad", "--status"],
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output.
+    returns: (total self time in ms, {module: cumulative ms})
+    """
+    total_us = 0
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        cumulative[name.strip()] = int(cum_us) / 1000
+    return total_us / 1000, cumulative
+
+
+def write_synthetic_dcrm(path, size_mb, rows_per_block=1_000_000):
+    """Write a Time/Resistance CSV of roughly size_mb megabytes."""
+    target = size_mb * 1024 * 1024
+    rng = np.random.default_rng(42)
+    offset = 0
+    with open(path, "w") as fh:
+        fh.write("Time (ms),Resistance (micro-ohms)\n")
+        while fh.tell() < target:
+            t = (offset + np.arange(rows_per_block)) * 0.01
+            r = 50 + 0.0001 * np.arange(rows_per_block) + rng.normal(0, 1.0, rows_per_block)
+            np.savetxt(fh, np.column_stack([t, r]), fmt="%.2f,%.3f")
+            offset += rows_per_block
+    return path
+
+
+class Command(BaseCommand):
+    help = """
+    CIRCAD performance benchmarks
+
+    Usage examples:
+      python manage.py circad_benchmark ingest                     → RSS / wall time of analyze_dcrm at 5 MB, 100 MB, 1 GB
+      python manage.py circad_benchmark ingest --sizes 5,100       → Custom file sizes (MB)
+      python manage.py circad_benchmark ingest --modes streaming   → Only the chunked ingest path
+      python manage.py circad_benchmark downsample                 → data_points: iterrows(head(300)) vs. min/max buckets
+      python manage.py circad_benchmark features                   → pandas/polyfit features vs. fused kernel (+ phases)
+      python manage.py circad_benchmark sidecar --sizes 5,100      → CSV re-parse vs. memory-mapped .npy sidecar reads
+      python manage.py circad_benchmark inference                  → predictions/s at 1, 8, 32 callers: direct vs. batched
+      python manage.py circad_benchmark forest                     → sklearn predict_proba vs. flat-array forest (+ parity)
+      python manage.py circad_benchmark imports                    → -X importtime of web startup / reset_circad --status vs. budget
+      python manage.py circad_benchmark columns --rows 1000000     → result_json lookups vs. indexed result columns (plans + timings)
+      python manage.py circad_benchmark payload                    → list_results page size / serialization: inline waveform vs. slim vs. ?fields=
+      python manage.py circad_benchmark report --pages 200         → PDF build time / size: matplotlib PNG charts (serial, pooled) vs. vector charts
+      python manage.py circad_benchmark writers --procs 8          → sustained result inserts/s: default SQLite vs. WAL profile vs. WAL + run_db_writer
+      python manage.py circad_benchmark archive --rows 1000000     → hot-table query latency before/after archive_results, archive size, cross-range listing
+      python manage.py circad_benchmark bulk --workers 1,2,4       → 500-CSV zip: streamed ingest time / memory, analysis wall time per worker count, breaker-forecast parity
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", choices=SUITES, help="Benchmark suite to run")
+        parser.add_argument("--sizes", default="5,100,1024", help="Comma-separated input sizes in MB (ingest)")
+        parser.add_argument("--modes", default="memory,streaming", help="Ingest modes to compare (ingest)")
+        parser.add_argument("--points", type=int, default=300, help="Chart points to produce (downsample)")
+        parser.add_argument("--callers", default="1,8,32", help="Comma-separated concurrent caller counts (inference)")
+        parser.add_argument("--requests", type=int, default=200, help="Predictions per caller (inference)")
+        parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list (imports)")
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the scratch results table (columns, pages, export, archive)")
+        parser.add_argument("--files", type=int, default=100_000, help="Files in the scratch media tree (storage)")
+        parser.add_argument("--pages", type=int, default=200, help="Analyses (detail pages) per report (report)")
+        parser.add_argument("--workers", default="1,2,4", help="Comma-separated process counts (report, bulk)")
+        parser.add_argument("--procs", type=int, default=8, help="Concurrent worker processes inserting results (writers)")
+        parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each load case (writers)")
+        parser.add_argument("--bulk-files", type=int, default=500, help="CSVs in the uploaded archive (bulk)")
+        parser.add_argument("--workdir", help="Directory for generated files (default: a temp dir)")
+
+    def handle(self, *args, **options):
+        workdir = options["workdir"]
+        if workdir:
+            Path(workdir).mkdir(parents=True, exist_ok=True)
+            getattr(self, f"bench_{options['suite']}")(Path(workdir), options)
+            return
+        with tempfile.TemporaryDirectory(prefix="circad_bench_") as tmp:
+            getattr(self, f"bench_{options['suite']}")(Path(tmp), options)
+
+    # === ingest: analyze_dcrm memory & wall time vs. file size ===
+    def bench_ingest(self, workdir, options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        if not set(modes) <= {"memory", "streaming"}:
+            raise CommandError("--modes accepts 'memory' and/or 'streaming'")
+
+        # load the model once in the parent so forked children share it
+        model_utils.load_model_package()
+
+        self.stdout.write(f"{'size':>8} {'mode':>10} {'wall s':>9} {'peak RSS MB':>12} {'Δ RSS MB':>10}")
+        for size_mb in sizes:
+            path = workdir / f"dcrm_{size_mb}mb.csv"
+            if not path.exists():
+                write_synthetic_dcrm(path, size_mb)
+            outputs = {}
+            for mode in modes:
+                out, wall, base, peak = _run_isolated(ai_model.analyze_dcrm, str(path), None, None, 0.6, mode == "streaming")
+                outputs[mode] = out
+                self.stdout.write(f"{size_mb:>6}MB {mode:>10} {wall:>9.2f} {peak:>12.1f} {peak - base:>10.1f}")
+            if len(outputs) == 2:
+                same = outputs["memory"] == outputs["streaming"]
+                self.stdout.write(self.style.SUCCESS("  results identical") if same else self.style.ERROR("  results differ"))
+            os.remove(path)
+
+    # === downsample: data_points construction ===
+    def bench_downsample(self, workdir, options):
+        import pandas as pd
+
+        n_out = options["points"]
+        rng = np.random.default_rng(0)
+
+        def legacy(df):
+            points = []
+            for _, row in df[["Time (ms)", "Resistance"]].head(n_out).iterrows():
+                points.append({"time": float(row["Time (ms)"]), "resistance": float(row["Resistance"])})
+            return points
+
+        def vectorized(df):
+            t, y = preprocessing.downsample(df["Resistance"].to_numpy(dtype=float), df["Time (ms)"].to_numpy(dtype=float), n_out)
+            return preprocessing.to_data_points(t, y)
+
+        self.stdout.write(f"{'samples':>10} {'head+iterrows ms':>17} {'covers':>8} {'min/max ms':>11} {'covers':>8}")
+        for n in (1_000, 10_000, 100_000, 1_000_000, 10_000_000):
+            df = pd.DataFrame({"Time (ms)": np.arange(n) * 0.01, "Resistance": 50 + rng.normal(0, 1, n)})
+            row = [f"{n:>10}"]
+            for fn in (legacy, vectorized):
+                reps = 5
+                t0 = time.perf_counter()
+                for _ in range(reps):
+                    pts = fn(df)
+                ms = (time.perf_counter() - t0) / reps * 1000
+                covered = (pts[-1]["time"] - pts[0]["time"]) / max(df["Time (ms)"].iloc[-1], 1e-9)
+                row.append(f"{ms:>17.2f} {covered:>7.0%}" if fn is legacy else f"{ms:>11.2f} {covered:>7.0%}")
+            self.stdout.write(" ".join(row))
+
+    # === features: summary feature kernel ===
+    def bench_features(self, workdir, options):
+        import pandas as pd
+
+        def legacy(df):
+            col = df["Resistance"]
+            y = pd.to_numeric(col, errors="coerce").dropna().values
+            slope = float(np.polyfit(np.arange(len(y)), y, 1)[0])
+            return float(col.mean()), float(col.std(ddof=0)), float(col.min()), float(col.max()), slope
+
+        def fused(df):
+            return preprocessing.compute_basic_features(df["Resistance"].to_numpy(dtype=float))
+
+        def fused_phases(df):
+            y = df["Resistance"].to_numpy(dtype=float)
+            features = preprocessing.compute_basic_features(y)
+            ai_model._phase_profile(features).update(y, df["Time (ms)"].to_numpy(dtype=float)).summary()
+            return features
+
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{'samples':>10} {'pandas+polyfit ms':>18} {'fused ms':>9} {'fused+phases ms':>16} {'max rel diff':>13}")
+        for n in (1_000, 100_000, 1_000_000, 10_000_000):
+            r = 50 + rng.normal(0, 1, n)
+            r[n // 2:] += 150   # arcing-contact step halfway through
+            df = pd.DataFrame({"Time (ms)": np.arange(n) * 0.01, "Resistance": r})
+            timings = []
+            for fn in (legacy, fused, fused_phases):
+                reps = max(1, 2_000_000 // n)
+                t0 = time.perf_counter()
+                for _ in range(reps):
+                    fn(df)
+                timings.append((time.perf_counter() - t0) / reps * 1000)
+            ref, got = np.array(legacy(df)), np.array(fused(df))
+            rel = float(np.max(np.abs(ref - got) / np.maximum(np.abs(ref), 1e-12)))
+            self.stdout.write(f"{n:>10} {timings[0]:>18.3f} {timings[1]:>9.3f} {timings[2]:>16.3f} {rel:>13.1e}")
+
+    # === sidecar: CSV re-parse vs. mmap'd columnar reads ===
+    def bench_sidecar(self, workdir, options):
+        sizes = [int(s) for s in options["sizes"].split(",") if s.strip()]
+        model_utils.load_model_package()
+
+        def consume(chunks):
+            total = 0.0
+            for y, t in chunks:
+                total += float(y.sum()) + float(t.sum())
+            return total
+
+        self.stdout.write(f"{'size':>8} {'csv parse s':>12} {'mmap read s':>12} {'analyze(csv) s':>15} {'analyze(npy) s':>15}  same result")
+        for size_mb in sizes:
+            path = workdir / f"dcrm_{size_mb}mb.csv"
+            if not path.exists():
+                write_synthetic_dcrm(path, size_mb)
+            res_col, time_col = preprocessing.detect_columns(preprocessing.read_header(path))
+
+            preprocessing.remove_sidecar(path)
+            t0 = time.perf_counter()
+            consume(preprocessing.iter_dcrm_chunks(path, res_col, time_col))
+            parse_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            from_csv = ai_model.analyze_dcrm(str(path))   # also writes the sidecar
+            analyze_csv_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            consume(preprocessing.iter_array_chunks(*preprocessing.open_sidecar(path)))
+            mmap_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            from_npy = ai_model.analyze_dcrm(str(path))
+            analyze_npy_s = time.perf_counter() - t0
+
+            self.stdout.write(
+                f"{size_mb:>6}MB {parse_s:>12.3f} {mmap_s:>12.3f} {analyze_csv_s:>15.3f} {analyze_npy_s:>15.3f}  {from_csv == from_npy}"
+            )
+            preprocessing.remove_sidecar(path)
+            os.remove(path)
+
+    # === inference: single-row predictions from concurrent callers ===
+    def bench_inference(self, workdir, options):
+        callers = [int(c) for c in options["callers"].split(",") if c.strip()]
+        per_caller = options["requests"]
+        entry = model_utils.get_model()
+        if not entry:
+            raise CommandError("No model package loaded")
+        rng = np.random.default_rng(0)
+        rows = np.column_stack([
+            rng.uniform(40, 200, 1024), rng.uniform(0.5, 5, 1024), rng.normal(0, 1e-3, 1024),
+            rng.uniform(30, 50, 1024), rng.uniform(60, 400, 1024),
+        ]).tolist()
+        expected = model_utils.predict_batch_with_confidence(rows, entry)
+
+        def run(n_threads, batched):
+            latencies = [[] for _ in range(n_threads)]
+            mismatches = [0]
+            start = threading.Barrier(n_threads + 1)
+
+            def caller(k):
+                start.wait()
+                for j in range(per_caller):
+                    i = (k * per_caller + j) % len(rows)
+                    t0 = time.perf_counter()
+                    got = model_utils.predict_with_confidence(rows[i], entry, batched=batched)
+                    latencies[k].append(time.perf_counter() - t0)
+                    if got != expected[i]:
+                        mismatches[0] += 1
+
+            threads = [threading.Thread(target=caller, args=(k,)) for k in range(n_threads)]
+            for th in threads:
+                th.start()
+            start.wait()
+            t0 = time.perf_counter()
+            for th in threads:
+                th.join()
+            wall = time.perf_counter() - t0
+            lat = np.concatenate([np.array(x) for x in latencies]) * 1000
+            return n_threads * per_caller / wall, np.percentile(lat, 50), np.percentile(lat, 99), mismatches[0]
+
+        batcher = model_utils.get_batcher()
+        self.stdout.write(f"batch size {batcher.max_batch}, max wait {batcher.max_wait * 1000:.1f} ms")
+        self.stdout.write(f"{'callers':>8} {'mode':>8} {'pred/s':>9} {'p50 ms':>8} {'p99 ms':>8}  same result")
+        for n in callers:
+            for batched in (False, True):
+                rate, p50, p99, bad = run(n, batched)
+                mode = "batched" if batched else "direct"
+                self.stdout.write(f"{n:>8} {mode:>8} {rate:>9.0f} {p50:>8.2f} {p99:>8.2f}  {bad == 0}")
+
+    # === forest: sklearn predict_proba vs. FlatForest traversal ===
+    def bench_forest(self, workdir, options):
+        pkg = model_utils.load_model_package()
+        clf = pkg.get("model") if pkg else None
+        if clf is None or not hasattr(clf, "estimators_"):
+            raise CommandError("No tree-ensemble model loaded")
+        flat = flat_forest.FlatForest.from_sklearn(clf)
+        self.stdout.write(f"{flat.n_trees} trees, depth {flat.depth}, {len(flat.feature)} nodes, {flat.nbytes / 1024:.1f} KB flat")
+        from django.test import override_settings
+        for trace in (False, True):
+            # a fresh registry re-reads the package; tracing is off in production (it slows the whole process)
+            with override_settings(CIRCAD_MODEL_TRACE_MEMORY=trace):
+                entry = model_utils.ModelRegistry(model_utils.registry._paths).get()
+            if entry is not None:
+                how = "traced allocations" if trace else "RSS delta"
+                self.stdout.write(f"package load: {entry.load_seconds * 1000:.0f} ms, {entry.memory_bytes / 2**20:.2f} MB ({how})")
+
+        probe = flat_forest.probe_rows(flat, n=4096)
+        err = flat_forest.parity_error(flat, clf, probe)
+        same_labels = bool((flat.predict_proba(probe).argmax(1) == clf.predict_proba(probe).argmax(1)).all())
+        ok = err <= model_utils.FLAT_FOREST_TOLERANCE and same_labels
+        line = f"parity on {len(probe)} probe rows: max |Δp| = {err:.1e}, labels identical: {same_labels}"
+        self.stdout.write(self.style.SUCCESS(line) if ok else self.style.ERROR(line))
+
+        self.stdout.write(f"{'rows':>6} {'sklearn ms':>11} {'flat ms':>9} {'speedup':>8}")
+        for n in (1, 8, 64, 1024):
+            X = probe[:n]
+            timings = []
+            for fn in (clf.predict_proba, flat.predict_proba):
+                fn(X)
+                reps = max(5, 2000 // n) if fn is flat.predict_proba else max(3, 200 // n)
+                t0 = time.perf_counter()
+                for _ in range(reps):
+                    fn(X)
+                timings.append((time.perf_counter() - t0) / reps * 1000)
+            self.stdout.write(f"{n:>6} {timings[0]:>11.3f} {timings[1]:>9.3f} {timings[0] / timings[1]:>7.0f}x")
+
+    # === imports: startup import time & forbidden heavy modules ===
+    def bench_imports(self, workdir, options):
+        budget = getattr(settings, "CIRCAD_IMPORT_BUDGET_MS", 1000)
+        forbidden = getattr(settings, "CIRCAD_IMPORT_FORBIDDEN", ())
+        failures = []
+        for target, argv in IMPORT_TARGETS.items():
+            runs = []
+            for _ in range(3):
+                proc = subprocess.run(
+                    [sys.executable, "-X", "importtime", *argv],
+                    cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+                )
+                if proc.returncode != 0:
+                    raise CommandError(f"{target} failed:\n{proc.stderr[-2000:]}")
+                runs.append(parse_importtime(proc.stderr))
+            total, cumulative = min(runs, key=lambda r: r[0])
+            heavy = sorted(m for m in cumulative if m.split(".")[0] in forbidden)
+            top = sorted(((ms, m) for m, ms in cumulative.items() if "." not in m), reverse=True)[: options["top"]]
+
+            self.stdout.write(f"\n{target}: {total:.0f} ms over {len(cumulative)} modules (best of 3, budget {budget} ms)")
+            for ms, module in top:
+                self.stdout.write(f"  {ms:>9.1f} ms  {module}")
+            if total > budget:
+                failures.append(f"{target}: {total:.0f} ms > {budget} ms")
+            if heavy:
+                roots = sorted({m.split(".")[0] for m in heavy})
+                failures.append(f"{target}: imports {', '.join(roots)}")
+
+        if failures:
+            raise CommandError("Import budget exceeded:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("\n✅ Import budget respected"))
+
+    # === columns: JSON-path reads vs. indexed AnalysisResult columns ===
+    def bench_columns(self, workdir, options):
+        import json
+        from django.core.management import call_command
+        from django.db import connections, transaction
+        from django.db.models import Avg, Count, Q
+        from django.utils import timezone
+        from api.models import AnalysisResult
+
+        n_rows = options["rows"]
+        alias = "circad_bench"
+        db_path = workdir / "bench_columns.sqlite3"
+        if db_path.exists():
+            db_path.unlink()
+        connections.databases[alias] = dict(
+            connections["default"].settings_dict, ENGINE="django.db.backends.sqlite3", NAME=str(db_path),
+        )
+        try:
+            # schema as it was before the columns existed, then real rows
+            call_command("migrate", "api", "0003", database=alias, verbosity=0)
+            rng = np.random.default_rng(0)
+            now = timezone.now()
+            t0 = time.perf_counter()
+            with transaction.atomic(using=alias), connections[alias].cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO api_dcrmfile (file, uploaded_at, sha256) VALUES (%s, %s, '')",
+                    [(f"uploads/bench_{i}.csv", now) for i in range(1000)],
+                )
+                statuses = np.array(["Healthy", "Warning", "Faulty"])[rng.choice(3, n_rows, p=[0.7, 0.2, 0.1])]
+                means = rng.uniform(30, 250, n_rows).round(3)
+                for start in range(0, n_rows, 50_000):
+                    batch = []
+                    for i in range(start, min(start + 50_000, n_rows)):
+                        result = {
+                            "status": str(statuses[i]), "mean_resistance": float(means[i]), "std_dev": 1.2,
+                            "min_resistance": float(means[i]) - 5, "max_resistance": float(means[i]) + 5, "slope": 0.0001,
+                            "predicted_condition": str(statuses[i]), "predicted_confidence": 0.8,
+                            "model_metadata": {"model_name": "contact_health", "model_version": "bench"},
+                            "forecast_next_mean": float(means[i]) + 1,
+                        }
+                        batch.append((i % 1000 + 1, json.dumps(result), now - timedelta(seconds=n_rows - i)))
+                    cur.executemany(
+                        "INSERT INTO api_analysisresult (dcrm_file_id, result_json, created_at) VALUES (%s, %s, %s)", batch,
+                    )
+            self.stdout.write(f"{n_rows} rows inserted in {time.perf_counter() - t0:.1f}s ({db_path.stat().st_size / 2**20:.0f} MB)")
+
+            t0 = time.perf_counter()
+            call_command("migrate", "api", "0004", database=alias, verbosity=0)
+            self.stdout.write(f"migration 0004 (add columns, batched backfill, indexes): {time.perf_counter() - t0:.1f}s")
+            call_command("migrate", "api", database=alias, verbosity=0)
+
+            qs = AnalysisResult.objects.using(alias)
+
+            def summary_json():
+                health = {"Healthy": 0, "Warning": 0, "Faulty": 0}
+                means = []
+                for r in qs.all().iterator(chunk_size=2000):
+                    st, mean = r.result_json.get("status"), r.result_json.get("mean_resistance")
+                    if st in health:
+                        health[st] += 1
+                    if mean:
+                        means.append(float(mean))
+                return health, round(sum(means) / len(means), 2)
+
+            def summary_columns():
+                health = {"Healthy": 0, "Warning": 0, "Faulty": 0}
+                health.update(qs.filter(status__in=health).values_list("status").annotate(n=Count("id")).order_by())
+                avg = qs.aggregate(avg=Avg("mean_resistance", filter=~Q(mean_resistance=0)))["avg"]
+                return health, round(avg, 2)
+
+            cases = [
+                ("list_results ?status=Faulty (page 1 + count)",
+                 qs.filter(result_json__status="Faulty").order_by("-created_at"),
+                 qs.filter(status="Faulty").order_by("-created_at"),
+                 lambda q: (q.count(), [r.id for r in q[:10]])),
+                ("mean_resistance > 240 (count)",
+                 qs.filter(result_json__mean_resistance__gt=240),
+                 qs.filter(mean_resistance__gt=240),
+                 lambda q: q.count()),
+                ("health index (last 50 statuses)",
+                 qs.order_by("-created_at"),
+                 qs.order_by("-created_at"),
+                 None),
+            ]
+            for title, old, new, run in cases:
+                self.stdout.write(f"\n=== {title}")
+                for label, q in (("result_json", old), ("columns", new)):
+                    plan = " | ".join(line.strip() for line in q.explain().splitlines())
+                    self.stdout.write(f"  {label:>11} plan: {plan}")
+                if run is None:
+                    old_fn = lambda: [r.result_json.get("status") for r in old[:50]]
+                    new_fn = lambda: list(new.values_list("status", flat=True)[:50])
+                else:
+                    old_fn, new_fn = (lambda q=old: run(q)), (lambda q=new: run(q))
+                self._time_pair(old_fn, new_fn)
+
+            self.stdout.write("\n=== system_status / reset_circad --status summary")
+            self._time_pair(summary_json, summary_columns, reps=1)
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
+            if db_path.exists():
+                db_path.unlink()
+
+    def _time_pair(self, old_fn, new_fn, reps=3):
+        timings, outputs = [], []
+        for fn in (old_fn, new_fn):
+            best = float("inf")
+            for _ in range(reps):
+                t0 = time.perf_counter()
+                out = fn()
+                best = min(best, time.perf_counter() - t0)
+            timings.append(best * 1000)
+            outputs.append(out)
+        same = outputs[0] == outputs[1]
+        self.stdout.write(
+            f"  result_json {timings[0]:>10.1f} ms   columns {timings[1]:>8.1f} ms   "
+            f"{timings[0] / max(timings[1], 1e-6):>7.0f}x   same result: {same}"
+        )
+
+    # === payload: one list_results page (10 rows) ===
+    def bench_payload(self, workdir, options):
+        from django.utils import timezone
+        from rest_framework.renderers import JSONRenderer
+        from api.models import AnalysisResult
+        from api.serializers import AnalysisResultSerializer
+
+        path = write_synthetic_dcrm(workdir / "payload.csv", 1)
+        full = ai_model.analyze_dcrm(str(path), chart_points=options["points"])
+        slim = {k: v for k, v in full.items() if k != "data_points"}
+        now = timezone.now()
+
+        def page(result_json):
+            rows = [AnalysisResult(id=i, dcrm_file_id=1, result_json=result_json, created_at=now) for i in range(1, 11)]
+            for r in rows:
+                r.sync_columns()
+            return rows
+
+        cases = [
+            ("inline data_points", page(full), None),
+            ("slim result_json", page(slim), None),
+            ("?fields=id,status,mean_resistance,created_at", page(slim), ["id", "status", "mean_resistance", "created_at"]),
+        ]
+        self.stdout.write(f"{len(full['data_points'])} points per result, 10 results per page")
+        self.stdout.write(f"{'case':<46} {'bytes':>9} {'ms/page':>9}")
+        for title, rows, fields in cases:
+            reps = 200
+            t0 = time.perf_counter()
+            for _ in range(reps):
+                body = JSONRenderer().render(AnalysisResultSerializer(rows, many=True, fields=fields).data)
+            ms = (time.perf_counter() - t0) / reps * 1000
+            self.stdout.write(f"{title:<46} {len(body):>9} {ms:>9.3f}")
+
+    # === storage: status storage figure, os.walk vs. the tracked row ===
+    def bench_storage(self, workdir, options):
+        from api import storage_usage
+
+        n = options["files"]
+        root = workdir / "media"
+        for i in range(n):
+            d = root / "dcrm_files" / f"{i // 1000:04d}"
+            if i % 1000 == 0:
+                d.mkdir(parents=True, exist_ok=True)
+            (d / f"{i}.csv").write_bytes(b"Time,Resistance\n" + b"0,100.0\n" * (i % 64))
+
+        def get_folder_size():
+            # the walk system_status and reset_circad --status used to do per request
+            total = 0
+            for dirpath, _, filenames in os.walk(root):
+                for f in filenames:
+                    fp = os.path.join(dirpath, f)
+                    if os.path.isfile(fp):
+                        total += os.path.getsize(fp)
+            return total
+
+        self.stdout.write(f"{n} files under {root}")
+        self.stdout.write(f"{'case':<34} {'ms':>10}")
+        for title, fn, reps in (
+            ("os.walk + getsize (old)", get_folder_size, 3),
+            ("scandir walk (reconcile)", lambda: storage_usage.walk(root), 3),
+            ("tracked row (status)", storage_usage.snapshot, 200),
+        ):
+            best = float("inf")
+            for _ in range(reps):
+                t0 = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - t0)
+            self.stdout.write(f"{title:<34} {best * 1000:>10.3f}")
+        self.stdout.write(f"same total: {get_folder_size() == storage_usage.walk(root)[0]}")
+
+    @contextmanager
+    def _results_db(self, workdir, n_rows, db_options=None, spacing=0.25):
+        """
+        A scratch SQLite database (alias "circad_bench") at the current schema
+        holding n_rows AnalysisResults over 1000 files, several per second.
+          - db_options: the alias' OPTIONS (default: those of "default")
+          - spacing: seconds between consecutive results (whole seconds are stored)
+        yields: the alias
+        """
+        import json
+        from django.core.management import call_command
+        from django.db import connections, transaction
+        from django.utils import timezone
+
+        alias = "circad_bench"
+        db_path = workdir / "bench_results.sqlite3"
+        if db_path.exists():
+            db_path.unlink()
+        connections.databases[alias] = dict(
+            connections["default"].settings_dict, ENGINE="django.db.backends.sqlite3", NAME=str(db_path),
+        )
+        if db_options is not None:
+            connections.databases[alias]["OPTIONS"] = db_options
+        try:
+            call_command("migrate", "api", database=alias, verbosity=0)
+            rng = np.random.default_rng(0)
+            statuses = np.array(["Healthy", "Warning", "Faulty"])[rng.choice(3, n_rows, p=[0.7, 0.2, 0.1])]
+            now = timezone.now()
+            # stored exactly as the ORM writes them, so cursor comparisons see equal timestamps as equal
+            adapt = connections[alias].ops.adapt_datetimefield_value
+            t0 = time.perf_counter()
+            with transaction.atomic(using=alias), connections[alias].cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO api_dcrmfile (file, original_name, uploaded_at, sha256) VALUES (%s, '', %s, '')",
+                    [(f"uploads/bench_{i}.csv", now) for i in range(1000)],
+                )
+                for start in range(0, n_rows, 50_000):
+                    batch = []
+                    for i in range(start, min(start + 50_000, n_rows)):
+                        st = str(statuses[i])
+                        result = {"status": st, "mean_resistance": 100.0, "std_dev": 1.2, "predicted_condition": st}
+                        created_at = adapt(now - timedelta(seconds=int((n_rows - i) * spacing)))
+                        batch.append((i % 1000 + 1, json.dumps(result), created_at, st, 100.0, 1.2, 95.0, 105.0))
+                    cur.executemany(
+                        "INSERT INTO api_analysisresult (dcrm_file_id, result_json, created_at, status, mean_resistance, "
+                        "std_dev, min_resistance, max_resistance) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", batch,
+                    )
+            self.stdout.write(f"{n_rows} rows inserted in {time.perf_counter() - t0:.1f}s")
+            yield alias
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
+            if db_path.exists():
+                db_path.unlink()
+
+    # === pages: list_results page N, page numbers vs. keyset cursor ===
+    def bench_pages(self, workdir, options):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from api.models import AnalysisResult
+        from api.views import KeysetPagination, ResultPagination
+
+        with self._results_db(workdir, options["rows"]) as alias:
+            factory = APIRequestFactory()
+            page_size = ResultPagination.page_size
+            for title, qs in (
+                ("all results", AnalysisResult.objects.using(alias).defer("result_json")),
+                ("?status=Faulty", AnalysisResult.objects.using(alias).filter(status="Faulty").defer("result_json")),
+            ):
+                qs = qs.order_by("-created_at", "-id")
+                total = qs.count()
+                self.stdout.write(f"\n=== {title} ({total} rows)")
+                self.stdout.write(f"{'page':>8} {'page number ms':>16} {'cursor ms':>12}   same rows")
+                for page in (1, 10, 100, 1000, 10_000, 100_000):
+                    if (page - 1) * page_size >= total:
+                        break
+                    # the cursor a client holds after walking to this page
+                    cursor = KeysetPagination.cursor_for(qs[(page - 1) * page_size - 1]) if page > 1 else ""
+                    timings, ids = [], []
+                    for paginator, params in ((ResultPagination, {"page": page}), (KeysetPagination, {"cursor": cursor})):
+                        best = float("inf")
+                        for _ in range(5):
+                            request = Request(factory.get("/api/results/", params))
+                            t0 = time.perf_counter()
+                            rows = paginator().paginate_queryset(qs, request)
+                            best = min(best, time.perf_counter() - t0)
+                        timings.append(best * 1000)
+                        ids.append([r.id for r in rows])
+                    self.stdout.write(f"{page:>8} {timings[0]:>16.2f} {timings[1]:>12.2f}   {ids[0] == ids[1]}")
+
+    # === export: generate_csv_report, in-memory CSV vs. streamed ===
+    def bench_export(self, workdir, options):
+        import csv
+        import io
+        import tracemalloc
+        from api.models import AnalysisResult
+        from api.reports import CSV_HEADER, iter_csv
+
+        def buffered(qs):
+            # what generate_csv_report did before: the whole file in a StringIO
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_HEADER)
+            rows = qs.values_list(
+                "id", "dcrm_file_id", "dcrm_file__file", "status", "mean_resistance",
+                "std_dev", "min_resistance", "max_resistance", "created_at",
+            )
+            for aid, file_id, fname, st, mean, std, min_r, max_r, created in rows.iterator(chunk_size=2000):
+                writer.writerow([aid, file_id or "", os.path.basename(fname) if fname else "", st, mean, std, min_r, max_r, created.isoformat()])
+            yield buffer.getvalue()
+
+        with self._results_db(workdir, options["rows"]) as alias:
+            self.stdout.write(f"{'case':<26} {'rows':>9} {'first byte ms':>14} {'total s':>9} {'peak MB':>9} {'MB out':>8}")
+            for n in sorted({min(options["rows"], k) for k in (10_000, 100_000, options["rows"])}):
+                top = AnalysisResult.objects.using(alias).order_by("created_at", "id").values_list("id", flat=True)[n - 1]
+                qs = AnalysisResult.objects.using(alias).filter(id__lte=top).order_by("created_at", "id")
+                for title, make in (
+                    ("StringIO (old)", lambda: buffered(qs)),
+                    ("streamed", lambda: iter_csv(qs)),
+                    ("streamed + gzip", lambda: iter_csv(qs, compress=True)),
+                ):
+                    tracemalloc.start()
+                    t0 = time.perf_counter()
+                    pieces = make()
+                    first = next(pieces)
+                    ttfb = time.perf_counter() - t0
+                    size = len(first)
+                    for piece in pieces:
+                        size += len(piece)
+                    total = time.perf_counter() - t0
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    self.stdout.write(f"{title:<26} {n:>9} {ttfb * 1000:>14.2f} {total:>9.2f} {peak / 2**20:>9.1f} {size / 2**20:>8.1f}")
+
+    # === report: PDF reports, matplotlib PNG charts (serial / process pool) vs. vector charts ===
+    def bench_report(self, workdir, options):
+        from datetime import datetime, timezone as dt_timezone
+        from api import report_jobs
+
+        n_pages = options["pages"]
+        workers = [int(w) for w in options["workers"].split(",") if w.strip()]
+        rng = np.random.default_rng(42)
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        pages = []
+        for i in range(n_pages):
+            # a 50k-sample waveform per analysis, read back from its sidecar like a real upload
+            path = workdir / f"dcrm_{i}.csv"
+            path.write_text("Time (ms),Resistance (micro-ohms)\n")
+            y = 50 + rng.normal(0, 1.0, 50_000)
+            preprocessing.save_sidecar(path, y, np.arange(50_000) * 0.01)
+            pages.append({
+                "id": i + 1, "file_id": i + 1, "file_name": path.name, "status": "Healthy",
+                "mean": round(float(y.mean()), 3), "std": round(float(y.std()), 3),
+                "created_at": start + timedelta(days=i), "csv_path": str(path), "data_points": None,
+                "qr": str({"analysis_id": i + 1, "status": "Healthy", "mean": round(float(y.mean()), 3)}),
+            })
+        options_ = report_jobs.normalize_options({"title": "Benchmark Report"})
+
+        self.stdout.write(f"{n_pages} analyses, {os.cpu_count()} CPUs")
+        self.stdout.write(f"{'charts':<22} {'build s':>8} {'pages/s':>9} {'PDF MB':>8} {'KB/page':>8}")
+        cases = [(f"PNG, {w} process{'es' if w > 1 else ''}", False, w) for w in workers] + [("vector", True, 1)]
+        for title, vector, w in cases:
+            t0 = time.perf_counter()
+            pdf = report_jobs.render_pdf(pages, options_, workers=w, vector=vector)
+            wall = time.perf_counter() - t0
+            self.stdout.write(
+                f"{title:<22} {wall:>8.2f} {n_pages / wall:>9.1f} {len(pdf) / 2**20:>8.2f} {len(pdf) / 1024 / n_pages:>8.1f}"
+            )
+
+    # === writers: concurrent AnalysisResult inserts, SQLite defaults vs. WAL profile vs. single writer ===
+    def bench_writers(self, workdir, options):
+        import queue as queue_mod
+        from django.db import OperationalError, connections
+        from api import db_writer
+        from api.models import AnalysisResult
+
+        procs, seconds = options["procs"], options["seconds"]
+        t = np.arange(300) * 0.5
+        # what analyze_dcrm stores: summary fields plus a 300-point waveform
+        result = {
+            "status": "Healthy", "predicted_condition": "Healthy", "mean_resistance": 100.0, "std_dev": 1.2,
+            "min_resistance": 95.0, "max_resistance": 105.0,
+            "data_points": preprocessing.to_data_points(t, 100 + np.sin(t)),
+        }
+        ctx = multiprocessing.get_context("fork")
+
+        def percentile(values, q):
+            return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+        def worker(alias, mode, address, n, go, out):
+            connections.close_all()
+            latencies, errors = [], 0
+            go.wait()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                t0 = time.perf_counter()
+                try:
+                    if mode == "writer":
+                        db_writer.submit([(n % 1000 + 1, result)], address)
+                    else:
+                        AnalysisResult.objects.using(alias).create(dcrm_file_id=n % 1000 + 1, result_json=result)
+                except OperationalError:
+                    errors += 1   # "database is locked"
+                    continue
+                latencies.append(time.perf_counter() - t0)
+                n += procs
+            out.put(("write", latencies, errors))
+
+        def reader(alias, go, out):
+            # the ASGI tier: newest-first result pages while workers insert
+            connections.close_all()
+            latencies, errors = [], 0
+            go.wait()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                t0 = time.perf_counter()
+                try:
+                    list(AnalysisResult.objects.using(alias).order_by("-created_at", "-id").values("id", "status", "mean_resistance")[:20])
+                except OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+            out.put(("read", latencies, errors))
+
+        def serve(alias, address, ready):
+            connections.close_all()
+            db_writer.Writer(address, using=alias).serve(ready)
+
+        self.stdout.write(f"{procs} writer processes + 1 reader, {seconds:.0f} s per case, {os.cpu_count()} CPUs")
+        self.stdout.write(
+            f"{'case':<24} {'inserts/s':>10} {'p50 ms':>8} {'p99 ms':>9} {'locked':>7}   {'reads/s':>8} {'read p99 ms':>12}"
+        )
+        for title, db_options, mode in (
+            ("SQLite defaults", {}, "direct"),
+            ("WAL profile", settings.CIRCAD_SQLITE_OPTIONS, "direct"),
+            ("WAL + run_db_writer", settings.CIRCAD_SQLITE_OPTIONS, "writer"),
+        ):
+            with self._results_db(workdir, 10_000, db_options) as alias:
+                connections[alias].close()
+                address = str(workdir / "db_writer.sock")
+                server = None
+                if mode == "writer":
+                    ready = ctx.Event()
+                    server = ctx.Process(target=serve, args=(alias, address, ready), daemon=True)
+                    server.start()
+                    ready.wait(30)
+                go, out = ctx.Event(), ctx.Queue()
+                children = [ctx.Process(target=worker, args=(alias, mode, address, i, go, out)) for i in range(procs)]
+                children.append(ctx.Process(target=reader, args=(alias, go, out)))
+                for child in children:
+                    child.start()
+                go.set()
+                writes, write_errors, reads, read_errors = [], 0, [], 0
+                for _ in children:
+                    try:
+                        kind, latencies, errors = out.get(timeout=seconds + 120)
+                    except queue_mod.Empty:
+                        break
+                    if kind == "write":
+                        writes += latencies
+                        write_errors += errors
+                    else:
+                        reads, read_errors = latencies, errors
+                for child in children:
+                    child.join()
+                if server is not None:
+                    server.terminate()
+                    server.join()
+                stored = AnalysisResult.objects.using(alias).count() - 10_000
+                self.stdout.write(
+                    f"{title:<24} {len(writes) / seconds:>10.1f} {percentile(writes, 50):>8.2f} {percentile(writes, 99):>9.2f} "
+                    f"{write_errors:>7}   {len(reads) / seconds:>8.1f} {percentile(reads, 99):>12.2f}"
+                    + ("" if stored == len(writes) else self.style.ERROR(f"   {stored} rows stored"))
+                    + (self.style.ERROR(f"   {read_errors} read errors") if read_errors else "")
+                )
+
+    # === archive: hot-table latency before / after archive_results, and listing across the archive ===
+    def bench_archive(self, workdir, options):
+        from django.db.models import Count
+        from django.test import override_settings
+        from django.utils import timezone
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from api import archive, fleet_stats
+        from api.models import AnalysisResult
+        from api.views import ArchiveKeysetPagination, KeysetPagination
+
+        factory = APIRequestFactory()
+
+        def best(fn, repeat=5):
+            timings = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - t0)
+            return min(timings) * 1000
+
+        def hot_queries(alias):
+            qs = AnalysisResult.objects.using(alias).defer("result_json").order_by("-created_at", "-id")
+            faulty = qs.filter(status="Faulty")
+            page = lambda q: KeysetPagination().paginate_queryset(q, Request(factory.get("/api/results/", {"cursor": ""})))
+            return {
+                "COUNT(*)": best(lambda: qs.count()),
+                "list page 1": best(lambda: page(qs)),
+                "?status=Faulty page 1": best(lambda: page(faulty)),
+                "last 30 days by status": best(lambda: list(
+                    AnalysisResult.objects.using(alias).filter(created_at__gte=timezone.now() - timedelta(days=30))
+                    .values("status").annotate(n=Count("id")).order_by()
+                )),
+                "fleet_stats.rebuild": best(lambda: fleet_stats.rebuild(alias), repeat=3),
+            }
+
+        # two years of results, one a minute at 1M rows; everything before the last year is archived
+        spacing = 2 * 365 * 86400 / options["rows"]
+        folder = workdir / "archive"
+        with override_settings(CIRCAD_ARCHIVE_DIR=folder), self._results_db(workdir, options["rows"], spacing=spacing) as alias:
+            before = hot_queries(alias)
+            t0 = time.perf_counter()
+            months = archive.archive_before(archive.default_cutoff(), using=alias)
+            elapsed = time.perf_counter() - t0
+            archived = sum(rows for _, rows, _ in months)
+            size = sum(b for _, _, b in months)
+            after = hot_queries(alias)
+
+            self.stdout.write(
+                f"\narchived {archived} rows in {len(months)} months: {elapsed:.1f}s ({archived / max(elapsed, 1e-9):.0f} rows/s), "
+                f"{size / 2**20:.1f} MB ({size / max(archived, 1):.0f} B/row)"
+            )
+            self.stdout.write(f"{'hot query':<26} {'before ms':>10} {'after ms':>10}")
+            for name in before:
+                self.stdout.write(f"{name:<26} {before[name]:>10.2f} {after[name]:>10.2f}")
+
+            # a range reaching back into the archive: keyset pages over both sources
+            qs = AnalysisResult.objects.using(alias).defer("result_json").order_by("-created_at", "-id")
+            start = timezone.now() - timedelta(days=540)
+            ranged = qs.filter(created_at__gte=start)
+            self.stdout.write(f"\n{'cross-range list':<26} {'cold ms':>10} {'warm ms':>10}")
+            for title, params in (
+                ("from=-540d page 1", {"cursor": ""}),
+                ("page at the boundary", {"cursor": KeysetPagination.cursor_for(
+                    qs.filter(created_at__gte=archive.default_cutoff()).order_by("created_at", "id").first()
+                )}),
+            ):
+                run = lambda: ArchiveKeysetPagination(start, None).paginate_queryset(
+                    ranged, Request(factory.get("/api/results/", params)),
+                )
+                archive._load.cache_clear()
+                cold = best(run, repeat=1)
+                self.stdout.write(f"{title:<26} {cold:>10.2f} {best(run):>10.2f}")
+            some = int(archive.load(months[len(months) // 2][0])["id"][100])
+            archive._load.cache_clear()
+            self.stdout.write(f"{'result_detail (archived)':<26} {best(lambda: archive.find(some), repeat=1):>10.2f} {best(lambda: archive.find(some)):>10.2f}")
+
+    # === bulk: one zip of CSVs through api.bulk_upload, analysis spread over worker processes ===
+    def bench_bulk(self, workdir, options):
+        import tracemalloc
+        import zipfile
+        from django.core.files.uploadedfile import TemporaryUploadedFile
+        from django.db import transaction
+        from django.test import override_settings
+        from api import bulk_upload
+
+        n_files = options["bulk_files"]
+        workers = [int(w) for w in options["workers"].split(",") if w.strip()]
+        rng = np.random.default_rng(3)
+        t = np.arange(20_000) * 0.01
+        zip_path = workdir / "campaign.zip"
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i in range(n_files):
+                y = 50 + rng.normal(0, 1.0, t.size) + 0.01 * i
+                body = "Time (ms),Resistance (micro-ohms)\n" + "\n".join(f"{a:.2f},{b:.3f}" for a, b in zip(t, y))
+                zf.writestr(f"campaign/breaker_{i:04d}.csv", body)
+        self.stdout.write(f"{n_files} CSVs, {zip_path.stat().st_size / 2**20:.1f} MB zip, {os.cpu_count()} CPUs")
+
+        # ingest: stream entries to storage + one bulk_create (rolled back afterwards)
+        media = workdir / "media"
+        with override_settings(MEDIA_ROOT=media), transaction.atomic():
+            upload = TemporaryUploadedFile("campaign.zip", "application/zip", zip_path.stat().st_size, None)
+            with open(zip_path, "rb") as src:
+                for block in iter(lambda: src.read(1024 * 1024), b""):
+                    upload.write(block)
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            batch = bulk_upload.ingest(upload, "campaign.zip")
+            elapsed = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            paths = [str(media / name) for name in batch.files.order_by("id").values_list("file", flat=True)]
+            transaction.set_rollback(True)
+        self.stdout.write(f"ingest: {elapsed:.2f}s ({n_files / elapsed:.0f} files/s), peak traced memory {peak / 2**20:.1f} MB")
+        self.stdout.write(f"(one upload_dcrm per file at its 10/m rate limit: {n_files / 10:.0f} min)")
+
+        # analysis: the group's tasks (CIRCAD_BULK_UPLOAD_TASK_FILES files each) shared by N worker processes
+        size = bulk_upload._task_files()
+        chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+        ctx = multiprocessing.get_context("fork")
+        self.stdout.write(f"{'workers':>8} {'tasks':>6} {'wall s':>8} {'files/s':>9} {'speedup':>8}")
+        base = None
+        for w in workers:
+            t0 = time.perf_counter()
+            with ctx.Pool(w) as pool:
+                pool.map(ai_model.analyze_dcrm_batch, chunks, chunksize=1)
+            wall = time.perf_counter() - t0
+            base = base or wall
+            self.stdout.write(f"{w:>8} {len(chunks):>6} {wall:>8.2f} {n_files / wall:>9.1f} {base / wall:>8.2f}")
+
+        # forecast parity: files of one breaker through the batch task vs. one analyze_file_task each
+        from api.models import Breaker, DCRMFile
+        from api.tasks import analyze_file_task, analyze_files_batch_task
+        names = [os.path.relpath(p, media) for p in paths[:8]]
+        with override_settings(MEDIA_ROOT=media), transaction.atomic():
+            forecasts = []
+            for asset in ("BENCH-SINGLE", "BENCH-BULK"):
+                breaker = Breaker.objects.create(asset_id=asset)
+                files = [DCRMFile.objects.create(file=name, breaker=breaker) for name in names]
+                if asset == "BENCH-SINGLE":
+                    for f in files:
+                        analyze_file_task.apply(args=(f.id,))
+                else:
+                    analyze_files_batch_task.apply(args=([f.id for f in files],))
+                forecasts.append([f.results.get().forecast_next_mean for f in files])
+            transaction.set_rollback(True)
+        line = f"breaker forecasts, batch task vs. one task per file ({len(names)} tests): identical: {forecasts[0] == forecasts[1]}"
+        self.stdout.write(self.style.SUCCESS(line) if forecasts[0] == forecasts[1] else self.style.ERROR(line))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import storage_usage
+
+
+class Command(BaseCommand):
+    help = """
+    Walk MEDIA_ROOT and reset the tracked storage totals (api.models.StorageUsage),
+    e.g. after files were copied in or removed by hand. Celery beat runs the same
+    job every CIRCAD_STORAGE_RECONCILE_SECONDS (api.tasks.reconcile_storage_task).
+
+    Usage examples:
+      python manage.py reconcile_storage             → Walk the media folder and show the drift
+    """
+
+    def handle(self, *args, **options):
+        usage = storage_usage.reconcile()
+        msg = f"✅ Storage reconciled: {storage_usage.used_mb(usage)} MB in {usage.files} files"
+        if usage.drift_bytes or usage.drift_files:
+            self.stdout.write(f"  bytes: {usage.drift_bytes:+d}   files: {usage.drift_files:+d}")
+            self.stdout.write(self.style.SUCCESS(msg + " (drift corrected)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(msg + " (no drift)."))
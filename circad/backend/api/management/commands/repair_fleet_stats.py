@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api import fleet_stats
+
+
+class Command(BaseCommand):
+    help = """
+    Recompute the materialized fleet statistics (api.models.FleetStats) from the
+    DCRMFile / AnalysisResult tables, e.g. after rows were changed with raw SQL.
+
+    Usage examples:
+      python manage.py repair_fleet_stats            → Rebuild and show what changed
+    """
+
+    def handle(self, *args, **options):
+        before = fleet_stats.snapshot()
+        after = fleet_stats.rebuild()
+        fields = ("files", "analyses", "healthy", "warning", "faulty", "mean_count", "window_score")
+        drift = [f for f in fields if getattr(before, f) != getattr(after, f)]
+        if abs(before.mean_sum - after.mean_sum) > 1e-6 * max(1.0, abs(after.mean_sum)):
+            drift.append("mean_sum")
+        if before.window != after.window:
+            drift.append("window")
+        for f in drift:
+            self.stdout.write(f"  {f}: {getattr(before, f)!r:.60} → {getattr(after, f)!r:.60}")
+        msg = f"✅ Fleet stats rebuilt: {after.files} files, {after.analyses} analyses"
+        self.stdout.write(self.style.SUCCESS(msg + (f" ({len(drift)} fields corrected)." if drift else " (no drift).")))
@@ -4,7 +4,8 @@ import math
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.utils import timezone
-from api.models import DCRMFile, AnalysisResult
+from api import archive, blobs, fleet_stats, report_jobs, resets, storage_usage
+from api.models import DCRMFile, AnalysisResult, ReportArtifact, UploadSession
 
 class Command(BaseCommand):
     help = """
@@ -82,62 +83,47 @@ class Command(BaseCommand):
 
     # === NEW FEATURE: STATUS REPORT ===
     def show_status(self):
-        total_files = DCRMFile.objects.count()
-        total_analyses = AnalysisResult.objects.count()
-        latest_analysis = AnalysisResult.objects.order_by("-created_at").first()
-        health_map = {"Healthy": 0, "Warning": 0, "Faulty": 0}
-        mean_values = []
-
-        for r in AnalysisResult.objects.all():
-            status = r.result_json.get("status")
-            mean = r.result_json.get("mean_resistance")
-            if status in health_map:
-                health_map[status] += 1
-            if mean:
-                mean_values.append(float(mean))
-
-        avg_mean = round(sum(mean_values) / len(mean_values), 2) if mean_values else 0
+        stats = fleet_stats.snapshot()
+        total_files = stats.files
+        total_analyses = stats.analyses
+        # the newest result is the last entry of the rolling health window
+        latest_analysis = AnalysisResult.objects.filter(id=stats.window[-1][0]).first() if stats.window else None
+        health_map = {"Healthy": stats.healthy, "Warning": stats.warning, "Faulty": stats.faulty}
+        avg_mean = fleet_stats.avg_mean(stats)
         latest_time = (
             latest_analysis.created_at.strftime("%Y-%m-%d %H:%M:%S")
             if latest_analysis else "N/A"
         )
 
-        media_path = getattr(settings, "MEDIA_ROOT", None)
-        total_size = self.get_folder_size(media_path)
-        size_mb = total_size / (1024 * 1024)
+        usage = storage_usage.snapshot()
+        size_mb = usage.bytes / (1024 * 1024)
+        reconciled = (
+            timezone.localtime(usage.reconciled_at).strftime("%Y-%m-%d %H:%M:%S")
+            if usage.reconciled_at else "never"
+        )
 
         self.stdout.write(self.style.SUCCESS("📊 CIRCAD System Summary\n"))
         self.stdout.write(f"🧾 Total Uploaded Files:   {total_files}")
         self.stdout.write(f"📈 Total Analyses:         {total_analyses}")
+        self.stdout.write(f"🗃️  Archived Analyses:      {archive.count()}")
         self.stdout.write(f"🟢 Healthy: {health_map['Healthy']}   🟡 Warning: {health_map['Warning']}   🔴 Faulty: {health_map['Faulty']}")
         self.stdout.write(f"⚙️  Avg. Mean Resistance:   {avg_mean} µΩ")
         self.stdout.write(f"🕓 Last Analysis Time:     {latest_time}")
-        self.stdout.write(f"💾 Media Storage Used:     {size_mb:.2f} MB\n")
+        self.stdout.write(f"💾 Media Storage Used:     {size_mb:.2f} MB in {usage.files} files (reconciled {reconciled})\n")
 
         if total_files == 0 and total_analyses == 0:
             self.stdout.write(self.style.WARNING("✅ System appears clean (no files or analyses found)."))
         else:
             self.stdout.write(self.style.NOTICE("Use --all, --keep-files, or --keep-db to reset data.\n"))
 
-    def get_folder_size(self, folder):
-        """Returns total size (in bytes) of folder recursively"""
-        if not folder or not os.path.exists(folder):
-            return 0
-        total_size = 0
-        for dirpath, _, filenames in os.walk(folder):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                if os.path.isfile(fp):
-                    total_size += os.path.getsize(fp)
-        return total_size
-
     # === Resets and Deletes ===
     def reset_everything(self, force=False):
         if not self.confirm_action("⚠️  Completely reset system (DB + uploads)?", force):
             self.stdout.write("❎ Operation cancelled.")
             return
-        deleted_analyses, _ = AnalysisResult.objects.all().delete()
-        deleted_files, _ = DCRMFile.objects.all().delete()
+        deleted_analyses, deleted_files = resets.delete_all()
+        report_jobs.clear()
+        archive.clear()
         self.stdout.write(f"🧹 Deleted {deleted_analyses} analyses and {deleted_files} files from DB.")
         self.clear_media_folder()
         self.stdout.write(self.style.SUCCESS("🎯 Full system reset complete."))
@@ -146,8 +132,9 @@ class Command(BaseCommand):
         if not self.confirm_action("⚠️  Reset database but keep uploaded files?", force):
             self.stdout.write("❎ Operation cancelled.")
             return
-        deleted_analyses, _ = AnalysisResult.objects.all().delete()
-        deleted_files, _ = DCRMFile.objects.all().delete()
+        deleted_analyses, deleted_files = resets.delete_all()
+        report_jobs.clear()
+        archive.clear()
         self.stdout.write(f"🧾 DB reset: Deleted {deleted_analyses} analyses and {deleted_files} DCRM files.")
         self.stdout.write(self.style.SUCCESS("✅ Media folder retained."))
 
@@ -163,20 +150,22 @@ class Command(BaseCommand):
             file = DCRMFile.objects.get(id=file_id)
             related_analyses = AnalysisResult.objects.filter(dcrm_file=file)
             count = related_analyses.count()
+            others = blobs.references(file.file.name, file.sha256) - 1
             if not self.confirm_action(
-                f"⚠️  Delete file ID {file_id} ({os.path.basename(file.file.name)}) and {count} linked analyses?",
+                f"⚠️  Delete file ID {file_id} ({file.display_name}) and {count} linked analyses?",
                 force
             ):
                 self.stdout.write("❎ Operation cancelled.")
                 return
 
-            related_analyses.delete()
-            file_path = file.file.path
+            resets.delete_file_analyses(file)
+            name, digest = file.file.name, file.sha256
             file.delete()
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            # the stored bytes stay while other uploads of the same content point at them
+            blobs.release(name, digest)
             self.stdout.write(self.style.SUCCESS(
                 f"🗑️  Deleted file ID {file_id} and {count} linked analyses."
+                + (f" Stored file kept for {others} other upload(s) of the same content." if others else "")
             ))
         except DCRMFile.DoesNotExist:
             self.stderr.write(self.style.ERROR(f"❌ File ID {file_id} not found."))
@@ -184,7 +173,7 @@ class Command(BaseCommand):
     def delete_single_analysis(self, analysis_id, force=False):
         try:
             analysis = AnalysisResult.objects.get(id=analysis_id)
-            if not self.confirm_action(f"⚠️  Delete analysis ID {analysis_id} ({analysis.result_json.get('status')})?", force):
+            if not self.confirm_action(f"⚠️  Delete analysis ID {analysis_id} ({analysis.status})?", force):
                 self.stdout.write("❎ Operation cancelled.")
                 return
             analysis.delete()
@@ -203,4 +192,7 @@ class Command(BaseCommand):
                 shutil.rmtree(item_path, ignore_errors=True)
             else:
                 os.remove(item_path)
+        ReportArtifact.objects.all().delete()
+        UploadSession.objects.filter(status=UploadSession.UPLOADING).delete()
+        storage_usage.reconcile()
         self.stdout.write("🧺 Media folder cleared successfully.")
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import db_writer
+
+
+class Command(BaseCommand):
+    help = """
+    Run the single database writer (api.db_writer). With CIRCAD_DB_WRITER on,
+    Celery workers send their AnalysisResult inserts here and this process
+    commits them in batches, one transaction per batch. Run exactly one.
+
+    Usage examples:
+      python manage.py run_db_writer                          → Listen on CIRCAD_DB_WRITER_ADDRESS
+      python manage.py run_db_writer --address 127.0.0.1:6390 → Listen on TCP instead of the Unix socket
+      python manage.py run_db_writer --stats 60               → Log rows/batches every 60 s
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--address", help="Unix socket path or host:port (default CIRCAD_DB_WRITER_ADDRESS)")
+        parser.add_argument("--batch-size", type=int, help="Max rows per transaction (default CIRCAD_DB_WRITER_BATCH)")
+        parser.add_argument("--max-wait-ms", type=float, help="Wait for more rows before committing (default CIRCAD_DB_WRITER_MAX_WAIT_MS)")
+        parser.add_argument("--stats", type=int, default=0, help="Print throughput every N seconds (0 = off)")
+
+    def handle(self, *args, **options):
+        writer = db_writer.Writer(options["address"], batch_size=options["batch_size"], max_wait_ms=options["max_wait_ms"])
+        if not db_writer.enabled():
+            self.stdout.write(self.style.WARNING("⚠️  CIRCAD_DB_WRITER is off: workers will keep writing directly."))
+        if options["stats"]:
+            threading.Thread(target=self.report, args=(writer, options["stats"]), daemon=True).start()
+        self.stdout.write(self.style.SUCCESS(f"🗄️  Database writer listening on {writer.address} (batch ≤ {writer.batch_size} rows)"))
+        try:
+            writer.serve()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"🛑 Stopped after {writer.rows} rows in {writer.batches} transactions ({writer.errors} failed requests).")
+
+    def report(self, writer, every):
+        rows, batches = 0, 0
+        while True:
+            time.sleep(every)
+            d_rows, d_batches = writer.rows - rows, writer.batches - batches
+            rows, batches = writer.rows, writer.batches
+            self.stdout.write(f"📈 {d_rows / every:.1f} rows/s, {d_rows / max(1, d_batches):.1f} rows per transaction")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('sum_x', models.FloatField(default=0.0)),
+                ('sum_y', models.FloatField(default=0.0)),
+                ('sum_xy', models.FloatField(default=0.0)),
+                ('sum_xx', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dcrm_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_state', to='api.dcrmfile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:07
+
+from django.db import migrations, models
+from django.db.models import FloatField, Max
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Left
+
+# ids per UPDATE statement
+BATCH_SIZE = 20_000
+
+
+def backfill_columns(apps, schema_editor):
+    """
+    Copy the hot fields out of result_json with set-based UPDATEs over id
+    ranges, so each batch is one statement evaluated by the database.
+    """
+    AnalysisResult = apps.get_model("api", "AnalysisResult")
+    qs = AnalysisResult.objects.using(schema_editor.connection.alias)
+    top = qs.aggregate(top=Max("id"))["top"] or 0
+    values = {
+        "status": Left(KT("result_json__status"), 32),
+        "mean_resistance": Cast(KT("result_json__mean_resistance"), FloatField()),
+        "std_dev": Cast(KT("result_json__std_dev"), FloatField()),
+        "min_resistance": Cast(KT("result_json__min_resistance"), FloatField()),
+        "max_resistance": Cast(KT("result_json__max_resistance"), FloatField()),
+        "forecast_next_mean": Cast(KT("result_json__forecast_next_mean"), FloatField()),
+        "model_version": Left(KT("result_json__model_metadata__model_version"), 64),
+    }
+    for low in range(0, top, BATCH_SIZE):
+        qs.filter(id__gt=low, id__lte=low + BATCH_SIZE).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_forecast_state'),
+    ]
+
+    # plain ADD COLUMNs, then the backfill, then each index built once
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='forecast_next_mean',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='max_resistance',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='mean_resistance',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='min_resistance',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='status',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='std_dev',
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(backfill_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['status'], name='api_result_status'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['mean_resistance'], name='api_result_mean'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['std_dev'], name='api_result_std_dev'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['min_resistance'], name='api_result_min'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['max_resistance'], name='api_result_max'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['forecast_next_mean'], name='api_result_forecast'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['model_version'], name='api_result_model_version'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['status', 'created_at'], name='api_result_status_created'),
+        ),
+    ]
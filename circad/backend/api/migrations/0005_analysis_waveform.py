@@ -0,0 +1,72 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:12
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models, transaction
+
+# results per batch (each carries up to a few hundred data points)
+BATCH_SIZE = 500
+
+
+def _pack(points):
+    # snapshot of AnalysisWaveform.pack at the time of this migration
+    times = [p.get("time") for p in points]
+    has_time = any(t is not None for t in times)
+    return {
+        "n_points": len(points),
+        "time": np.array(times, dtype=float).astype("<f4").tobytes() if has_time else None,
+        "resistance": np.array([p.get("resistance") for p in points], dtype=float).astype("<f4").tobytes(),
+    }
+
+
+def move_data_points(apps, schema_editor):
+    """Move result_json["data_points"] into AnalysisWaveform rows, batch by batch."""
+    alias = schema_editor.connection.alias
+    AnalysisResult = apps.get_model("api", "AnalysisResult")
+    AnalysisWaveform = apps.get_model("api", "AnalysisWaveform")
+    qs = AnalysisResult.objects.using(alias).filter(result_json__has_key="data_points")
+    last_id = 0
+    while True:
+        batch = list(qs.filter(id__gt=last_id).order_by("id").only("id", "result_json")[:BATCH_SIZE])
+        if not batch:
+            break
+        with transaction.atomic(using=alias):
+            AnalysisWaveform.objects.using(alias).bulk_create([
+                AnalysisWaveform(analysis_id=r.id, **_pack(r.result_json.get("data_points") or [])) for r in batch
+            ])
+            for r in batch:
+                slim = {k: v for k, v in r.result_json.items() if k != "data_points"}
+                AnalysisResult.objects.using(alias).filter(id=r.id).update(result_json=slim)
+        last_id = batch[-1].id
+
+
+def restore_data_points(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    AnalysisResult = apps.get_model("api", "AnalysisResult")
+    AnalysisWaveform = apps.get_model("api", "AnalysisWaveform")
+    for w in AnalysisWaveform.objects.using(alias).iterator(chunk_size=BATCH_SIZE):
+        res = np.frombuffer(bytes(w.resistance), dtype="<f4").tolist()
+        t = np.frombuffer(bytes(w.time), dtype="<f4").tolist() if w.time is not None else [None] * len(res)
+        r = AnalysisResult.objects.using(alias).get(id=w.analysis_id)
+        r.result_json = {**r.result_json, "data_points": [{"time": ti, "resistance": ri} for ti, ri in zip(t, res)]}
+        AnalysisResult.objects.using(alias).filter(id=r.id).update(result_json=r.result_json)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_result_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisWaveform',
+            fields=[
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='waveform', serialize=False, to='api.analysisresult')),
+                ('n_points', models.PositiveIntegerField(default=0)),
+                ('time', models.BinaryField(null=True)),
+                ('resistance', models.BinaryField()),
+            ],
+        ),
+        migrations.RunPython(move_data_points, restore_data_points),
+    ]
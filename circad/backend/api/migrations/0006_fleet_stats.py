@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:14
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+HEALTH_SCORES = {"Healthy": 2, "Warning": 1, "Faulty": 0, "High Contact Resistance": 0}
+
+
+def seed_fleet_stats(apps, schema_editor):
+    """Create the single FleetStats row from the existing tables (see api.fleet_stats.rebuild)."""
+    alias = schema_editor.connection.alias
+    AnalysisResult = apps.get_model("api", "AnalysisResult")
+    DCRMFile = apps.get_model("api", "DCRMFile")
+    FleetStats = apps.get_model("api", "FleetStats")
+    results = AnalysisResult.objects.using(alias)
+    agg = results.aggregate(
+        analyses=Count("id"),
+        healthy=Count("id", filter=Q(status="Healthy")),
+        warning=Count("id", filter=Q(status="Warning")),
+        faulty=Count("id", filter=Q(status="Faulty")),
+        mean_sum=Sum("mean_resistance", filter=~Q(mean_resistance=0)),
+        mean_count=Count("mean_resistance", filter=~Q(mean_resistance=0)),
+    )
+    newest = results.order_by("-created_at", "-id").values_list("id", "status")[:50]
+    window = [[rid, HEALTH_SCORES.get(st, 0)] for rid, st in reversed(list(newest))]
+    FleetStats.objects.using(alias).create(
+        pk=1, files=DCRMFile.objects.using(alias).count(),
+        analyses=agg["analyses"], healthy=agg["healthy"], warning=agg["warning"], faulty=agg["faulty"],
+        mean_sum=agg["mean_sum"] or 0.0, mean_count=agg["mean_count"],
+        window=window, window_score=sum(score for _, score in window),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_analysis_waveform'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('files', models.IntegerField(default=0)),
+                ('analyses', models.IntegerField(default=0)),
+                ('healthy', models.IntegerField(default=0)),
+                ('warning', models.IntegerField(default=0)),
+                ('faulty', models.IntegerField(default=0)),
+                ('mean_sum', models.FloatField(default=0.0)),
+                ('mean_count', models.IntegerField(default=0)),
+                ('window', models.JSONField(default=list)),
+                ('window_score', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_fleet_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:17
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_storage_usage(apps, schema_editor):
+    """Create the single StorageUsage row from one walk of MEDIA_ROOT (see api.storage_usage.reconcile)."""
+    StorageUsage = apps.get_model("api", "StorageUsage")
+    total, count = 0, 0
+    for dirpath, _, filenames in os.walk(getattr(settings, "MEDIA_ROOT", None) or os.devnull):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+                count += 1
+            except FileNotFoundError:
+                pass
+    StorageUsage.objects.using(schema_editor.connection.alias).create(
+        pk=1, bytes=total, files=count, reconciled_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_fleet_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('files', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(null=True)),
+                ('drift_bytes', models.BigIntegerField(default=0)),
+                ('drift_files', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_storage_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_storage_usage'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='analysisresult',
+            name='api_result_status_created',
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['created_at', 'id'], name='api_result_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='analysisresult',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='api_result_status_created_id'),
+        ),
+    ]
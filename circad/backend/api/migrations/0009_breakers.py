@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Breaker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asset_id', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(blank=True, max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dcrmfile',
+            name='tested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forecaststate',
+            name='last_tested_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='forecaststate',
+            name='dcrm_file',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forecast_state', to='api.dcrmfile'),
+        ),
+        migrations.AddField(
+            model_name='dcrmfile',
+            name='breaker',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='api.breaker'),
+        ),
+        migrations.AddField(
+            model_name='forecaststate',
+            name='breaker',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forecast_state', to='api.breaker'),
+        ),
+        migrations.CreateModel(
+            name='BreakerMeasurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tested_at', models.DateTimeField()),
+                ('status', models.CharField(blank=True, max_length=32, null=True)),
+                ('mean_resistance', models.FloatField(null=True)),
+                ('std_dev', models.FloatField(null=True)),
+                ('min_resistance', models.FloatField(null=True)),
+                ('max_resistance', models.FloatField(null=True)),
+                ('slope', models.FloatField(null=True)),
+                ('analysis', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='measurement', to='api.analysisresult')),
+                ('breaker', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='api.breaker')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['breaker', 'tested_at', 'id'], name='api_measurement_breaker_at')],
+            },
+        ),
+    ]
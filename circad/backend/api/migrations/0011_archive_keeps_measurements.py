@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_report_artifacts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='breakermeasurement',
+            name='analysis',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='measurement', to='api.analysisresult'),
+        ),
+    ]
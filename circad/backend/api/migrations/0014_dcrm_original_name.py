@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_upload_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dcrmfile',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_files(apps, schema_editor):
+    """Fill dcrm_file from the analysis link; measurements already archived have none to go by."""
+    alias = schema_editor.connection.alias
+    AnalysisResult = apps.get_model("api", "AnalysisResult")
+    BreakerMeasurement = apps.get_model("api", "BreakerMeasurement")
+    BreakerMeasurement.objects.using(alias).filter(analysis__isnull=False).update(
+        dcrm_file=Subquery(AnalysisResult.objects.filter(id=OuterRef("analysis_id")).values("dcrm_file_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_dcrm_original_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='breakermeasurement',
+            name='dcrm_file',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='api.dcrmfile'),
+        ),
+        migrations.RunPython(link_files, migrations.RunPython.noop),
+    ]
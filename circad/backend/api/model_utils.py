@@ -1,52 +1,366 @@
 # circad/backend/api/model_utils.py
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
 from pathlib import Path
-from joblib import load
 import numpy as np
+from django.conf import settings
+
+from .flat_forest import FlatForest, parity_error, probe_rows
+
+logger = logging.getLogger(__name__)
 
 MODEL_FILE = Path(__file__).resolve().parent.parent / "data" / "model" / "contact_health.pkl"
+DEFAULT_MODEL = "contact_health"
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ModelEntry:
+    """One loaded model package plus what it cost to load."""
+
+    def __init__(self, name, path, pkg, stamp, sha256, load_seconds, memory_bytes):
+        self.name = name
+        self.path = path
+        self.pkg = pkg
+        self.stamp = stamp              # (mtime_ns, size) of path when loaded
+        self.sha256 = sha256
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.loaded_at = datetime.now(timezone.utc)
+        meta = pkg.get("meta") if isinstance(pkg, dict) else None
+        meta = meta if isinstance(meta, dict) else {}
+        # explicit version in the package wins; otherwise the file hash identifies it
+        self.version = str(meta.get("version") or pkg.get("version") or sha256[:12]) if isinstance(pkg, dict) else sha256[:12]
+        self.model_name = meta.get("name") or name
+        self.flat = None                # FlatForest twin of pkg["model"], if it passed the parity check
 
-_model_pkg = None
+    def describe(self):
+        return {
+            "name": self.name,
+            "model_name": self.model_name,
+            "version": self.version,
+            "sha256": self.sha256,
+            "path": str(self.path),
+            "loaded_at": self.loaded_at.isoformat(),
+            "load_seconds": round(self.load_seconds, 4),
+            "memory_mb": round(self.memory_bytes / (1024 * 1024), 2),
+            "flat_forest": ({"trees": self.flat.n_trees, "depth": self.flat.depth, "kb": round(self.flat.nbytes / 1024, 1)}
+                            if self.flat is not None else None),
+        }
 
-def load_model_package():
-    global _model_pkg
-    if _model_pkg is not None:
-        return _model_pkg
+
+def _rss_bytes():
+    """Resident set size of this process (Linux /proc), or 0 where it is not available."""
     try:
-        if MODEL_FILE.exists():
-            pkg = load(MODEL_FILE)
-            # expects {'model': clf, 'label_encoder': le}
-            _model_pkg = pkg
-            print("Loaded model package:", MODEL_FILE)
-        else:
-            print("Model not found at:", MODEL_FILE)
-            _model_pkg = None
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ModelRegistry:
+    """
+    Named model packages loaded from joblib files.
+
+    get() stats the file on every call; when (mtime_ns, size) changed the
+    package is unpickled again under a per-registry lock and swapped in as a
+    new ModelEntry, so callers holding the old entry keep a consistent
+    model/label_encoder/version triple until they are done with it.
+    """
+
+    def __init__(self, paths):
+        self._paths = {name: Path(p) for name, p in paths.items()}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path):
+        with self._lock:
+            self._paths[name] = Path(path)
+            self._entries.pop(name, None)
+
+    def names(self):
+        return list(self._paths)
+
+    def get(self, name=DEFAULT_MODEL):
+        """returns: the current ModelEntry for name, or None if it cannot be loaded"""
+        path = self._paths.get(name)
+        if path is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            entry = self._entries.get(name)
+            if entry is not None:
+                # keep serving the last good package while the file is being replaced
+                return entry
+            logger.warning("Model %s not found at: %s", name, path)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(name)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.stamp == stamp:
+                return entry      # another thread reloaded it while we waited
+            fresh = self._load(name, path, stamp)
+            if fresh is not None:
+                self._entries[name] = fresh
+                return fresh
+            return entry
+
+    def _load(self, name, path, stamp):
+        # memory_bytes is the growth of the process RSS over the unpickle
+        # (including modules it had to import the first time). Exact
+        # allocation tracing (CIRCAD_MODEL_TRACE_MEMORY) slows every thread
+        # of the process down while it runs, so it is off outside benchmarks.
+        trace = getattr(settings, "CIRCAD_MODEL_TRACE_MEMORY", False)
+        tracing = tracemalloc.is_tracing()
+        if trace and not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0] if trace else _rss_bytes()
+        t0 = time.perf_counter()
+        try:
+            from joblib import load   # deferred: joblib/sklearn are only needed once a model is loaded
+            pkg = load(path)   # expects {'model': clf, 'label_encoder': le}
+            after = tracemalloc.get_traced_memory()[0] if trace else _rss_bytes()
+            memory = max(0, after - before)
+            sha256 = _sha256(path)
+        except Exception as e:
+            logger.exception("Failed loading model package %s from %s: %s", name, path, e)
+            return None
+        finally:
+            if trace and not tracing:
+                tracemalloc.stop()
+        entry = ModelEntry(name, path, pkg, stamp, sha256, time.perf_counter() - t0, memory)
+        if getattr(settings, "CIRCAD_FLAT_FOREST", True):
+            entry.flat = _flatten(name, pkg)
+        logger.info(
+            "Loaded model package %s version %s from %s in %.3fs (%.1f MB)",
+            name, entry.version, path, entry.load_seconds, memory / (1024 * 1024),
+        )
+        return entry
+
+    def preload(self, background=False):
+        """Load every registered package now instead of on the first request."""
+        if background:
+            threading.Thread(target=self.preload, name="circad-model-preload", daemon=True).start()
+            return
+        for name in self.names():
+            self.get(name)
+
+    def describe(self):
+        out = []
+        for name in self.names():
+            entry = self._entries.get(name)
+            out.append(entry.describe() if entry else {"name": name, "path": str(self._paths[name]), "loaded": False})
+        return out
+
+
+FLAT_FOREST_TOLERANCE = 1e-9
+
+def _flatten(name, pkg):
+    """
+    Export pkg["model"] to a FlatForest and keep it only if it reproduces
+    sklearn's predict_proba on probe rows; otherwise sklearn stays in charge.
+    """
+    clf = pkg.get("model") if isinstance(pkg, dict) else None
+    if clf is None or not hasattr(clf, "estimators_"):
+        return None
+    try:
+        flat = FlatForest.from_sklearn(clf)
+        err = parity_error(flat, clf, probe_rows(flat))
     except Exception as e:
-        print("Failed loading model package:", e)
-        _model_pkg = None
-    return _model_pkg
+        logger.warning("Model %s: flat forest export failed (%s); using sklearn", name, e)
+        return None
+    if err > FLAT_FOREST_TOLERANCE:
+        logger.warning("Model %s: flat forest differs from sklearn by %.3g; using sklearn", name, err)
+        return None
+    logger.info("Model %s: flat forest with %d trees (depth %d, %.1f KB)", name, flat.n_trees, flat.depth, flat.nbytes / 1024)
+    return flat
 
-def predict_with_confidence(features):
+
+registry = ModelRegistry(getattr(settings, "CIRCAD_MODELS", {DEFAULT_MODEL: MODEL_FILE}))
+
+
+def get_model(name=DEFAULT_MODEL):
+    return registry.get(name)
+
+def load_model_package(name=DEFAULT_MODEL):
+    entry = registry.get(name)
+    return entry.pkg if entry else None
+
+def model_fingerprint(name=DEFAULT_MODEL):
+    """
+    SHA-256 of the loaded model file (re-hashed only when the registry reloads it).
+    returns: hex digest, or "none" if there is no model
+    """
+    entry = registry.get(name)
+    return entry.sha256 if entry else "none"
+
+class _Pending:
+    __slots__ = ("row", "entry", "result", "done")
+
+    def __init__(self, row, entry):
+        self.row = row
+        self.entry = entry
+        self.result = (None, None)
+        self.done = threading.Event()
+
+
+class InferenceBatcher:
+    """
+    Coalesces single-row predictions from concurrent callers (thread pools,
+    ASGI) into one predict_proba call per model entry.
+
+    The collector thread takes the first queued request, then keeps taking
+    more until it has max_batch rows, max_wait_ms has passed, or every
+    caller currently blocked in predict() is in the batch - so a lone
+    caller is never held back waiting for company. Used only when
+    CIRCAD_INFERENCE_BATCHING is on (threaded Celery pools, ASGI).
+    """
+
+    def __init__(self, max_batch=64, max_wait_ms=5.0):
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._active = 0
+
+    def _ensure_started(self):
+        # threads do not survive fork (Celery prefork): restart in each child
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._active = 0
+            threading.Thread(target=self._run, name="circad-inference-batcher", daemon=True).start()
+            self._pid = os.getpid()
+
+    def predict(self, row, entry):
+        """Block until the batch containing row is scored; returns (label, confidence)."""
+        self._ensure_started()
+        item = _Pending(row, entry)
+        with self._lock:
+            self._active += 1
+        try:
+            self._queue.put(item)
+            item.done.wait()
+        finally:
+            with self._lock:
+                self._active -= 1
+        return item.result
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or len(batch) >= self._active:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item.entry), []).append(item)
+            for items in groups.values():
+                try:
+                    results = predict_batch_with_confidence([it.row for it in items], items[0].entry)
+                    for it, res in zip(items, results):
+                        it.result = res
+                except Exception as e:
+                    logger.exception("Batched predict error: %s", e)
+                finally:
+                    for it in items:
+                        it.done.set()
+
+
+_batcher = None
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        _batcher = InferenceBatcher(
+            getattr(settings, "CIRCAD_INFERENCE_BATCH_SIZE", 64),
+            getattr(settings, "CIRCAD_INFERENCE_MAX_WAIT_MS", 5.0),
+        )
+    return _batcher
+
+def predict_with_confidence(features, entry=None, batched=None):
     """
     features: list-like numeric [mean, std, slope, min, max]
+    batched: route through the shared InferenceBatcher (default CIRCAD_INFERENCE_BATCHING)
     returns: (label_string, confidence_float between 0..1) or (None, None) if no model
     """
-    pkg = load_model_package()
-    if not pkg:
-        return None, None
+    if entry is None:
+        entry = get_model()
+    if not entry:
+        return (None, None)
+    if batched is None:
+        batched = getattr(settings, "CIRCAD_INFERENCE_BATCHING", False)
+    if batched:
+        return get_batcher().predict(features, entry)
+    return predict_batch_with_confidence([features], entry)[0]
+
+def predict_batch_with_confidence(rows, entry=None):
+    """
+    rows: 2D list-like, one [mean, std, slope, min, max] row per sample
+    entry: ModelEntry to score with (default: the registry's current one);
+           pass the entry you record in model_metadata so the two cannot diverge
+    returns: list of (label_string, confidence_float) per row, scored with a
+             single predict_proba call; (None, None) entries if no model
+    """
+    empty = [(None, None)] * len(rows)
+    if entry is None:
+        entry = get_model()
+    if not entry or not entry.pkg or not len(rows):
+        return empty
     try:
-        clf = pkg.get("model")
-        le = pkg.get("label_encoder")
-        X = np.array(features, dtype=float).reshape(1, -1)
-        if hasattr(clf, "predict_proba"):
-            proba = clf.predict_proba(X)[0]
-            idx = int(np.argmax(proba))
-            label = le.inverse_transform([idx])[0]
-            confidence = float(proba[idx])
-            return label, confidence
+        clf = entry.pkg.get("model")
+        le = entry.pkg.get("label_encoder")
+        X = np.array(rows, dtype=float).reshape(len(rows), -1)
+        if entry.flat is not None and np.isfinite(X).all():
+            proba = entry.flat.predict_proba(X)
+        elif hasattr(clf, "predict_proba"):
+            proba = clf.predict_proba(X)
+        else:
+            proba = None
+        if proba is not None:
+            idx = np.argmax(proba, axis=1)
+            labels = le.inverse_transform(idx)
+            confidences = proba[np.arange(len(idx)), idx]
+            return [(label, float(conf)) for label, conf in zip(labels, confidences)]
         else:
-            pred = clf.predict(X)[0]
-            label = le.inverse_transform([pred])[0] if le is not None else str(pred)
-            return label, 1.0
+            preds = clf.predict(X)
+            labels = le.inverse_transform(preds) if le is not None else [str(p) for p in preds]
+            return [(label, 1.0) for label in labels]
     except Exception as e:
-        print("Model predict error:", e)
-        return None, None
+        logger.exception("Model predict error: %s", e)
+        return empty
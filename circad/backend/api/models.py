@@ -1,14 +1,360 @@
-from django.db import models
+import os
+import uuid
+
+import numpy as np
+from django.db import models, router, transaction
+
+class Breaker(models.Model):
+    """A circuit breaker under test, identified by its plant asset id; uploads link to it."""
+    asset_id = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.asset_id
+
+
+class DCRMFileQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # no post_save signals here; keep the fleet file count in step explicitly
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            from . import fleet_stats
+            fleet_stats.add_file(using=self.db, count=len(created))
+        return created
+
 
 class DCRMFile(models.Model):
     file = models.FileField(upload_to="uploads/")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)  # hex digest of the uploaded bytes
+    breaker = models.ForeignKey(Breaker, null=True, blank=True, on_delete=models.SET_NULL, related_name="files")
+    tested_at = models.DateTimeField(null=True, blank=True)  # when the breaker was tested; uploaded_at if unknown
+    batch = models.ForeignKey("UploadBatch", null=True, blank=True, on_delete=models.SET_NULL, related_name="files")
+    original_name = models.CharField(max_length=255, blank=True)   # as uploaded; file is the content-addressed blob
+
+    objects = DCRMFileQuerySet.as_manager()
 
     def __str__(self):
         return self.file.name
 
+    @property
+    def display_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+
+
+def result_columns(result_json):
+    """The hot result_json fields, as stored in AnalysisResult's own columns."""
+    r = result_json if isinstance(result_json, dict) else {}
+
+    def num(key):
+        v = r.get(key)
+        return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None
+
+    meta = r.get("model_metadata") if isinstance(r.get("model_metadata"), dict) else {}
+    return {
+        "status": str(r["status"])[:32] if r.get("status") else None,
+        "mean_resistance": num("mean_resistance"),
+        "std_dev": num("std_dev"),
+        "min_resistance": num("min_resistance"),
+        "max_resistance": num("max_resistance"),
+        "forecast_next_mean": num("forecast_next_mean"),
+        "model_version": str(meta["model_version"])[:64] if meta.get("model_version") else None,
+    }
+
+
+class AnalysisResultQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(); split the waveform and copy the columns here instead
+        objs = list(objs)
+        waveforms = [obj.split_waveform() for obj in objs]
+        for obj in objs:
+            obj.sync_columns()
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            AnalysisWaveform.objects.using(self.db).bulk_create([
+                AnalysisWaveform(analysis=obj, **AnalysisWaveform.pack(points))
+                for obj, points in zip(objs, waveforms) if points is not None and obj.pk is not None
+            ])
+            # no post_save signals here; keep the fleet counters in step explicitly
+            from . import breakers, fleet_stats, forecasting
+            saved = [obj for obj in objs if obj.pk is not None]
+            fleet_stats.add_results(saved, using=self.db)
+            breakers.add_measurements(saved, using=self.db)
+            # the files' forecast sums are rebuilt from their history on next use
+            forecasting.invalidate_files({obj.dcrm_file_id for obj in saved}, using=self.db)
+        return created
+
 
 class AnalysisResult(models.Model):
+    """
+    One analyze_dcrm run. result_json is the output minus data_points, which
+    save() and bulk_create() move to AnalysisWaveform; the fields below it
+    are indexed copies of its hot values, filled from result_json at the same
+    time (a queryset .update(result_json=...) does neither).
+    """
     dcrm_file = models.ForeignKey(DCRMFile, on_delete=models.CASCADE, related_name="results")
     result_json = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # nullable so they can be added with a plain ADD COLUMN (no table rebuild)
+    status = models.CharField(max_length=32, null=True, blank=True)
+    mean_resistance = models.FloatField(null=True)
+    std_dev = models.FloatField(null=True)
+    min_resistance = models.FloatField(null=True)
+    max_resistance = models.FloatField(null=True)
+    forecast_next_mean = models.FloatField(null=True)
+    model_version = models.CharField(max_length=64, null=True, blank=True)
+
+    objects = AnalysisResultQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"], name="api_result_status"),
+            models.Index(fields=["mean_resistance"], name="api_result_mean"),
+            models.Index(fields=["std_dev"], name="api_result_std_dev"),
+            models.Index(fields=["min_resistance"], name="api_result_min"),
+            models.Index(fields=["max_resistance"], name="api_result_max"),
+            models.Index(fields=["forecast_next_mean"], name="api_result_forecast"),
+            models.Index(fields=["model_version"], name="api_result_model_version"),
+            # list_results keyset pages: (created_at, id) order, optionally within one status
+            models.Index(fields=["created_at", "id"], name="api_result_created_id"),
+            models.Index(fields=["status", "created_at", "id"], name="api_result_status_created_id"),
+        ]
+
+    def sync_columns(self):
+        for field, value in result_columns(self.result_json).items():
+            setattr(self, field, value)
+
+    def split_waveform(self):
+        """
+        Take data_points out of result_json (without touching the caller's dict).
+        returns: the data_points list, or None if result_json has none
+        """
+        if not isinstance(self.result_json, dict) or "data_points" not in self.result_json:
+            return None
+        points = self.result_json["data_points"]
+        self.result_json = {k: v for k, v in self.result_json.items() if k != "data_points"}
+        return points or []
+
+    def save(self, *args, **kwargs):
+        points = self.split_waveform()
+        self.sync_columns()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "result_json" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | set(RESULT_COLUMNS)
+        # one transaction for the row, its waveform and the post_save
+        # bookkeeping (forecast sums, fleet stats)
+        with transaction.atomic(using=kwargs.get("using") or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+            if points is not None:
+                AnalysisWaveform.objects.using(self._state.db).update_or_create(
+                    analysis=self, defaults=AnalysisWaveform.pack(points),
+                )
+
+    def data_points(self):
+        """The chart waveform as the [{"time", "resistance"}, ...] list analyze_dcrm produced."""
+        try:
+            return self.waveform.points()
+        except AnalysisWaveform.DoesNotExist:
+            return []
+
+
+RESULT_COLUMNS = tuple(result_columns({}))
+
+
+class AnalysisWaveform(models.Model):
+    """
+    The downsampled chart waveform of one analysis, kept out of result_json
+    as packed little-endian float32 columns so list queries never read it.
+    """
+    analysis = models.OneToOneField(AnalysisResult, on_delete=models.CASCADE, related_name="waveform", primary_key=True)
+    n_points = models.PositiveIntegerField(default=0)
+    time = models.BinaryField(null=True)
+    resistance = models.BinaryField()
+
+    DTYPE = np.dtype("<f4")
+
+    @classmethod
+    def pack(cls, points):
+        """data_points list -> field values for AnalysisWaveform(**...)"""
+        points = points or []
+        times = [p.get("time") for p in points]
+        has_time = any(t is not None for t in times)
+        res = np.array([p.get("resistance") for p in points], dtype=float)
+        return {
+            "n_points": len(points),
+            "time": np.array(times, dtype=float).astype(cls.DTYPE).tobytes() if has_time else None,
+            "resistance": res.astype(cls.DTYPE).tobytes(),
+        }
+
+    def arrays(self):
+        """returns: (time float32 array or None, resistance float32 array)"""
+        res = np.frombuffer(bytes(self.resistance), dtype=self.DTYPE)
+        t = np.frombuffer(bytes(self.time), dtype=self.DTYPE) if self.time is not None else None
+        return t, res
+
+    def points(self):
+        t, res = self.arrays()
+        # str() of a float32 is its shortest round-trip form: 50.123, not 50.12300109863281
+        res = [float(str(v)) for v in res]
+        t = [float(str(v)) for v in t] if t is not None else [None] * len(res)
+        return [{"time": ti, "resistance": ri} for ti, ri in zip(t, res)]
+
+
+class BreakerMeasurement(models.Model):
+    """
+    One test of a breaker: the summary features of one analysis, indexed on
+    (breaker, tested_at) so a breaker's history, trend and forecast rebuild
+    are index range scans (api.breakers). Written with each AnalysisResult
+    of a file linked to a breaker and deleted with it; archiving the result
+    (api.archive) only clears the analysis link, so the history stays
+    complete, and dcrm_file still ties it to its upload for delete_file.
+    """
+    # indexed by api_measurement_breaker_at, which leads with breaker
+    breaker = models.ForeignKey(Breaker, on_delete=models.CASCADE, related_name="measurements", db_index=False)
+    analysis = models.OneToOneField(AnalysisResult, null=True, on_delete=models.CASCADE, related_name="measurement")
+    dcrm_file = models.ForeignKey(DCRMFile, null=True, on_delete=models.CASCADE, related_name="measurements")
+    tested_at = models.DateTimeField()
+    status = models.CharField(max_length=32, null=True, blank=True)
+    mean_resistance = models.FloatField(null=True)
+    std_dev = models.FloatField(null=True)
+    min_resistance = models.FloatField(null=True)
+    max_resistance = models.FloatField(null=True)
+    slope = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["breaker", "tested_at", "id"], name="api_measurement_breaker_at"),
+        ]
+
+
+class ForecastState(models.Model):
+    """
+    Running least-squares sums over one asset's mean-resistance history
+    (x = position in history, y = mean_resistance), so forecasts are a single
+    row read instead of a refit over every past analysis (see api.forecasting).
+    """
+    # one of the two: a breaker's history across all its uploads, or a single unlinked file's
+    dcrm_file = models.OneToOneField(DCRMFile, null=True, on_delete=models.CASCADE, related_name="forecast_state")
+    breaker = models.OneToOneField(Breaker, null=True, on_delete=models.CASCADE, related_name="forecast_state")
+    last_tested_at = models.DateTimeField(null=True)  # newest point folded in (breaker histories)
+    n = models.PositiveIntegerField(default=0)
+    sum_x = models.FloatField(default=0.0)
+    sum_y = models.FloatField(default=0.0)
+    sum_xy = models.FloatField(default=0.0)
+    sum_xx = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def sums(self):
+        return (self.n, self.sum_x, self.sum_y, self.sum_xy, self.sum_xx)
+
+
+class AnalysisCacheEntry(models.Model):
+    """
+    Cached analyze_dcrm output, keyed by what determines it: the file bytes,
+    the model package and the analysis code version (see api.result_cache).
+    """
+    key = models.CharField(max_length=64, unique=True)
+    file_sha256 = models.CharField(max_length=64)
+    model_fingerprint = models.CharField(max_length=64, db_index=True)
+    analysis_version = models.CharField(max_length=32)
+    payload = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class ReportArtifact(models.Model):
+    """
+    A PDF report, keyed by the analysis ids it covers and its options (see
+    api.report_jobs). Built by generate_pdf_report_task, which records its
+    progress here; an identical request is served the stored file.
+    """
+    PENDING, RUNNING, READY, FAILED = "pending", "running", "ready", "failed"
+
+    key = models.CharField(max_length=64, unique=True)
+    analysis_ids = models.JSONField(default=list)
+    options = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, default=PENDING)
+    progress = models.PositiveIntegerField(default=0)   # pages rendered
+    total = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to="reports/", blank=True)
+    size_bytes = models.PositiveIntegerField(default=0)
+    task_id = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload in progress (see api.upload_sessions): chunks are
+    written at their offset into MEDIA_ROOT/uploads/partial/<id>.part and
+    `received` is how far the file is complete. Finalizing moves it into
+    uploads/ as a DCRMFile.
+    """
+    UPLOADING, COMPLETE = "uploading", "complete"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()                    # declared total bytes
+    received = models.BigIntegerField(default=0)       # bytes stored, from offset 0
+    sha256 = models.CharField(max_length=64, blank=True)   # expected digest, checked at finalize
+    breaker = models.ForeignKey(Breaker, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    tested_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=16, default=UPLOADING)
+    dcrm_file = models.ForeignKey(DCRMFile, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class UploadBatch(models.Model):
+    """
+    CSVs uploaded together in one zip or tar (see api.bulk_upload) and
+    analyzed by one Celery group. Progress is read from the files' results;
+    `failed` counts files whose analysis task raised.
+    """
+    archive_name = models.CharField(max_length=255)
+    total = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.JSONField(default=list)            # entry names that are not CSVs
+    group_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class FleetStats(models.Model):
+    """
+    Fleet-wide counters, a single row (pk=1) kept current by api.fleet_stats
+    whenever a file or result is created or deleted, so the status endpoints
+    read one row instead of scanning AnalysisResult.
+    """
+    files = models.IntegerField(default=0)
+    analyses = models.IntegerField(default=0)
+    healthy = models.IntegerField(default=0)
+    warning = models.IntegerField(default=0)
+    faulty = models.IntegerField(default=0)
+    mean_sum = models.FloatField(default=0.0)       # over results with a non-zero mean_resistance
+    mean_count = models.IntegerField(default=0)
+    # [[analysis_id, score], ...] for the newest CIRCAD_HEALTH_WINDOW results, oldest first
+    window = models.JSONField(default=list)
+    window_score = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class StorageUsage(models.Model):
+    """
+    Bytes and files under MEDIA_ROOT, a single row (pk=1) adjusted by
+    api.storage_usage whenever an upload or sidecar is written or removed,
+    so the status endpoints do not walk the media tree. reconcile() resets
+    it from a walk and records how far the tracked figures had drifted.
+    """
+    bytes = models.BigIntegerField(default=0)
+    files = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True)
+    drift_bytes = models.BigIntegerField(default=0)   # walked - tracked at the last reconcile
+    drift_files = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,418 @@
+# circad/backend/api/preprocessing.py
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# pandas is imported where CSVs are parsed, not at module load: views and
+# management commands import this module without touching a CSV.
+
+# rows parsed per chunk in streaming mode (~4 MB of float64 per column)
+DEFAULT_CHUNK_ROWS = 500_000
+
+
+def detect_columns(columns):
+    """
+    Pick the Resistance / Time columns from a CSV header the same way
+    analyze_dcrm always has: first column whose name contains the keyword.
+    returns: (resistance_col or None, time_col or None)
+    """
+    resistance_col = next((col for col in columns if "resistance" in col.lower()), None)
+    time_col = next((col for col in columns if "time" in col.lower()), None)
+    return resistance_col, time_col
+
+
+def read_header(file_path):
+    """Return the column names of a CSV without parsing any rows."""
+    import pandas as pd
+    return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+
+def iter_dcrm_chunks(file_path, resistance_col, time_col=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yield (resistance, time) float64 arrays chunk by chunk, with rows that have
+    no numeric resistance dropped. time is None when the file has no time column.
+    Only the two needed columns are parsed, so memory is bounded by chunk_rows.
+    """
+    import pandas as pd
+    usecols = [resistance_col] if time_col is None else [resistance_col, time_col]
+    reader = pd.read_csv(file_path, usecols=usecols, chunksize=chunk_rows)
+    for chunk in reader:
+        y = pd.to_numeric(chunk[resistance_col], errors="coerce").to_numpy(dtype=float)
+        keep = ~np.isnan(y)
+        t = None
+        if time_col is not None:
+            t = pd.to_numeric(chunk[time_col], errors="coerce").to_numpy(dtype=float)[keep]
+        yield y[keep], t
+
+
+def iter_array_chunks(y, t=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield (resistance, time) slices of in-memory or memory-mapped columns."""
+    for start in range(0, y.shape[0], chunk_rows):
+        stop = start + chunk_rows
+        yield np.asarray(y[start:stop]), (None if t is None else np.asarray(t[start:stop]))
+
+
+# === Columnar sidecar =====================================================
+# After the first analysis the cleaned series is kept next to the CSV as a
+# float64 .npy of shape (2, n) (resistance row, time row) or (1, n) when the
+# CSV has no time column. The CSV itself is never modified (audit copy).
+
+def sidecar_path(csv_path):
+    return Path(csv_path).with_suffix(".npy")
+
+
+def open_sidecar(csv_path):
+    """
+    Memory-map an up-to-date sidecar.
+    returns: (resistance, time or None) read-only arrays, or None if there is
+             no sidecar or it is older than the CSV
+    """
+    path = sidecar_path(csv_path)
+    try:
+        if path.stat().st_mtime_ns < Path(csv_path).stat().st_mtime_ns:
+            return None
+        arr = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if arr.ndim != 2 or arr.shape[0] not in (1, 2) or arr.dtype != np.float64:
+        return None
+    return arr[0], (arr[1] if arr.shape[0] == 2 else None)
+
+
+def save_sidecar(csv_path, y, t=None):
+    """
+    Write the sidecar for an in-memory series (atomically).
+    returns: (bytes, files) added on disk, see SidecarWriter.close
+    """
+    writer = SidecarWriter(csv_path, len(y), t is not None)
+    writer.write(y, t)
+    return writer.close()
+
+
+def remove_sidecar(csv_path):
+    """returns: (bytes, files) removed from disk"""
+    path = sidecar_path(csv_path)
+    try:
+        size = path.stat().st_size
+        os.remove(path)
+    except FileNotFoundError:
+        return 0, 0
+    return size, 1
+
+
+class SidecarWriter:
+    """
+    Writes a sidecar chunk by chunk with plain positioned writes (the row count
+    must be known up front), then moves it into place, so readers never see a
+    partial file. Each writer has its own temp file: two workers analyzing the
+    same blob (api.blobs) at once each install a complete sidecar.
+    """
+
+    def __init__(self, csv_path, n, has_time):
+        self.path = sidecar_path(csv_path)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp")
+        self.tmp = Path(tmp)
+        self.n = int(n)
+        self.offset = 0
+        self.fh = os.fdopen(fd, "wb")
+        np.lib.format.write_array_header_1_0(
+            self.fh, {"descr": "<f8", "fortran_order": False, "shape": (2 if has_time else 1, self.n)}
+        )
+        self.data_start = self.fh.tell()
+
+    def write(self, y, t=None):
+        k = len(y)
+        self.fh.seek(self.data_start + self.offset * 8)
+        self.fh.write(np.ascontiguousarray(y, dtype="<f8").tobytes())
+        if t is not None:
+            self.fh.seek(self.data_start + (self.n + self.offset) * 8)
+            self.fh.write(np.ascontiguousarray(t, dtype="<f8").tobytes())
+        self.offset += k
+
+    def close(self):
+        """returns: (bytes, files) added on disk, net of a sidecar this one replaced"""
+        self.fh.close()
+        size = os.stat(self.tmp).st_size
+        try:
+            # link() fails if a concurrent writer installed one first, so only one of them counts a new file
+            os.link(self.tmp, self.path)
+            os.remove(self.tmp)
+            return size, 1
+        except FileExistsError:
+            pass
+        try:
+            replaced = self.path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(self.tmp, self.path)
+        return size - replaced, 0
+
+    def abort(self):
+        self.fh.close()
+        try:
+            os.remove(self.tmp)
+        except FileNotFoundError:
+            pass
+
+
+def load_chart_series(csv_path, n_out):
+    """
+    Downsampled (time, resistance) for charts straight from the sidecar, or
+    None when the file has not been analyzed into one yet.
+    """
+    sidecar = open_sidecar(csv_path)
+    if sidecar is None:
+        return None
+    y, t = sidecar
+    if y.shape[0] <= n_out:
+        return downsample(np.asarray(y), None if t is None else np.asarray(t), n_out)
+    decimator = MinMaxDecimator(y.shape[0], n_out)
+    for y_chunk, t_chunk in iter_array_chunks(y, t):
+        decimator.update(y_chunk, t_chunk)
+    return decimator.points()
+
+
+# cache-sized block for the fused feature kernel (64k float64 = 512 KB)
+BLOCK_ROWS = 1 << 16
+_BLOCK_INDEX = np.arange(BLOCK_ROWS, dtype=float)
+
+
+class RunningStats:
+    """
+    Mergeable accumulator for the DCRM summary features (mean, std, min, max and
+    the least-squares slope of resistance vs. sample index).
+
+    Input is folded in cache-sized blocks: every reduction for a block runs
+    while it is still in cache, so the array is streamed from memory once, and
+    the slope comes from the index/resistance co-moment in closed form.
+    Blocks are merged with Chan's parallel update, so the result does not
+    depend on how the series was split and no chunk has to be kept around.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0      # sum of squared deviations of y
+        self.cxy = 0.0     # co-moment of (index, y)
+        self.min = np.inf
+        self.max = -np.inf
+        self._dev = None   # scratch buffer, one block long
+
+    def update(self, y):
+        y = np.ascontiguousarray(y, dtype=float)
+        for start in range(0, y.size, BLOCK_ROWS):
+            self._fold(y[start:start + BLOCK_ROWS])
+        return self
+
+    def _fold(self, y):
+        k = y.size
+        if self._dev is None:
+            self._dev = np.empty(BLOCK_ROWS)
+        total = float(y.sum())
+        mean_k = total / k
+        dev = np.subtract(y, mean_k, out=self._dev[:k])
+        m2_k = float(dev @ dev)
+        # Σ (i - (k-1)/2) * dev_i, with Σ dev_i taken from the block sum
+        cxy_k = float(_BLOCK_INDEX[:k] @ dev) - (k - 1) / 2.0 * (total - k * mean_k)
+        block_min = float(y.min())
+        block_max = float(y.max())
+
+        n = self.n + k
+        x_mean_a = (self.n - 1) / 2.0
+        x_mean_b = self.n + (k - 1) / 2.0
+        delta_y = mean_k - self.mean
+        w = self.n * k / n
+        self.m2 += m2_k + delta_y * delta_y * w
+        self.cxy += cxy_k + (x_mean_b - x_mean_a) * delta_y * w
+        self.mean += delta_y * k / n
+        self.n = n
+        self.min = min(self.min, block_min)
+        self.max = max(self.max, block_max)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / self.n)) if self.n else 0.0
+
+    @property
+    def slope(self):
+        if self.n < 2:
+            return 0.0
+        # sum of squared deviations of 0..n-1 in closed form
+        sxx = self.n * (self.n * self.n - 1) / 12.0
+        return float(self.cxy / sxx)
+
+    def features(self):
+        """returns: (mean, std, min, max, slope)"""
+        return float(self.mean), self.std, float(self.min), float(self.max), self.slope
+
+
+def compute_basic_features(y):
+    """(mean, std, min, max, slope) of a resistance array in one blocked pass."""
+    return RunningStats().update(y).features()
+
+
+class PhaseProfile:
+    """
+    Splits a DCRM curve into main-contact and arcing-contact regions and
+    summarises each one. A sample belongs to the arcing region when its
+    resistance is above threshold (see phase_threshold).
+
+    Per region: sample count, mean resistance, duration (sum of time steps
+    starting in the region, or step count without a time column) and spikes
+    (sample-to-sample jumps larger than spike_step). bounces counts every
+    main -> arcing crossing after the first one, i.e. re-separations.
+
+    Fed chunk by chunk like RunningStats; the last sample is carried over so
+    steps across chunk boundaries are counted once.
+    """
+
+    REGIONS = ("main_contact", "arcing_contact")
+
+    def __init__(self, threshold, spike_step):
+        self.threshold = float(threshold)
+        self.spike_step = float(spike_step)
+        self.count = np.zeros(2, dtype=np.int64)
+        self.total = np.zeros(2)
+        self.duration = np.zeros(2)
+        self.spikes = np.zeros(2, dtype=np.int64)
+        self.rises = 0
+        self._last = None   # (y, t) of the previous chunk's final sample
+
+    def update(self, y, t=None):
+        y = np.asarray(y, dtype=float)
+        if y.size == 0:
+            return self
+        t = None if t is None else np.asarray(t, dtype=float)
+        arc = y > self.threshold
+        n_arc = int(np.count_nonzero(arc))
+        self.count += (y.size - n_arc, n_arc)
+        arc_total = float(np.sum(y, where=arc))
+        self.total += (float(y.sum()) - arc_total, arc_total)
+
+        if self._last is None:
+            self.rises += int(arc[0])   # a curve that starts separated has already left main contact
+        else:
+            # the step from the previous chunk's last sample into this chunk
+            last_y, last_t = self._last
+            last_arc = last_y > self.threshold
+            step = 1.0 if t is None else float(np.nan_to_num(t[0] - last_t))
+            self.duration[int(last_arc)] += step
+            self.spikes[int(last_arc)] += int(abs(y[0] - last_y) > self.spike_step)
+            self.rises += int(arc[0] and not last_arc)
+
+        if y.size > 1:
+            start_arc = arc[:-1]
+            if t is None:
+                arc_steps = float(np.count_nonzero(start_arc))
+                all_steps = float(y.size - 1)
+            else:
+                steps = np.nan_to_num(np.diff(t))
+                arc_steps = float(np.sum(steps, where=start_arc))
+                all_steps = float(steps.sum())
+            self.duration += (all_steps - arc_steps, arc_steps)
+            jumps = np.diff(y)
+            np.abs(jumps, out=jumps)
+            jumps = jumps > self.spike_step
+            arc_jumps = int(np.count_nonzero(jumps & start_arc))
+            self.spikes += (int(np.count_nonzero(jumps)) - arc_jumps, arc_jumps)
+            self.rises += int(np.count_nonzero(arc[1:] > start_arc))
+        self._last = (float(y[-1]), float("nan") if t is None else float(t[-1]))
+        return self
+
+    def summary(self):
+        out = {"threshold": round(self.threshold, 3), "bounces": max(self.rises - 1, 0)}
+        for i, name in enumerate(self.REGIONS):
+            out[name] = {
+                "samples": int(self.count[i]),
+                "duration": round(float(self.duration[i]), 3),
+                "mean_resistance": round(float(self.total[i] / self.count[i]), 3) if self.count[i] else None,
+                "spikes": int(self.spikes[i]),
+            }
+        return out
+
+
+def phase_threshold(min_r, mean_r, arcing_factor=2.0):
+    """Arcing-region threshold: arcing_factor x the best (lowest) contact resistance."""
+    base = min_r if min_r > 0 else mean_r
+    return arcing_factor * base
+
+
+class MinMaxDecimator:
+    """
+    Shape-preserving downsampler for chart data: the series is split into
+    n_out // 2 equal-count buckets by sample index and the min and max sample
+    of each bucket are kept, so spikes and contact-separation steps survive.
+
+    Like RunningStats it is fed chunk by chunk (n_total must be known up front),
+    and feeding the whole series at once gives the same points.
+    """
+
+    def __init__(self, n_total, n_out):
+        self.n_total = int(n_total)
+        self.n_buckets = max(1, int(n_out) // 2)
+        self.offset = 0
+        nb = self.n_buckets
+        self.min_val = np.full(nb, np.inf)
+        self.max_val = np.full(nb, -np.inf)
+        self.min_idx = np.full(nb, -1, dtype=np.int64)
+        self.max_idx = np.full(nb, -1, dtype=np.int64)
+        self.min_t = np.full(nb, np.nan)
+        self.max_t = np.full(nb, np.nan)
+
+    def update(self, y, t=None):
+        y = np.asarray(y, dtype=float)
+        k = y.size
+        if k == 0:
+            return self
+        gidx = self.offset + np.arange(k, dtype=np.int64)
+        t = gidx.astype(float) if t is None else np.asarray(t, dtype=float)
+        ids = gidx * self.n_buckets // self.n_total
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        seg = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, k]))
+        buckets = ids[starts]
+
+        for reduce, better, vals, idx, times in (
+            (np.minimum, np.less, self.min_val, self.min_idx, self.min_t),
+            (np.maximum, np.greater, self.max_val, self.max_idx, self.max_t),
+        ):
+            ext = reduce.reduceat(y, starts)
+            hit = np.flatnonzero(y == ext[seg])
+            first = hit[np.unique(seg[hit], return_index=True)[1]]   # first extreme per bucket
+            upd = better(ext, vals[buckets])
+            vals[buckets[upd]] = ext[upd]
+            idx[buckets[upd]] = gidx[first[upd]]
+            times[buckets[upd]] = t[first[upd]]
+
+        self.offset += k
+        return self
+
+    def points(self):
+        """returns: (time, resistance) arrays ordered by sample index"""
+        filled = self.min_idx >= 0
+        idx = np.concatenate([self.min_idx[filled], self.max_idx[filled]])
+        t = np.concatenate([self.min_t[filled], self.max_t[filled]])
+        y = np.concatenate([self.min_val[filled], self.max_val[filled]])
+        _, first = np.unique(idx, return_index=True)
+        return t[first], y[first]
+
+
+def downsample(y, t=None, n_out=300):
+    """
+    Reduce a full series to at most n_out points with MinMaxDecimator.
+    When t is None the sample index is used as time.
+    """
+    y = np.asarray(y, dtype=float)
+    if y.size <= n_out:
+        t = np.arange(y.size, dtype=float) if t is None else np.asarray(t, dtype=float)
+        return t, y
+    return MinMaxDecimator(y.size, n_out).update(y, t).points()
+
+
+def to_data_points(t, y):
+    """Build the result_json data_points list from time / resistance arrays."""
+    return [{"time": ti, "resistance": yi} for ti, yi in zip(np.asarray(t, dtype=float).tolist(), np.asarray(y, dtype=float).tolist())]
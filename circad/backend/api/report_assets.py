@@ -0,0 +1,132 @@
+# circad/backend/api/report_assets.py
+"""
+Raster assets for the PDF report (charts and QR codes), rendered outside
+Django so a process pool can draw them in parallel. Used when
+CIRCAD_REPORT_VECTOR_CHARTS is off; api.report_charts draws the same
+charts as vector paths otherwise.
+
+This module imports no Django code: spawned pool workers import it (and
+api.preprocessing, to read the columnar sidecars) without settings.
+Charts are drawn with matplotlib's object API (Figure + Agg canvas), not
+pyplot, so no global figure state is shared between jobs.
+"""
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import preprocessing
+
+logger = logging.getLogger(__name__)
+
+# points per detail chart when drawn from the columnar sidecar
+CHART_SERIES_POINTS = 600
+
+
+def _figure(width, height):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", dpi=150)
+    return buf.getvalue()
+
+
+def trend_chart_png(dates, means):
+    """Mean resistance over the report's analyses (dates oldest first)."""
+    fig = _figure(6, 2.5)
+    ax = fig.add_subplot()
+    ax.plot(dates, means, marker='o', linewidth=2)
+    ax.set_title("Mean Resistance Over Time")
+    ax.set_ylabel("Mean (µΩ)")
+    ax.grid(True, linestyle='--', alpha=0.5)
+    fig.autofmt_xdate(rotation=25)
+    return _png(fig)
+
+
+def detail_chart_png(times, res):
+    fig = _figure(5, 1.8)
+    ax = fig.add_subplot()
+    ax.plot(times, res, linewidth=1.5)
+    ax.set_xlabel("")
+    ax.set_ylabel("µΩ")
+    ax.grid(True, linestyle='--', alpha=0.4)
+    return _png(fig)
+
+
+def qr_png(data_str):
+    import qrcode
+    qr = qrcode.QRCode(box_size=4, border=2)
+    qr.add_data(data_str)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def page_series(job):
+    """
+    job: {"csv_path" or None, "data_points" (fallback [[t, r], ...]), ...}
+    returns: (times, resistances) for the page's detail chart, or None
+    """
+    # full waveform from the columnar sidecar (memory-mapped, no CSV parse),
+    # else the stored data points
+    if job.get("csv_path"):
+        try:
+            series = preprocessing.load_chart_series(job["csv_path"], CHART_SERIES_POINTS)
+        except Exception:
+            series = None
+        if series is not None:
+            return series
+    if job.get("data_points"):
+        return tuple(zip(*job["data_points"]))
+    return None
+
+
+def render_page(job):
+    """
+    job: {"id", "csv_path" or None, "data_points" (fallback [[t, r], ...]), "qr"}
+    returns: (id, detail chart PNG or None, QR PNG)
+    """
+    series = page_series(job)
+    chart = detail_chart_png(*series) if series is not None else None
+    return job["id"], chart, qr_png(job["qr"])
+
+
+def render_pages(jobs, workers=1, progress=None):
+    """
+    Render every page's assets, in a pool of `workers` spawned processes
+    when workers > 1. Falls back to rendering in this process when a pool
+    cannot be started (e.g. inside a daemonic Celery prefork child).
+      - progress: callable(done, total) after each page
+    returns: {id: (chart PNG or None, QR PNG)}
+    """
+    total = len(jobs)
+    assets = {}
+
+    def collect(results):
+        for page_id, chart, qr in results:
+            assets[page_id] = (chart, qr)
+            if progress:
+                progress(len(assets), total)
+
+    if workers > 1 and total > 1:
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, total), mp_context=ctx) as pool:
+                collect(pool.map(render_page, jobs, chunksize=max(1, total // (workers * 4))))
+            return assets
+        except (AssertionError, BrokenProcessPool, OSError, NotImplementedError) as e:
+            # daemonic processes are not allowed to have children
+            logger.warning("Report process pool unavailable (%s); rendering serially", e)
+            assets.clear()
+    collect(map(render_page, jobs))
+    return assets
@@ -0,0 +1,179 @@
+# circad/backend/api/report_charts.py
+"""
+Vector charts for the PDF report, drawn straight onto a reportlab canvas.
+
+A chart is a frame, a few gridlines with tick labels and one polyline, so
+each page costs a handful of PDF path operators instead of a matplotlib
+figure rasterized to a 150-dpi PNG and embedded as an image. Series longer
+than max_points are reduced with preprocessing.downsample (min/max per
+bucket) first, so spikes survive. Coordinates are in points, (x, y) is the
+lower-left corner of the plot box.
+"""
+import math
+
+import numpy as np
+
+from .preprocessing import downsample
+
+AXIS_GREY = (0.35, 0.35, 0.35)
+GRID_GREY = (0.85, 0.85, 0.85)
+LINE_BLUE = (0.12, 0.47, 0.71)   # matplotlib's default C0, as in the raster charts
+
+# label gutters inside the box
+LEFT_GUTTER = 34
+BOTTOM_GUTTER = 14
+TITLE_HEIGHT = 14
+
+
+def nice_ticks(lo, hi, count=4):
+    """returns: round tick values covering [lo, hi], about `count` of them"""
+    if not (math.isfinite(lo) and math.isfinite(hi)):
+        return []
+    if hi <= lo:
+        pad = abs(lo) * 0.05 or 1.0
+        lo, hi = lo - pad, hi + pad
+    raw = (hi - lo) / max(1, count)
+    mag = 10 ** math.floor(math.log10(raw))
+    step = next(m * mag for m in (1, 2, 2.5, 5, 10) if m * mag >= raw)
+    first = math.floor(lo / step) * step
+    return [first + i * step for i in range(int(math.ceil((hi - first) / step)) + 1)]
+
+
+def _label(value):
+    return f"{value:.4g}"
+
+
+def draw_line_chart(c, x, y, width, height, xs, ys, title=None, y_label=None,
+                    x_labels=None, markers=False, max_points=600):
+    """
+    Plot ys against xs (numbers) in the box (x, y, width, height).
+      - x_labels: [(x value, text), ...] under the axis; default: none
+      - markers: a dot on every point (short series such as the trend)
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    keep = np.isfinite(xs) & np.isfinite(ys)
+    xs, ys = xs[keep], ys[keep]
+    if ys.size > max_points:
+        xs, ys = downsample(ys, xs, max_points)
+
+    c.saveState()
+    top = y + height
+    if title:
+        c.setFont("Helvetica-Bold", 9)
+        c.setFillColorRGB(0, 0, 0)
+        c.drawCentredString(x + width / 2, top - 10, title)
+        top -= TITLE_HEIGHT
+    px, py = x + LEFT_GUTTER, y + BOTTOM_GUTTER
+    pw, ph = width - LEFT_GUTTER, top - py
+
+    if ys.size:
+        ticks = nice_ticks(float(ys.min()), float(ys.max()))
+        y_lo, y_hi = ticks[0], ticks[-1]
+        x_lo, x_hi = float(xs.min()), float(xs.max())
+        if x_hi <= x_lo:
+            x_lo, x_hi = x_lo - 0.5, x_hi + 0.5
+
+        def sx(v):
+            return px + (v - x_lo) / (x_hi - x_lo) * pw
+
+        def sy(v):
+            return py + (v - y_lo) / (y_hi - y_lo) * ph
+
+        # gridlines + y tick labels
+        c.setLineWidth(0.4)
+        c.setDash(2, 2)
+        c.setStrokeColorRGB(*GRID_GREY)
+        c.setFont("Helvetica", 6)
+        c.setFillColorRGB(*AXIS_GREY)
+        for tick in ticks:
+            c.line(px, sy(tick), px + pw, sy(tick))
+            c.drawRightString(px - 3, sy(tick) - 2, _label(tick))
+        for value, _ in x_labels or ():
+            c.line(sx(value), py, sx(value), py + ph)
+        c.setDash()
+        for value, text in x_labels or ():
+            c.drawCentredString(sx(value), py - 8, text)
+
+        # the series: one path
+        path = c.beginPath()
+        path.moveTo(sx(xs[0]), sy(ys[0]))
+        for xv, yv in zip(xs[1:].tolist(), ys[1:].tolist()):
+            path.lineTo(sx(xv), sy(yv))
+        c.setStrokeColorRGB(*LINE_BLUE)
+        c.setLineWidth(1.2 if markers else 0.8)
+        c.setLineJoin(1)
+        c.drawPath(path, stroke=1, fill=0)
+        if markers:
+            c.setFillColorRGB(*LINE_BLUE)
+            for xv, yv in zip(xs.tolist(), ys.tolist()):
+                c.circle(sx(xv), sy(yv), 1.6, stroke=0, fill=1)
+
+    # frame + y axis label
+    c.setLineWidth(0.6)
+    c.setStrokeColorRGB(*AXIS_GREY)
+    c.rect(px, py, pw, ph, stroke=1, fill=0)
+    if y_label:
+        c.setFont("Helvetica", 7)
+        c.setFillColorRGB(*AXIS_GREY)
+        c.saveState()
+        c.translate(x + 6, py + ph / 2)
+        c.rotate(90)
+        c.drawCentredString(0, 0, y_label)
+        c.restoreState()
+    c.restoreState()
+
+
+def draw_trend(c, x, y, width, height, dates, means):
+    """Mean resistance over the report's analyses (dates oldest first)."""
+    points = [(d.timestamp(), m) for d, m in zip(dates, means) if m is not None]
+    if not points:
+        return
+    stamps = [p[0] for p in points]
+    # first, middle and last date under the axis
+    picks = sorted({0, len(points) // 2, len(points) - 1})
+    x_labels = [(stamps[i], dates[i].strftime("%Y-%m-%d %H:%M")) for i in picks]
+    draw_line_chart(
+        c, x, y, width, height, stamps, [p[1] for p in points],
+        title="Mean Resistance Over Time", y_label="Mean (µΩ)", x_labels=x_labels, markers=True,
+    )
+
+
+def draw_waveform(c, x, y, width, height, times, res, max_points=600):
+    """One analysis' resistance waveform."""
+    times = np.asarray(times, dtype=float)
+    if times.size == 0:
+        return
+    ticks = nice_ticks(float(np.nanmin(times)), float(np.nanmax(times)), 5)
+    x_labels = [(t, _label(t)) for t in ticks if times.min() <= t <= times.max()]
+    draw_line_chart(c, x, y, width, height, times, res, y_label="µΩ", x_labels=x_labels, max_points=max_points)
+
+
+def draw_qr(c, x, y, size, data_str):
+    """
+    A QR code of data_str, size points wide: one filled path with a
+    rectangle per horizontal run of dark modules.
+    """
+    import qrcode
+    qr = qrcode.QRCode(border=2)
+    qr.add_data(data_str)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    cell = size / len(matrix)
+    path = c.beginPath()
+    for row, modules in enumerate(matrix):
+        top = y + size - row * cell
+        col = 0
+        while col < len(modules):
+            if not modules[col]:
+                col += 1
+                continue
+            run = col
+            while run < len(modules) and modules[run]:
+                run += 1
+            path.rect(x + col * cell, top - cell, (run - col) * cell, cell)
+            col = run
+    c.saveState()
+    c.setFillColorRGB(0, 0, 0)
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
@@ -0,0 +1,322 @@
+# circad/backend/api/report_jobs.py
+"""
+PDF report jobs and their stored artifacts.
+
+A report is identified by the set of analysis ids it covers, its options
+and REPORT_VERSION. request_report() returns the ReportArtifact for that
+key, and says whether a build has to be queued: a ready artifact is served
+as is, a pending or running one is shared with the request that queued it.
+generate_pdf_report_task calls run(), which draws the PDF and stores it
+under MEDIA_ROOT/reports. Charts and QR codes are vector paths
+(api.report_charts) or, with CIRCAD_REPORT_VECTOR_CHARTS off, PNGs
+rendered in a process pool (api.report_assets). The newest
+CIRCAD_REPORT_CACHE_MAX_ENTRIES artifacts are kept.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import preprocessing, report_assets, report_charts, storage_usage
+from .models import AnalysisResult, ReportArtifact
+
+logger = logging.getLogger(__name__)
+
+# bump whenever a change here alters the PDF; stored reports are then rebuilt
+REPORT_VERSION = "2"
+
+# analyses in a report when no ids are given
+DEFAULT_REPORT_SIZE = 10
+
+
+def _workers():
+    # more processes than CPUs only adds spawn cost
+    return min(int(getattr(settings, "CIRCAD_REPORT_WORKERS", 4)), os.cpu_count() or 1)
+
+
+def _vector():
+    return bool(getattr(settings, "CIRCAD_REPORT_VECTOR_CHARTS", True))
+
+
+def _max_entries():
+    return int(getattr(settings, "CIRCAD_REPORT_CACHE_MAX_ENTRIES", 100))
+
+
+def _stale_after():
+    # a build older than the task time limit is not coming back
+    return timedelta(seconds=int(getattr(settings, "CELERY_TASK_TIME_LIMIT", 600)))
+
+
+def normalize_options(payload):
+    """The options that change the PDF, with their defaults."""
+    return {
+        "title": str(payload.get("title") or "CIRCAD Analysis Report"),
+        "include_signature": bool(payload.get("include_signature", False)),
+        "technician_name": str(payload.get("technician_name") or ""),
+    }
+
+
+def resolve_ids(analysis_ids=None):
+    """
+    returns: ids of the existing analyses to report on, oldest first; the
+             newest DEFAULT_REPORT_SIZE when analysis_ids is empty
+    """
+    qs = AnalysisResult.objects.all()
+    if analysis_ids:
+        return list(qs.filter(id__in=analysis_ids).order_by("created_at", "id").values_list("id", flat=True))
+    newest = list(qs.order_by("-created_at", "-id").values_list("id", flat=True)[:DEFAULT_REPORT_SIZE])
+    return newest[::-1]
+
+
+def artifact_key(ids, options):
+    # the chart renderer is part of the artifact: toggling it must not serve the other kind
+    version = f"{REPORT_VERSION}-{'vector' if _vector() else 'raster'}"
+    raw = json.dumps({"ids": sorted(ids), "options": options, "version": version}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def request_report(analysis_ids, options):
+    """
+    returns: (ReportArtifact or None if there is nothing to report on,
+              True if the caller must queue generate_pdf_report_task for it)
+    """
+    ids = resolve_ids(analysis_ids)
+    if not ids:
+        return None, False
+    now = timezone.now()
+    with transaction.atomic():
+        artifact, created = ReportArtifact.objects.select_for_update().get_or_create(
+            key=artifact_key(ids, options),
+            defaults={"analysis_ids": ids, "options": options, "total": len(ids)},
+        )
+        if created:
+            return artifact, True
+        if artifact.status == ReportArtifact.READY and artifact.file and artifact.file.storage.exists(artifact.file.name):
+            artifact.last_used_at = now
+            artifact.save(update_fields=["last_used_at"])
+            return artifact, False
+        if artifact.status in (ReportArtifact.PENDING, ReportArtifact.RUNNING) and now - artifact.created_at < _stale_after():
+            return artifact, False
+        # failed, lost its file, or a build that never finished: start over
+        artifact.status, artifact.progress, artifact.error = ReportArtifact.PENDING, 0, ""
+        artifact.created_at = artifact.last_used_at = now
+        artifact.save()
+        return artifact, True
+
+
+def _page(a):
+    """
+    Plain data for one analysis: its table row and detail page. The
+    raster path hands it to report_assets.render_page in another process.
+    """
+    csv_path = a.dcrm_file.file.path if a.dcrm_file_id and a.dcrm_file.file else None
+    data_points = None
+    if csv_path is None or preprocessing.open_sidecar(csv_path) is None:
+        data_points = [[p.get("time"), p.get("resistance")] for p in a.data_points()]
+    return {
+        "id": a.id,
+        "file_id": a.dcrm_file_id,
+        "file_name": a.dcrm_file.display_name if a.dcrm_file_id and a.dcrm_file.file else "N/A",
+        "status": a.status,
+        "mean": a.mean_resistance,
+        "std": a.std_dev,
+        "created_at": a.created_at,
+        "csv_path": csv_path,
+        "data_points": data_points,
+        "qr": str({"analysis_id": a.id, "status": a.status, "mean": a.mean_resistance}),
+    }
+
+
+def build_pdf(ids, options, progress=None, workers=None, vector=None):
+    """
+    ids: analysis ids in report order; options: normalize_options()
+    returns: PDF bytes (see render_pdf)
+    """
+    rows = AnalysisResult.objects.select_related("dcrm_file").in_bulk(ids)
+    return render_pdf([_page(rows[i]) for i in ids if i in rows], options, progress, workers, vector)
+
+
+def render_pdf(pages, options, progress=None, workers=None, vector=None):
+    """
+    pages: _page() dicts in report order
+    progress: callable(done, total) as detail pages are drawn
+    vector: draw charts and QR codes as vector paths (api.report_charts);
+            default CIRCAD_REPORT_VECTOR_CHARTS. Otherwise they are PNGs
+            rendered by a process pool (api.report_assets).
+    returns: PDF bytes
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+    import io
+
+    vector = _vector() if vector is None else vector
+    title = options["title"]
+    assets = None
+    if not vector:
+        assets = report_assets.render_pages(pages, workers=_workers() if workers is None else workers, progress=progress)
+
+    buffer = io.BytesIO()
+    page_width, page_height = A4  # portrait
+    c = canvas.Canvas(buffer, pagesize=A4)
+    c.setTitle(title)
+
+    # Header
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(20 * mm, (page_height - 20 * mm), title)
+    c.setFont("Helvetica", 10)
+    c.drawString(20 * mm, (page_height - 26 * mm), f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
+
+    # Insert trend chart of selected analyses (if more than 1)
+    if len(pages) >= 2:
+        dates, means = [p["created_at"] for p in pages], [p["mean"] for p in pages]
+        if vector:
+            report_charts.draw_trend(c, 20 * mm, page_height - 100 * mm, 170 * mm, 68 * mm, dates, means)
+        else:
+            chart = report_assets.trend_chart_png(dates, means)
+            c.drawImage(ImageReader(io.BytesIO(chart)), 20 * mm, (page_height - 100 * mm), width=170*mm, preserveAspectRatio=True, mask='auto')
+        y_cursor = (page_height - 110 * mm)
+    else:
+        y_cursor = (page_height - 40 * mm)
+
+    # Table of analyses (multiple per page)
+    x_left = 20 * mm
+    row_h = 9 * mm
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x_left, y_cursor, "ID")
+    c.drawString(x_left + 18*mm, y_cursor, "File")
+    c.drawString(x_left + 80*mm, y_cursor, "Status")
+    c.drawString(x_left + 110*mm, y_cursor, "Mean (µΩ)")
+    c.drawString(x_left + 140*mm, y_cursor, "Date")
+    y_cursor -= 6*mm
+    c.setFont("Helvetica", 9)
+
+    for p in pages:
+        if y_cursor < 30*mm:
+            c.showPage()
+            y_cursor = page_height - 30*mm
+        c.drawString(x_left, y_cursor, str(p["id"]))
+        c.drawString(x_left + 18*mm, y_cursor, p["file_name"][:30])
+        c.drawString(x_left + 80*mm, y_cursor, p["status"] or "")
+        c.drawRightString(x_left + 132*mm, y_cursor, f"{p['mean']}")
+        c.drawString(x_left + 140*mm, y_cursor, p["created_at"].strftime("%Y-%m-%d %H:%M"))
+        y_cursor -= row_h
+
+    sig_path = getattr(settings, "CIRCAD_TECH_SIGNATURE", None) if options["include_signature"] else None
+    if sig_path and not os.path.exists(sig_path):
+        sig_path = None
+
+    # Add per-analysis detail pages with chart & QR + signature
+    for done, p in enumerate(pages, 1):
+        c.showPage()
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(20*mm, page_height - 20*mm, f"Analysis #{p['id']} - File #{p['file_id'] or '-'}")
+        c.setFont("Helvetica", 10)
+        c.drawString(20*mm, page_height - 28*mm, f"Status: {p['status']}")
+        c.drawString(20*mm, page_height - 34*mm, f"Mean Resistance: {p['mean']} µΩ")
+        c.drawString(20*mm, page_height - 40*mm, f"Std Dev: {p['std']} µΩ")
+
+        # detail chart, and a QR with a JSON summary (embedding id + status)
+        if vector:
+            series = report_assets.page_series(p)
+            if series is not None:
+                report_charts.draw_waveform(c, 20*mm, page_height - 110*mm, 170*mm, 60*mm, *series)
+            report_charts.draw_qr(c, page_width - 50*mm, page_height - 60*mm, 30*mm, p["qr"])
+            if progress:
+                progress(done, len(pages))
+        else:
+            chart, qr = assets[p["id"]]
+            if chart is not None:
+                c.drawImage(ImageReader(io.BytesIO(chart)), 20*mm, page_height - 110*mm, width=170*mm, preserveAspectRatio=True, mask='auto')
+            c.drawImage(ImageReader(io.BytesIO(qr)), page_width - 50*mm, page_height - 60*mm, width=30*mm, preserveAspectRatio=True, mask='auto')
+
+        if sig_path:
+            c.drawImage(ImageReader(sig_path), 20*mm, 20*mm, width=60*mm, preserveAspectRatio=True, mask='auto')
+            c.drawString(20*mm, 18*mm, f"Technician: {options['technician_name']}")
+
+    # finalize
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def run(artifact_id, progress=None):
+    """
+    Build and store one artifact (generate_pdf_report_task).
+      - progress: callable(done, total), called besides updating the row
+    returns: the ReportArtifact, READY
+    """
+    artifact = ReportArtifact.objects.get(id=artifact_id)
+    if artifact.status == ReportArtifact.READY:
+        return artifact
+    ReportArtifact.objects.filter(id=artifact.id).update(status=ReportArtifact.RUNNING, progress=0)
+    step = max(1, artifact.total // 50)
+
+    def report_progress(done, total):
+        # a row update every ~2% is plenty for a progress bar
+        if done == total or done % step == 0:
+            ReportArtifact.objects.filter(id=artifact.id).update(progress=done, total=total)
+            if progress:
+                progress(done, total)
+
+    try:
+        pdf = build_pdf(artifact.analysis_ids, artifact.options, report_progress)
+    except Exception as e:
+        ReportArtifact.objects.filter(id=artifact.id).update(status=ReportArtifact.FAILED, error=str(e)[:2000])
+        raise
+    if artifact.file:
+        _delete_file(artifact)
+    artifact.file.save(f"report_{artifact.key[:16]}.pdf", ContentFile(pdf), save=False)
+    storage_usage.record_path(artifact.file.path, len(pdf), 1)
+    artifact.status, artifact.size_bytes, artifact.error = ReportArtifact.READY, len(pdf), ""
+    artifact.progress = artifact.total = len(artifact.analysis_ids)
+    artifact.finished_at = timezone.now()
+    artifact.save()
+    evict()
+    return artifact
+
+
+def _delete_file(artifact):
+    path = artifact.file.path
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return
+    storage_usage.record_path(path, -size, -1)
+
+
+def evict():
+    """Drop all but the newest CIRCAD_REPORT_CACHE_MAX_ENTRIES finished artifacts, with their files."""
+    keep = ReportArtifact.objects.filter(status=ReportArtifact.READY).order_by("-last_used_at").values_list("id", flat=True)[:_max_entries()]
+    old = ReportArtifact.objects.filter(status=ReportArtifact.READY).exclude(id__in=list(keep))
+    for artifact in old:
+        if artifact.file:
+            _delete_file(artifact)
+    old.delete()
+
+
+def clear():
+    """Delete every stored report and its file (resets: reports embed the analyses being removed)."""
+    for artifact in ReportArtifact.objects.exclude(file=""):
+        _delete_file(artifact)
+    ReportArtifact.objects.all().delete()
+
+
+def describe(artifact):
+    return {
+        "report_id": artifact.id,
+        "status": artifact.status,
+        "progress": artifact.progress,
+        "total": artifact.total,
+        "task_id": artifact.task_id or None,
+        "size_bytes": artifact.size_bytes if artifact.status == ReportArtifact.READY else None,
+        "error": artifact.error or None,
+    }
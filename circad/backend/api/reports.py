@@ -1,186 +1,156 @@
-import io
 import os
 import csv
-import qrcode
-import base64
-import matplotlib.pyplot as plt
+import itertools
+import zlib
 from datetime import datetime
-from django.http import HttpResponse, FileResponse
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from .models import AnalysisResult, DCRMFile
+from .models import AnalysisResult, ReportArtifact
 from django.conf import settings
-import pandas as pd
 from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import permission_classes
 from django_ratelimit.decorators import ratelimit
+from . import archive, report_jobs
+from .breakers import parse_when
 
-# Helper: draw small matplotlib chart (returns bytes)
-def create_mean_trend_chart(analysis_list):
-    """
-    analysis_list: list of AnalysisResult instances (ordered)
-    returns: PNG bytes
-    """
-    means = [a.result_json.get("mean_resistance") for a in analysis_list]
-    dates = [a.created_at for a in analysis_list]
-    plt.switch_backend('Agg')
-    fig, ax = plt.subplots(figsize=(6, 2.5))
-    ax.plot(dates, means, marker='o', linewidth=2)
-    ax.set_title("Mean Resistance Over Time")
-    ax.set_ylabel("Mean (µΩ)")
-    ax.grid(True, linestyle='--', alpha=0.5)
-    fig.autofmt_xdate(rotation=25)
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png", dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-# Helper: create QR code image bytes (contains report metadata url or JSON)
-def create_qr_image(data_str):
-    qr = qrcode.QRCode(box_size=4, border=2)
-    qr.add_data(data_str)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
-
-# Endpoint: Produce PDF report for selected analyses
+# Endpoint: Queue (or serve) a PDF report for selected analyses
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
 def generate_pdf_report(request):
     """
     POST payload:
     {
-      "analysis_ids": [1,2,3],   # optional: if omitted => include all or last N
+      "analysis_ids": [1,2,3],   # optional: if omitted => the last 10
       "title": "CIRCAD Batch Report",
       "include_signature": true,
       "technician_name": "Raj"
     }
+    The PDF is built by generate_pdf_report_task; poll reports/pdf/<report_id>/
+    until status is "ready", then GET its download_url. An identical request
+    gets the stored report back at once (200) instead of a queued job (202).
     """
     payload = request.data or {}
-    analysis_ids = payload.get("analysis_ids")
-    title = payload.get("title", "CIRCAD Analysis Report")
-    include_signature = bool(payload.get("include_signature", False))
-    technician = payload.get("technician_name", "")
+    artifact, enqueue = report_jobs.request_report(payload.get("analysis_ids"), report_jobs.normalize_options(payload))
+    if artifact is None:
+        return Response({"error": "No analyses found for report"}, status=400)
+    if enqueue:
+        from .tasks import generate_pdf_report_task
+        task = generate_pdf_report_task.delay(artifact.id)
+        ReportArtifact.objects.filter(id=artifact.id).update(task_id=task.id or "")
+        artifact.refresh_from_db()
+    return Response(_describe(request, artifact), status=200 if artifact.status == ReportArtifact.READY else 202)
 
-    # fetch analyses
-    if analysis_ids:
-        analyses = list(AnalysisResult.objects.filter(id__in=analysis_ids).order_by("created_at"))
-    else:
-        analyses = list(AnalysisResult.objects.all().order_by("created_at")[-10:])  # last 10 by default
 
-    if not analyses:
-        return Response({"error": "No analyses found for report"}, status=400)
+def _describe(request, artifact):
+    data = report_jobs.describe(artifact)
+    data["download_url"] = (
+        request.build_absolute_uri(f"/api/reports/pdf/{artifact.id}/download/")
+        if artifact.status == ReportArtifact.READY else None
+    )
+    return data
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def pdf_report_status(request, report_id):
+    try:
+        artifact = ReportArtifact.objects.get(id=report_id)
+    except ReportArtifact.DoesNotExist:
+        return Response({"error": "Report not found"}, status=404)
+    return Response(_describe(request, artifact))
+
 
-    # Create PDF in memory
-    buffer = io.BytesIO()
-    page_width, page_height = A4  # portrait
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.setTitle(title)
-
-    # Header
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(20 * mm, (page_height - 20 * mm), title)
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, (page_height - 26 * mm), f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
-
-    # Insert trend chart of selected analyses (if more than 1)
-    if len(analyses) >= 2:
-        chart_buf = create_mean_trend_chart(analyses)
-        chart_img = ImageReader(chart_buf)
-        c.drawImage(chart_img, 20 * mm, (page_height - 100 * mm), width=170*mm, preserveAspectRatio=True, mask='auto')
-        y_cursor = (page_height - 110 * mm)
-    else:
-        y_cursor = (page_height - 40 * mm)
-
-    # Table of analyses (multiple per page)
-    x_left = 20 * mm
-    row_h = 9 * mm
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(x_left, y_cursor, "ID")
-    c.drawString(x_left + 18*mm, y_cursor, "File")
-    c.drawString(x_left + 80*mm, y_cursor, "Status")
-    c.drawString(x_left + 110*mm, y_cursor, "Mean (µΩ)")
-    c.drawString(x_left + 140*mm, y_cursor, "Date")
-    y_cursor -= 6*mm
-    c.setFont("Helvetica", 9)
-
-    for a in analyses:
-        if y_cursor < 30*mm:
-            c.showPage()
-            y_cursor = page_height - 30*mm
-        fid = a.dcrm_file.id if a.dcrm_file else "-"
-        fname = os.path.basename(a.dcrm_file.file.name) if a.dcrm_file and a.dcrm_file.file else "N/A"
-        status = a.result_json.get("status")
-        mean = a.result_json.get("mean_resistance")
-        created = a.created_at.strftime("%Y-%m-%d %H:%M")
-        c.drawString(x_left, y_cursor, str(a.id))
-        c.drawString(x_left + 18*mm, y_cursor, fname[:30])
-        c.drawString(x_left + 80*mm, y_cursor, status)
-        c.drawRightString(x_left + 132*mm, y_cursor, f"{mean}")
-        c.drawString(x_left + 140*mm, y_cursor, created)
-        y_cursor -= row_h
-
-    # Add per-analysis detail pages with chart & QR + signature
-    for a in analyses:
-        c.showPage()
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(20*mm, page_height - 20*mm, f"Analysis #{a.id} - File #{a.dcrm_file.id if a.dcrm_file else '-'}")
-        c.setFont("Helvetica", 10)
-        c.drawString(20*mm, page_height - 28*mm, f"Status: {a.result_json.get('status')}")
-        c.drawString(20*mm, page_height - 34*mm, f"Mean Resistance: {a.result_json.get('mean_resistance')} µΩ")
-        c.drawString(20*mm, page_height - 40*mm, f"Std Dev: {a.result_json.get('std_dev')} µΩ")
-        # small chart for this analysis (if data points available)
-        data_points = a.result_json.get("data_points", [])
-        if data_points:
-            # make small plt chart
-            times = [p.get("time") for p in data_points]
-            res = [p.get("resistance") for p in data_points]
-            plt.switch_backend('Agg')
-            fig, ax = plt.subplots(figsize=(5,1.8))
-            ax.plot(times, res, linewidth=1.5)
-            ax.set_xlabel("")
-            ax.set_ylabel("µΩ")
-            ax.grid(True, linestyle='--', alpha=0.4)
-            buf = io.BytesIO()
-            fig.tight_layout()
-            fig.savefig(buf, format='png', dpi=150)
-            plt.close(fig)
-            buf.seek(0)
-            img = ImageReader(buf)
-            c.drawImage(img, 20*mm, page_height - 110*mm, width=170*mm, preserveAspectRatio=True, mask='auto')
-
-        # QR with a JSON summary (embedding id + status)
-        qr_json = {"analysis_id": a.id, "status": a.result_json.get("status"), "mean": a.result_json.get("mean_resistance")}
-        qr_img_buf = create_qr_image(str(qr_json))
-        qr_img = ImageReader(qr_img_buf)
-        c.drawImage(qr_img, page_width - 50*mm, page_height - 60*mm, width=30*mm, preserveAspectRatio=True, mask='auto')
-
-        # optionally include signature (if exists in static path)
-        if include_signature:
-            sig_path = getattr(settings, "CIRCAD_TECH_SIGNATURE", None)
-            if sig_path and os.path.exists(sig_path):
-                sig_img = ImageReader(sig_path)
-                c.drawImage(sig_img, 20*mm, 20*mm, width=60*mm, preserveAspectRatio=True, mask='auto')
-                c.drawString(20*mm, 18*mm, f"Technician: {technician}")
-
-    # finalize
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-
-    # Return as response
-    resp = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    resp['Content-Disposition'] = f'attachment; filename="{title.replace(" ", "_")}_{datetime.utcnow().strftime("%Y%m%d%H%M")}.pdf"'
-    return resp
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def pdf_report_download(request, report_id):
+    try:
+        artifact = ReportArtifact.objects.get(id=report_id)
+    except ReportArtifact.DoesNotExist:
+        return Response({"error": "Report not found"}, status=404)
+    if artifact.status != ReportArtifact.READY or not artifact.file:
+        return Response({"error": f"Report is {artifact.status}"}, status=409)
+    try:
+        handle = artifact.file.open("rb")
+    except FileNotFoundError:
+        return Response({"error": "Report file missing; request it again"}, status=410)
+    ReportArtifact.objects.filter(id=artifact.id).update(last_used_at=timezone.now())
+    title = artifact.options.get("title") or "CIRCAD Analysis Report"
+    stamp = (artifact.finished_at or artifact.created_at).strftime("%Y%m%d%H%M")
+    return FileResponse(handle, as_attachment=True, filename=f'{title.replace(" ", "_")}_{stamp}.pdf', content_type="application/pdf")
+
+
+CSV_HEADER = ["analysis_id", "file_id", "file_name", "status", "mean_resistance", "std_dev", "min_resistance", "max_resistance", "created_at"]
+# rows per yielded piece of the streamed CSV
+CSV_ROWS_PER_CHUNK = 1000
+
+
+class _Echo:
+    """csv.writer target that hands each formatted row back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def archived_csv_rows(date_from=None, date_to=None, ids=None, chunk_size=2000):
+    """
+    CSV rows of the archived analyses (api.archive) in a created_at range,
+    oldest first, leaving out ids that are still in the hot table.
+    yields: tuples in the values_list order iter_csv reads
+    """
+    batch = []
+
+    def flush():
+        hot = set(AnalysisResult.objects.filter(id__in=[r["id"] for r in batch]).values_list("id", flat=True))
+        return [
+            (r["id"], r["dcrm_file_id"], r["file"], r["status"], r["mean_resistance"],
+             r["std_dev"], r["min_resistance"], r["max_resistance"], r["created_at"], "")
+            for r in batch if r["id"] not in hot
+        ]
+
+    for row in archive.rows(date_from, date_to, ids=ids):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+def iter_csv(analyses, compress=False, chunk_size=2000, archived=()):
+    """
+    Stream the CSV export of an AnalysisResult queryset piece by piece.
+    The header goes out before the query runs; rows come from one joined
+    values_list read in chunk_size batches (a server-side cursor on
+    PostgreSQL), so memory does not grow with the number of rows.
+      - compress: gzip the stream on the fly
+      - archived: rows to put before the queryset's (archived_csv_rows)
+    yields: str pieces, or bytes when compress is set
+    """
+    writer = csv.writer(_Echo())
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def out(text):
+        return gz.compress(text.encode("utf-8")) if gz else text
+
+    yield out(writer.writerow(CSV_HEADER))
+    rows = itertools.chain(archived, analyses.values_list(
+        "id", "dcrm_file_id", "dcrm_file__file", "status", "mean_resistance",
+        "std_dev", "min_resistance", "max_resistance", "created_at", "dcrm_file__original_name",
+    ).iterator(chunk_size=chunk_size))
+    lines = []
+    for aid, file_id, fname, st, mean, std, min_r, max_r, created, original in rows:
+        name = original or (os.path.basename(fname) if fname else "")
+        lines.append(writer.writerow([aid, file_id or "", name, st, mean, std, min_r, max_r, created.isoformat()]))
+        if len(lines) >= CSV_ROWS_PER_CHUNK:
+            piece = out("".join(lines))
+            lines = []
+            if piece:
+                yield piece
+    if lines:
+        yield out("".join(lines))
+    if gz:
+        yield gz.flush()
 
 
 @api_view(["POST"])
@@ -188,30 +158,46 @@ def generate_pdf_report(request):
 def generate_csv_report(request):
     """
     POST payload:
-    { "analysis_ids": [1,2,3] }
-    returns CSV file with rows (id,file,status,mean,std,min,max,created_at)
+    { "analysis_ids": [1,2,3],           (optional; default all analyses)
+      "date_from": "2025-01-01",          (optional, created_at >=; ISO date or datetime)
+      "date_to": "2025-12-31",            (optional, created_at <=; a bare date includes that day)
+      "include_archive": true,            (optional; also archived analyses, implied when the
+                                           date range reaches archived months)
+      "gzip": true }                      (optional; download circad_analyses_*.csv.gz)
+    returns a streamed CSV file with rows (id,file,status,mean,std,min,max,created_at)
     """
     payload = request.data or {}
     analysis_ids = payload.get("analysis_ids")
+    analyses = AnalysisResult.objects.all()
     if analysis_ids:
-        analyses = AnalysisResult.objects.filter(id__in=analysis_ids).order_by("created_at")
-    else:
-        analyses = AnalysisResult.objects.all().order_by("created_at")
-
-    if not analyses.exists():
+        analyses = analyses.filter(id__in=analysis_ids)
+    try:
+        date_from = parse_when(payload.get("date_from"), "date_from")
+        date_to = parse_when(payload.get("date_to"), "date_to", end=True)
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
+    if date_from:
+        analyses = analyses.filter(created_at__gte=date_from)
+    if date_to:
+        analyses = analyses.filter(created_at__lte=date_to)
+    analyses = analyses.order_by("created_at", "id")
+
+    archived = ()
+    if archive.covers(date_from, date_to) or str(payload.get("include_archive", "")).lower() in ("1", "true", "yes"):
+        archived = archived_csv_rows(date_from, date_to, analysis_ids or None)
+        first = next(archived, None)
+        if first is not None:
+            archived = itertools.chain([first], archived)
+        elif not analyses.exists():
+            return Response({"error": "No analyses found"}, status=400)
+    elif not analyses.exists():
         return Response({"error": "No analyses found"}, status=400)
 
-    # Build CSV in-memory
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(["analysis_id", "file_id", "file_name", "status", "mean_resistance", "std_dev", "min_resistance", "max_resistance", "created_at"])
-    for a in analyses:
-        file_id = a.dcrm_file.id if a.dcrm_file else ""
-        fname = os.path.basename(a.dcrm_file.file.name) if a.dcrm_file and a.dcrm_file.file else ""
-        r = a.result_json
-        writer.writerow([a.id, file_id, fname, r.get("status"), r.get("mean_resistance"), r.get("std_dev"), r.get("min_resistance"), r.get("max_resistance"), a.created_at.isoformat()])
-
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="circad_analyses_{datetime.utcnow().strftime("%Y%m%d%H%M")}.csv"'
+    compress = str(payload.get("gzip", "")).lower() in ("1", "true", "yes")
+    filename = f'circad_analyses_{datetime.utcnow().strftime("%Y%m%d%H%M")}.csv' + (".gz" if compress else "")
+    response = StreamingHttpResponse(
+        iter_csv(analyses, compress=compress, archived=archived),
+        content_type="application/gzip" if compress else "text/csv",
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
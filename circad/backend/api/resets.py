@@ -0,0 +1,96 @@
+# circad/backend/api/resets.py
+"""
+Bulk deletes for the admin resets (views_admin, reset_circad).
+
+The post_delete receivers in api.signals keep FleetStats and ForecastState
+in step one row at a time, which also stops Django from fast-deleting
+AnalysisResult / DCRMFile querysets: a reset would load every row and run
+a locked FleetStats update per row. These helpers issue plain DELETEs in
+dependency order instead (delete_rows, SQL through the connection's cursor)
+and fix the derived tables once afterwards.
+"""
+import logging
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import archive, fleet_stats, forecasting
+from .models import (
+    AnalysisResult, AnalysisWaveform, Breaker, BreakerMeasurement, DCRMFile, ForecastState, UploadSession,
+)
+
+logger = logging.getLogger(__name__)
+
+# bound parameters per statement, well under SQLite's limit
+DELETE_CHUNK = 500
+
+
+def delete_rows(model, column=None, values=None, using="default"):
+    """
+    DELETE FROM model's table (every row, or those whose `column` is in
+    values), without Django's delete collector and post_delete receivers.
+    Related rows and derived tables are the caller's job.
+    returns: rows deleted
+    """
+    ops = connections[using].ops
+    table = ops.quote_name(model._meta.db_table)
+    with connections[using].cursor() as cursor:
+        if column is None:
+            cursor.execute(f"DELETE FROM {table}")
+            return cursor.rowcount
+        field = ops.quote_name(model._meta.get_field(column).column)
+        values, deleted = list(values), 0
+        for i in range(0, len(values), DELETE_CHUNK):
+            chunk = values[i:i + DELETE_CHUNK]
+            cursor.execute(f"DELETE FROM {table} WHERE {field} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+            deleted += cursor.rowcount
+        return deleted
+
+
+def delete_all(using="default"):
+    """
+    Delete every analysis, file and breaker, then rebuild FleetStats.
+    returns: (analyses deleted, files deleted)
+    """
+    with transaction.atomic(using=using):
+        analyses = AnalysisResult.objects.using(using).count()
+        files = DCRMFile.objects.using(using).count()
+        for model in (AnalysisWaveform, BreakerMeasurement, ForecastState, AnalysisResult):
+            delete_rows(model, using=using)
+        UploadSession.objects.using(using).filter(dcrm_file__isnull=False).update(dcrm_file=None)
+        UploadSession.objects.using(using).filter(breaker__isnull=False).update(breaker=None)
+        delete_rows(DCRMFile, using=using)
+        delete_rows(Breaker, using=using)
+        fleet_stats.rebuild(using)
+    logger.info("Deleted %d analyses and %d files", analyses, files)
+    return analyses, files
+
+
+def delete_file_analyses(dcrm, using="default"):
+    """
+    Delete one file's analyses (and their waveforms and breaker measurements)
+    with one DELETE each; the counters and forecast states are adjusted once.
+    Its archived analyses (api.archive) are removed too, and so are the
+    measurements they left behind (analysis cleared, dcrm_file still set).
+    returns: analyses deleted from the database
+    """
+    archive.drop_file(dcrm.id)
+    with transaction.atomic(using=using):
+        gone = list(
+            AnalysisResult.objects.using(using).filter(dcrm_file=dcrm)
+            .only("id", "dcrm_file_id", "status", "mean_resistance")
+        )
+        ids = [r.id for r in gone]
+        breaker_ids = set(
+            BreakerMeasurement.objects.using(using).filter(Q(analysis_id__in=ids) | Q(dcrm_file=dcrm))
+            .values_list("breaker_id", flat=True)
+        )
+        delete_rows(AnalysisWaveform, "analysis", ids, using)
+        delete_rows(BreakerMeasurement, "analysis", ids, using)
+        delete_rows(BreakerMeasurement, "dcrm_file", [dcrm.id], using)
+        delete_rows(AnalysisResult, "id", ids, using)
+        fleet_stats.remove_results(gone, using)
+        forecasting.invalidate(dcrm.id, using)
+        for breaker_id in breaker_ids:
+            forecasting.invalidate_breaker(breaker_id, using)
+    return len(gone)
@@ -0,0 +1,127 @@
+# circad/backend/api/result_cache.py
+"""
+Content-addressed cache of analysis results.
+
+An entry is keyed by (SHA-256 of the uploaded bytes, model package fingerprint,
+ai_model.ANALYSIS_VERSION), so a changed file, a retrained contact_health.pkl or
+a change to the analysis code can never be served a stale result. Entries for
+any other model fingerprint or code version are purged on the next write, and
+the table is kept under CIRCAD_ANALYSIS_CACHE_MAX_ENTRIES / _MAX_BYTES by
+evicting the least recently used rows.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import model_utils
+from .models import AnalysisCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def hash_chunks(chunks):
+    """Hex SHA-256 of an iterable of byte chunks (e.g. UploadedFile.chunks())."""
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    with open(path, "rb") as fh:
+        return hash_chunks(iter(lambda: fh.read(block_size), b""))
+
+
+def ensure_digest(dcrm):
+    """Return the DCRMFile's content digest, computing and saving it if missing."""
+    if not dcrm.sha256:
+        dcrm.sha256 = file_sha256(dcrm.file.path)
+        dcrm.save(update_fields=["sha256"])
+    return dcrm.sha256
+
+
+def _enabled():
+    return getattr(settings, "CIRCAD_ANALYSIS_CACHE", True)
+
+
+def _key(digest, fingerprint):
+    from .ai_model import ANALYSIS_VERSION
+    return hashlib.sha256(f"{digest}:{fingerprint}:{ANALYSIS_VERSION}".encode()).hexdigest()
+
+
+def lookup(digest):
+    """Return the cached result for these file bytes under the current model, or None."""
+    if not _enabled() or not digest:
+        return None
+    key = _key(digest, model_utils.model_fingerprint())
+    entry = AnalysisCacheEntry.objects.filter(key=key).only("id", "payload").first()
+    if entry is None:
+        return None
+    AnalysisCacheEntry.objects.filter(id=entry.id).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    return entry.payload
+
+
+def _result_fingerprint(result):
+    """The fingerprint of the model that scored this result ("none" if no model did)."""
+    meta = result.get("model_metadata") or {}
+    return meta.get("model_sha256") or "none"
+
+
+def store(digest, result):
+    """
+    Cache a successful analysis result for these file bytes, under the model
+    that produced it. A result scored by a model that has since been
+    reloaded (model_utils hot reload) is not cached.
+    """
+    if not _enabled() or not digest or result.get("status") == "Invalid data":
+        return
+    from .ai_model import ANALYSIS_VERSION
+    fingerprint = _result_fingerprint(result)
+    if fingerprint != model_utils.model_fingerprint():
+        logger.info("Not caching a result of model %s: the loaded model changed", fingerprint[:12])
+        return
+    size = len(json.dumps(result))
+    AnalysisCacheEntry.objects.update_or_create(
+        key=_key(digest, fingerprint),
+        defaults={
+            "file_sha256": digest,
+            "model_fingerprint": fingerprint,
+            "analysis_version": ANALYSIS_VERSION,
+            "payload": result,
+            "size_bytes": size,
+            "last_used_at": timezone.now(),
+        },
+    )
+    # anything computed with another model or analysis version can never hit again
+    AnalysisCacheEntry.objects.exclude(model_fingerprint=fingerprint, analysis_version=ANALYSIS_VERSION).delete()
+    evict()
+
+
+def evict():
+    """Drop least recently used entries until both the entry and byte budgets hold."""
+    max_entries = getattr(settings, "CIRCAD_ANALYSIS_CACHE_MAX_ENTRIES", 10_000)
+    max_bytes = getattr(settings, "CIRCAD_ANALYSIS_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+    excess = AnalysisCacheEntry.objects.count() - max_entries
+    if excess > 0:
+        stale = AnalysisCacheEntry.objects.order_by("last_used_at").values_list("id", flat=True)[:excess]
+        AnalysisCacheEntry.objects.filter(id__in=list(stale)).delete()
+
+    total = AnalysisCacheEntry.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total > max_bytes:
+        drop = []
+        for entry_id, size in AnalysisCacheEntry.objects.order_by("last_used_at").values_list("id", "size_bytes").iterator():
+            if total <= max_bytes:
+                break
+            drop.append(entry_id)
+            total -= size
+        AnalysisCacheEntry.objects.filter(id__in=drop).delete()
+        logger.info("Analysis cache evicted %d entries over the byte budget", len(drop))
+
+
+def clear():
+    AnalysisCacheEntry.objects.all().delete()
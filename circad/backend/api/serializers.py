@@ -1,12 +1,39 @@
 from rest_framework import serializers
-from .models import DCRMFile, AnalysisResult
+from .models import Breaker, DCRMFile, AnalysisResult
+
+class BreakerSerializer(serializers.ModelSerializer):
+    uploads = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Breaker
+        fields = ['id', 'asset_id', 'name', 'created_at', 'uploads']
 
 class DCRMFileSerializer(serializers.ModelSerializer):
+    asset_id = serializers.CharField(source="breaker.asset_id", read_only=True, default=None)
+
     class Meta:
         model = DCRMFile
-        fields = ['id', 'file', 'uploaded_at']
+        fields = ['id', 'file', 'original_name', 'sha256', 'uploaded_at', 'asset_id', 'tested_at']
 
 class AnalysisResultSerializer(serializers.ModelSerializer):
+    """
+    Summary representation (result_json without the waveform).
+    fields: optional subset of field names to return (list_results ?fields=)
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = AnalysisResult
         fields = "__all__"
+
+class AnalysisResultDetailSerializer(AnalysisResultSerializer):
+    """Puts the stored waveform back into result_json["data_points"], as analyze_dcrm returned it."""
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if isinstance(data.get("result_json"), dict):
+            data["result_json"] = {**data["result_json"], "data_points": instance.data_points()}
+        return data
@@ -0,0 +1,46 @@
+# circad/backend/api/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import breakers, fleet_stats, forecasting
+from .models import AnalysisResult, BreakerMeasurement, DCRMFile
+
+
+@receiver(post_save, sender=AnalysisResult)
+def analysis_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    forecasting.record(instance.dcrm_file_id, instance.mean_resistance, using=kwargs.get("using") or "default")
+    fleet_stats.add_results([instance], using=kwargs.get("using") or "default")
+    breakers.record_analysis(instance, using=kwargs.get("using") or "default")
+
+
+@receiver(post_delete, sender=AnalysisResult)
+def analysis_deleted(sender, instance, **kwargs):
+    # positions shift when history is removed; the state is rebuilt lazily
+    forecasting.invalidate(instance.dcrm_file_id, using=kwargs.get("using") or "default")
+    fleet_stats.remove_result(instance, using=kwargs.get("using") or "default")
+
+
+@receiver(post_save, sender=BreakerMeasurement)
+def measurement_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        forecasting.record_measurement(
+            instance.breaker_id, instance.mean_resistance, instance.tested_at, using=kwargs.get("using") or "default"
+        )
+
+
+@receiver(post_delete, sender=BreakerMeasurement)
+def measurement_deleted(sender, instance, **kwargs):
+    forecasting.invalidate_breaker(instance.breaker_id, using=kwargs.get("using") or "default")
+
+
+@receiver(post_save, sender=DCRMFile)
+def file_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fleet_stats.add_file(using=kwargs.get("using") or "default")
+
+
+@receiver(post_delete, sender=DCRMFile)
+def file_deleted(sender, instance, **kwargs):
+    fleet_stats.remove_file(using=kwargs.get("using") or "default")
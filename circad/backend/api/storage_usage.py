@@ -0,0 +1,122 @@
+# circad/backend/api/storage_usage.py
+"""
+Tracked media storage.
+
+StorageUsage holds the bytes and file count under MEDIA_ROOT. Every code
+path that writes or removes a file there (uploads, analysis sidecars,
+deletes) records the change as a single UPDATE, so system_status and
+reset_circad --status read one row instead of walking the tree. Clearing
+the media folder and the periodic reconcile_storage_task walk it once and
+store the true totals together with the drift they corrected.
+"""
+import logging
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import StorageUsage
+from .preprocessing import remove_sidecar
+
+logger = logging.getLogger(__name__)
+
+
+def _media_root():
+    root = getattr(settings, "MEDIA_ROOT", None)
+    return Path(root).resolve() if root else None
+
+
+def walk(folder):
+    """returns: (bytes, files) of every regular file below folder"""
+    total, count = 0, 0
+    stack = [folder]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                        count += 1
+                except FileNotFoundError:
+                    pass  # removed while walking
+    return total, count
+
+
+def record(delta_bytes, delta_files=0, using="default"):
+    """Add a change to the tracked totals (one UPDATE; the row is seeded by a walk if missing)."""
+    if not delta_bytes and not delta_files:
+        return
+    updated = StorageUsage.objects.using(using).filter(pk=1).update(
+        bytes=F("bytes") + delta_bytes, files=F("files") + delta_files, updated_at=timezone.now()
+    )
+    if not updated:
+        # the walk already sees the change being recorded
+        reconcile(using)
+
+
+def record_path(path, delta_bytes, delta_files=0, using="default"):
+    """record() a change to path, ignoring files outside MEDIA_ROOT (scratch and benchmark dirs)."""
+    root = _media_root()
+    if root is None or not Path(path).resolve().is_relative_to(root):
+        return
+    record(delta_bytes, delta_files, using)
+
+
+def remove_upload(csv_path, using="default"):
+    """
+    Delete an uploaded CSV and its analysis sidecar from disk and uncount them.
+    returns: bytes freed
+    """
+    freed, removed = 0, 0
+    try:
+        size = os.path.getsize(csv_path)
+        os.remove(csv_path)
+        freed, removed = size, 1
+    except FileNotFoundError:
+        pass
+    sidecar_bytes, sidecar_files = remove_sidecar(csv_path)
+    freed += sidecar_bytes
+    removed += sidecar_files
+    record_path(csv_path, -freed, -removed, using)
+    return freed
+
+
+def reconcile(using="default"):
+    """
+    Walk MEDIA_ROOT and store the true totals (reconcile_storage_task,
+    after the media folder is cleared).
+    returns: the StorageUsage row
+    """
+    root = _media_root()
+    walked_bytes, walked_files = walk(root) if root else (0, 0)
+    with transaction.atomic(using=using):
+        usage = StorageUsage.objects.using(using).select_for_update().filter(pk=1).first()
+        if usage is None:
+            usage = StorageUsage(pk=1, bytes=walked_bytes, files=walked_files)
+        usage.drift_bytes = walked_bytes - usage.bytes
+        usage.drift_files = walked_files - usage.files
+        usage.bytes, usage.files = walked_bytes, walked_files
+        usage.reconciled_at = timezone.now()
+        usage.save(using=using)
+    if usage.drift_bytes or usage.drift_files:
+        logger.info("Storage reconciled: %+d bytes, %+d files of drift", usage.drift_bytes, usage.drift_files)
+    return usage
+
+
+def snapshot(using="default"):
+    """returns: the current StorageUsage row (walked once if missing)"""
+    usage = StorageUsage.objects.using(using).filter(pk=1).first()
+    return usage if usage is not None else reconcile(using)
+
+
+def used_mb(usage):
+    return round(usage.bytes / (1024 * 1024), 2)
@@ -3,17 +3,20 @@ import logging
 from celery import shared_task
 import time
 from django.utils import timezone
-from .models import DCRMFile, AnalysisResult
-from . import ai_model
+from django.db.models import F
+from .models import DCRMFile, UploadBatch
+from . import ai_model, archive, db_writer, forecasting, report_jobs, result_cache, storage_usage, upload_sessions
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True)
-def analyze_file_task(self, dcrm_file_id, past_means=None):
+def analyze_file_task(self, dcrm_file_id, past_means=None, force=False):
     """
     Celery task to analyze a DCRM file by id.
+    Results are served from api.result_cache when the same bytes were already
+    analyzed with the current model; force=True always recomputes.
     Returns analysis_id on success and notifies WebSocket.
     """
     try:
@@ -23,35 +26,169 @@ def analyze_file_task(self, dcrm_file_id, past_means=None):
         return {"error": "file_not_found"}
 
     try:
-        # Run main AI model analysis
-        result = ai_model.analyze_dcrm(dcrm.file.path, past_means=past_means)
-
-        # Store result in DB
-        rec = AnalysisResult.objects.create(dcrm_file=dcrm, result_json=result)
-        logger.info("Analysis saved: id=%s file_id=%s", rec.id, dcrm_file_id)
-
-        # Notify all connected dashboards via WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            "analysis_updates",
-            {
-                "type": "analysis_update",
-                "message": f"Analysis complete for File #{dcrm_file_id}",
-                "data": {
-                    "id": rec.id,
-                    "file_id": dcrm_file_id,
-                    "status": result.get("status"),
-                    "mean_resistance": result.get("mean_resistance"),
-                    "timestamp": str(rec.created_at),
-                },
-            },
+        # a breaker's earlier tests feed the forecast (one ForecastState row read)
+        past_sums = forecasting.history_sums(dcrm.id, dcrm.breaker_id) if past_means is None and dcrm.breaker_id else None
+        # only history-free results are cacheable (past_means / past_sums feed the forecast)
+        digest = result_cache.ensure_digest(dcrm) if past_means is None and past_sums is None else None
+        result = result_cache.lookup(digest) if digest and not force else None
+        cached = result is not None
+        if not cached:
+            # Run main AI model analysis
+            result = ai_model.analyze_dcrm(dcrm.file.path, past_means=past_means, past_sums=past_sums)
+            result_cache.store(digest, result)
+        rec = _save_and_notify(dcrm, result)
+        return {"analysis_id": rec.id, "status": "ok", "cached": cached}
+    except Exception as exc:
+        logger.exception("Failed analyze_file_task for %s: %s", dcrm_file_id, exc)
+        raise
+
+@shared_task(bind=True)
+def analyze_files_batch_task(self, dcrm_file_ids, force=False, batch_id=None):
+    """
+    Celery task to analyze many DCRM files with one batched model call
+    (ai_model.analyze_dcrm_batch). Cache hits skip the batch entirely;
+    files linked to a breaker are never cached (their forecast uses its history).
+    Saves one AnalysisResult per file and notifies WebSocket for each,
+    like analyze_file_task. Returns per-file analysis ids.
+    batch_id: the UploadBatch (api.bulk_upload) whose failed count to update
+    """
+    files = DCRMFile.objects.in_bulk(dcrm_file_ids)
+    missing = [fid for fid in dcrm_file_ids if fid not in files]
+    if missing:
+        logger.error("DCRMFile not found: %s", missing)
+        _batch_failed(batch_id, len(missing))
+
+    dcrms = [files[fid] for fid in dcrm_file_ids if fid in files]
+    try:
+        # a breaker's earlier tests feed the forecast, as in analyze_file_task; one
+        # history per breaker, which the batch's files extend in order
+        breaker_sums = {
+            breaker_id: forecasting.history_sums(None, breaker_id)
+            for breaker_id in {d.breaker_id for d in dcrms if d.breaker_id}
+        }
+        # only history-free results are cacheable
+        digests = [None if d.breaker_id else result_cache.ensure_digest(d) for d in dcrms]
+        results = [None if force or not digest else result_cache.lookup(digest) for digest in digests]
+        misses = [i for i, r in enumerate(results) if r is None]
+        fresh = ai_model.analyze_dcrm_batch(
+            [dcrms[i].file.path for i in misses],
+            past_sums_list=[breaker_sums.get(dcrms[i].breaker_id) for i in misses],
+            asset_keys=[dcrms[i].breaker_id for i in misses],
         )
+        for i, result in zip(misses, fresh):
+            result_cache.store(digests[i], result)
+            results[i] = result
 
-        return {"analysis_id": rec.id, "status": "ok"}
+        # one insert request for the whole batch
+        recs = db_writer.save_results(list(zip(dcrms, results)))
+        analyses = []
+        for dcrm, result, rec in zip(dcrms, results, recs):
+            _notify(dcrm, result, rec)
+            analyses.append({"file_id": dcrm.id, "analysis_id": rec.id})
+        return {"analyses": analyses, "missing": missing, "status": "ok"}
     except Exception as exc:
-        logger.exception("Failed analyze_file_task for %s: %s", dcrm_file_id, exc)
+        logger.exception("Failed analyze_files_batch_task for %s: %s", dcrm_file_ids, exc)
+        _batch_failed(batch_id, len(dcrms))
         raise
 
+def _batch_failed(batch_id, n):
+    if batch_id and n:
+        UploadBatch.objects.filter(id=batch_id).update(failed=F("failed") + n)
+
+def reuse_cached(dcrm):
+    """
+    Store the cached result for a new file's bytes (api.result_cache, current
+    model and analysis version) as its analysis right away, the forecast redone
+    from its breaker's history when it is linked to one.
+    returns: the AnalysisResult, or None when those bytes were never analyzed
+    """
+    result = result_cache.lookup(dcrm.sha256)
+    if result is None:
+        return None
+    result = dict(result)
+    if dcrm.breaker_id and result.get("mean_resistance") is not None:
+        # cached results are history-free; add this test to the breaker's sums as analyze_dcrm would
+        past_sums = forecasting.history_sums(dcrm.id, dcrm.breaker_id)
+        forecast = ai_model.forecast_from_sums(*ai_model.add_to_sums(past_sums, result["mean_resistance"]))
+        result["forecast_next_mean"] = round(float(forecast), 3) if forecast is not None else None
+    return _save_and_notify(dcrm, result)
+
+def _save_and_notify(dcrm, result):
+    """Store an analysis result (via api.db_writer) and push it to connected dashboards."""
+    rec, = db_writer.save_results([(dcrm, result)])
+    _notify(dcrm, result, rec)
+    return rec
+
+def _notify(dcrm, result, rec):
+    logger.info("Analysis saved: id=%s file_id=%s", rec.id, dcrm.id)
+
+    # Notify all connected dashboards via WebSocket
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        "analysis_updates",
+        {
+            "type": "analysis_update",
+            "message": f"Analysis complete for File #{dcrm.id}",
+            "data": {
+                "id": rec.id,
+                "file_id": dcrm.id,
+                "status": result.get("status"),
+                "mean_resistance": result.get("mean_resistance"),
+                "timestamp": str(rec.created_at),
+            },
+        },
+    )
+
+@shared_task
+def reconcile_storage_task():
+    """
+    Periodic (CELERY_BEAT_SCHEDULE): walk MEDIA_ROOT and correct the tracked
+    storage totals. Returns the totals and the drift that was corrected.
+    """
+    usage = storage_usage.reconcile()
+    return {
+        "bytes": usage.bytes, "files": usage.files,
+        "drift_bytes": usage.drift_bytes, "drift_files": usage.drift_files,
+    }
+
+@shared_task
+def expire_upload_sessions_task():
+    """
+    Periodic (CELERY_BEAT_SCHEDULE): delete chunked uploads idle for
+    CIRCAD_UPLOAD_SESSION_HOURS with their partial files.
+    """
+    aborted, forgotten = upload_sessions.expire()
+    return {"aborted": aborted, "forgotten": forgotten}
+
+@shared_task(bind=True)
+def generate_pdf_report_task(self, artifact_id):
+    """
+    Build a queued PDF report (api.report_jobs). Page charts are rendered
+    in a process pool of CIRCAD_REPORT_WORKERS; progress goes to the
+    ReportArtifact row and to the task state (PROGRESS, {done, total}).
+    Returns the report id and size.
+    """
+    def progress(done, total):
+        if self.request.id and not self.request.is_eager:
+            self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+
+    try:
+        artifact = report_jobs.run(artifact_id, progress)
+    except Exception as exc:
+        logger.exception("Failed generate_pdf_report_task for %s: %s", artifact_id, exc)
+        raise
+    return {"report_id": artifact.id, "status": artifact.status, "size_bytes": artifact.size_bytes}
+
+@shared_task
+def archive_results_task():
+    """
+    Periodic (CELERY_BEAT_SCHEDULE): move results older than
+    CIRCAD_ARCHIVE_AFTER_DAYS into the monthly archive files (api.archive).
+    Returns the months archived and their row counts.
+    """
+    months = archive.archive_before()
+    return {"months": {key: rows for key, rows, _ in months}}
+
 @shared_task
 def test_celery_task(name="CIRCAD"):
     print(f"Starting async task for {name}...")
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import shutil
+import struct
+import tempfile
+import warnings
+import zipfile
+from datetime import timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import blobs, bulk_upload, flat_forest, model_utils, preprocessing, upload_sessions
+from api.models import AnalysisResult, DCRMFile, UploadSession
+from api.views import KeysetPagination
+
+
+class RunningStatsTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        # longer than one block, with a trend, so the merge and the slope both matter
+        self.y = 50 + rng.normal(0, 2.0, 3 * preprocessing.BLOCK_ROWS + 123) + np.linspace(0, 5, 3 * preprocessing.BLOCK_ROWS + 123)
+
+    def test_features_match_numpy(self):
+        mean, std, min_r, max_r, slope = preprocessing.RunningStats().update(self.y).features()
+        self.assertAlmostEqual(mean, self.y.mean(), places=9)
+        self.assertAlmostEqual(std, self.y.std(), places=9)
+        self.assertEqual(min_r, self.y.min())
+        self.assertEqual(max_r, self.y.max())
+        self.assertAlmostEqual(slope, np.polyfit(np.arange(self.y.size), self.y, 1)[0], places=12)
+
+    def test_merge_does_not_depend_on_chunking(self):
+        whole = preprocessing.RunningStats().update(self.y).features()
+        chunked = preprocessing.RunningStats()
+        for start, stop in ((0, 1), (1, 1000), (1000, 70_000), (70_000, self.y.size)):
+            chunked.update(self.y[start:stop])
+        np.testing.assert_allclose(chunked.features(), whole, rtol=1e-12, atol=1e-12)
+
+
+class FlatForestTests(SimpleTestCase):
+    def test_predict_proba_matches_sklearn(self):
+        from sklearn.ensemble import RandomForestClassifier
+
+        rng = np.random.default_rng(1)
+        X = rng.normal(50, 20, (400, 5))
+        y = np.where(X[:, 0] > 55, np.where(X[:, 0] > 75, 2, 1), 0)
+        clf = RandomForestClassifier(n_estimators=25, max_depth=6, random_state=0).fit(X, y)
+        flat = flat_forest.FlatForest.from_sklearn(clf)
+
+        probe = np.vstack([rng.normal(50, 30, (300, 5)), flat_forest.probe_rows(flat)])
+        np.testing.assert_allclose(flat.predict_proba(probe), clf.predict_proba(probe), rtol=0, atol=model_utils.FLAT_FOREST_TOLERANCE)
+        self.assertLessEqual(flat_forest.parity_error(flat, clf, probe), model_utils.FLAT_FOREST_TOLERANCE)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        dcrm = DCRMFile.objects.create(file="uploads/keyset.csv")
+        t0 = timezone.now().replace(microsecond=0)
+        for i in range(25):
+            rec = AnalysisResult.objects.create(dcrm_file=dcrm, result_json={"status": "Healthy"})
+            # three results per second, so page boundaries fall inside a tie on created_at
+            AnalysisResult.objects.filter(id=rec.id).update(created_at=t0 - timedelta(seconds=i // 3))
+        cls.expected = list(AnalysisResult.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def page(self, cursor):
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(AnalysisResult.objects.all(), Request(APIRequestFactory().get("/api/results/", {"cursor": cursor})))
+        return [r.id for r in rows], paginator
+
+    @staticmethod
+    def cursor_of(link):
+        return parse_qs(urlparse(link).query)["cursor"][0] if link else None
+
+    def test_walks_every_row_once_both_ways(self):
+        seen, pages, cursor = [], [], ""
+        while cursor is not None:
+            ids, paginator = self.page(cursor)
+            seen += ids
+            pages.append(ids)
+            cursor = self.cursor_of(paginator.get_next_link())
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+
+        # and back from the last page through the previous links
+        cursor = self.cursor_of(paginator.get_previous_link())
+        for want in reversed(pages[:-1]):
+            ids, paginator = self.page(cursor)
+            self.assertEqual(ids, want)
+            cursor = self.cursor_of(paginator.get_previous_link())
+        self.assertIsNone(cursor)
+
+    def test_naive_cursor_is_read_as_utc(self):
+        boundary = AnalysisResult.objects.get(id=self.expected[9])
+        naive = boundary.created_at.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        cursor = base64.urlsafe_b64encode(f"{naive.isoformat()}|{boundary.id}|0".encode()).decode()
+        with warnings.catch_warnings():
+            # Django only warns (and guesses a zone) when a naive datetime reaches the query
+            warnings.simplefilter("error", RuntimeWarning)
+            self.assertEqual(self.page(cursor)[0], self.expected[10:20])
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ("not-base64!", base64.urlsafe_b64encode(b"yesterday|1|0").decode()):
+            with self.assertRaises(NotFound):
+                self.page(cursor)
+
+
+class UploadSessionTests(TestCase):
+    data = b"Time (ms),Resistance (micro-ohms)\n" + b"".join(b"%d,%d\n" % (i, 50 + i % 7) for i in range(4000))
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, CIRCAD_UPLOAD_CHUNK_BYTES=16 * 1024)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media = Path(media)
+        self.digest = hashlib.sha256(self.data).hexdigest()
+
+    def upload(self, chunk=10_000, forget=False, **kwargs):
+        session = upload_sessions.start("trip.csv", len(self.data), **kwargs)
+        offset = 0
+        while offset < len(self.data):
+            if forget:
+                # as if each chunk reached a different worker process
+                upload_sessions._hashers.clear()
+            body = self.data[offset:offset + chunk]
+            offset = upload_sessions.write_chunk(session, offset, io.BytesIO(body), len(body))
+        return session
+
+    def test_chunks_finalize_into_a_blob(self):
+        session = self.upload(sha256=self.digest)
+        dcrm, created, new_blob = upload_sessions.finalize(session)
+        self.assertTrue(created and new_blob)
+        self.assertEqual((dcrm.sha256, dcrm.file.name, dcrm.original_name), (self.digest, blobs.blob_name(self.digest), "trip.csv"))
+        self.assertEqual((self.media / dcrm.file.name).read_bytes(), self.data)
+        self.assertFalse(upload_sessions.part_path(session).exists())
+        # a retried finalize returns the same file
+        self.assertEqual(upload_sessions.finalize(UploadSession.objects.get(id=session.id)), (dcrm, False, False))
+
+        # the same bytes again share the blob
+        again, created, new_blob = upload_sessions.finalize(self.upload())
+        self.assertTrue(created)
+        self.assertFalse(new_blob)
+        self.assertEqual(again.file.name, dcrm.file.name)
+
+    def test_digest_without_hash_state_is_read_once_at_finalize(self):
+        session = self.upload(forget=True, sha256=self.digest)
+        with mock.patch.object(upload_sessions, "_digest", wraps=upload_sessions._digest) as digest:
+            dcrm, created, _ = upload_sessions.finalize(session)
+        digest.assert_called_once()
+        self.assertEqual(dcrm.sha256, self.digest)
+
+        with self.assertRaisesRegex(ValueError, "sha256 mismatch"):
+            upload_sessions.finalize(self.upload(forget=True, sha256="0" * 64))
+
+    def test_chunks_must_follow_the_stored_offset(self):
+        session = upload_sessions.start("trip.csv", 200)
+        upload_sessions.write_chunk(session, 0, io.BytesIO(self.data[:100]), 100)
+        with self.assertRaises(upload_sessions.OffsetMismatch) as caught:
+            upload_sessions.write_chunk(session, 50, io.BytesIO(self.data[50:150]), 100)
+        self.assertEqual(caught.exception.expected, 100)
+        with self.assertRaisesRegex(ValueError, "past the declared size"):
+            upload_sessions.write_chunk(session, 100, io.BytesIO(self.data[100:300]), 200)
+        with self.assertRaisesRegex(ValueError, "upload incomplete"):
+            upload_sessions.finalize(session)
+
+    def test_failed_finalize_can_be_retried(self):
+        session = self.upload()
+        with mock.patch.object(DCRMFile.objects, "create", side_effect=RuntimeError("database is locked")):
+            with self.assertRaises(RuntimeError):
+                upload_sessions.finalize(session)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.UPLOADING)
+        self.assertTrue(upload_sessions.part_path(session).exists())
+        self.assertFalse((self.media / blobs.blob_name(self.digest)).exists())
+
+        dcrm, created, new_blob = upload_sessions.finalize(session)
+        self.assertTrue(created and new_blob)
+        self.assertEqual(dcrm.sha256, self.digest)
+
+    def test_abort_removes_the_part(self):
+        session = self.upload(chunk=1000)
+        upload_sessions.abort(session)
+        self.assertFalse(upload_sessions.part_path(session).exists())
+        self.assertFalse(UploadSession.objects.filter(id=session.id).exists())
+
+
+class BulkUploadTests(TestCase):
+    csv = b"Time (ms),Resistance (micro-ohms)\n" + b"".join(b"%d,%d\n" % (i, 50 + i % 5) for i in range(2000))
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media = Path(media)
+
+    def archive(self, *members, encrypted=False, method=None):
+        """A zip of (name, bytes), its members marked encrypted or given another compression method id."""
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name, data in members:
+                zf.writestr(name, data)
+        raw = bytearray(buf.getvalue())
+        # every local header has its flags at offset 6 and method at 8, every central directory entry at 8 and 10
+        for sig, at in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+            pos = raw.find(sig)
+            while pos != -1:
+                flags, compress = struct.unpack_from("<HH", raw, pos + at)
+                struct.pack_into("<HH", raw, pos + at, flags | encrypted, compress if method is None else method)
+                pos = raw.find(sig, pos + 4)
+        return io.BytesIO(bytes(raw))
+
+    def assertNothingKept(self):
+        self.assertFalse(DCRMFile.objects.exists())
+        self.assertEqual([p for p in self.media.rglob("*") if p.is_file()], [])
+
+    def test_ingest_stores_the_csvs(self):
+        batch = bulk_upload.ingest(self.archive(("a/run_1.csv", self.csv), ("a/run_2.csv", self.csv + b"1,1\n"), ("notes.txt", b"x")), "runs.zip")
+        self.assertEqual(batch.total, 2)
+        self.assertEqual(batch.skipped, ["notes.txt"])
+        self.assertEqual(sorted(batch.files.values_list("original_name", flat=True)), ["run_1.csv", "run_2.csv"])
+
+    def test_unreadable_members_are_rejected(self):
+        for kwargs in ({"encrypted": True}, {"method": 99}):
+            with self.subTest(**kwargs):
+                with self.assertRaisesRegex(ValueError, "^Unreadable archive"):
+                    bulk_upload.ingest(self.archive(("run_1.csv", self.csv), ("run_2.csv", self.csv), **kwargs), "bad.zip")
+                self.assertNothingKept()
+
+    def test_file_and_archive_limits_are_told_apart(self):
+        with override_settings(CIRCAD_MAX_UPLOAD_BYTES=len(self.csv) - 1):
+            with self.assertRaisesRegex(ValueError, "per file"):
+                bulk_upload.ingest(self.archive(("run_1.csv", self.csv)), "big.zip")
+        self.assertNothingKept()
+        with override_settings(CIRCAD_BULK_UPLOAD_MAX_BYTES=len(self.csv) + 10):
+            with self.assertRaisesRegex(ValueError, "per archive"):
+                bulk_upload.ingest(self.archive(("run_1.csv", self.csv), ("run_2.csv", self.csv + b"1,1\n")), "many.zip")
+        self.assertNothingKept()
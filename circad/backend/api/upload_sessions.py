@@ -0,0 +1,312 @@
+# circad/backend/api/upload_sessions.py
+"""
+Chunked, resumable uploads.
+
+upload_dcrm takes a whole CSV in one multipart request, so a long
+recording over a flaky link starts again from zero when the connection
+drops. Here the client opens an UploadSession (start), PUTs the file's
+bytes in chunks of up to CIRCAD_UPLOAD_CHUNK_BYTES at the offset the
+server has (write_chunk), and finalizes it (finalize), which turns the
+file into a DCRMFile exactly like upload_dcrm does (a content-addressed
+blob, see api.blobs).
+
+Chunks are streamed from the request straight into
+MEDIA_ROOT/uploads/partial/<id>.part; a chunk cut short still keeps the
+bytes that arrived, and status tells the client where to resume. The
+SHA-256 is computed while the bytes arrive, in the memory of the process
+serving the chunks. When a chunk lands on a process without that state
+(another worker served the previous one, or it restarted), hashing stops
+for the session there and finalize reads the part file once instead;
+a chunk never re-reads what was written before it. Sessions idle for
+CIRCAD_UPLOAD_SESSION_HOURS are removed by expire_upload_sessions_task.
+"""
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import blobs, storage_usage
+from .models import DCRMFile, UploadSession
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 64 * 1024
+MAX_HASHERS = 64
+
+# session id -> (sha256 object, bytes hashed), for the sessions this process served last
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start where the stored file ends (or another chunk is being written)."""
+
+    def __init__(self, expected):
+        super().__init__(f"expected offset {expected}")
+        self.expected = expected
+
+
+class AlreadyFinalized(ValueError):
+    """The session was finalized (its part file became the DCRMFile's blob)."""
+
+    def __init__(self):
+        super().__init__("upload already finalized")
+
+
+def chunk_bytes():
+    return int(getattr(settings, "CIRCAD_UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024))
+
+
+def _max_bytes():
+    return int(getattr(settings, "CIRCAD_MAX_UPLOAD_BYTES", 5 * 1024 * 1024))
+
+
+def _ttl():
+    return timedelta(hours=float(getattr(settings, "CIRCAD_UPLOAD_SESSION_HOURS", 24)))
+
+
+def part_path(session):
+    return Path(settings.MEDIA_ROOT) / "uploads" / "partial" / f"{session.id}.part"
+
+
+def describe(session):
+    """The status payload of a session (the upload endpoints)."""
+    return {
+        "upload_id": str(session.id),
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "status": session.status,
+        "chunk_size": chunk_bytes(),
+        "file_id": session.dcrm_file_id,
+    }
+
+
+def start(filename, size, sha256="", breaker=None, tested_at=None):
+    """
+    Open a session for a CSV of `size` bytes.
+      - sha256: the client's hex digest of the whole file, checked at finalize (optional)
+    returns: the UploadSession
+    raises: ValueError for a bad name, size or digest
+    """
+    filename = os.path.basename(str(filename or "")).strip()
+    if not filename.lower().endswith(".csv"):
+        raise ValueError("Only CSV files allowed")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ValueError("size must be the file size in bytes")
+    if size <= 0:
+        raise ValueError("size must be positive")
+    if size > _max_bytes():
+        raise ValueError(f"File too large (max {_max_bytes() // (1024 * 1024)} MB)")
+    sha256 = str(sha256 or "").strip().lower()
+    if sha256 and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        raise ValueError("sha256 must be a hex SHA-256 digest")
+
+    session = UploadSession.objects.create(
+        filename=filename, size=size, sha256=sha256, breaker=breaker, tested_at=tested_at,
+    )
+    path = part_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    storage_usage.record_path(path, 0, 1)
+    return session
+
+
+@contextmanager
+def _locked(session):
+    """
+    The open part file, locked against concurrent chunks / finalize of the same session.
+    raises: OffsetMismatch while another request holds it; AlreadyFinalized or
+            ValueError (expired / aborted) when the part file is gone
+    """
+    try:
+        fh = open(part_path(session), "r+b")
+    except FileNotFoundError:
+        # a concurrent finalize may have just moved it into the blob store
+        session.refresh_from_db(fields=["status", "dcrm_file", "received"])
+        if session.status == UploadSession.COMPLETE:
+            raise AlreadyFinalized()
+        raise ValueError("upload expired or aborted; start again")
+    with fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise OffsetMismatch(session.received)
+        yield fh
+
+
+def _hasher(session, offset):
+    """The hash state of the part's first `offset` bytes if this process has it, else None."""
+    with _hashers_lock:
+        cached = _hashers.pop(session.id, None)
+    if offset == 0:
+        return hashlib.sha256()
+    if cached is not None and cached[1] == offset:
+        return cached[0]
+    return None
+
+
+def _digest(fh, size):
+    """returns: the hex SHA-256 of the part's first `size` bytes, read from disk"""
+    h = hashlib.sha256()
+    fh.seek(0)
+    left = size
+    while left:
+        block = fh.read(min(READ_BLOCK * 16, left))
+        if not block:
+            break
+        h.update(block)
+        left -= len(block)
+    return h.hexdigest()
+
+
+def _remember(session, h, offset):
+    with _hashers_lock:
+        _hashers[session.id] = (h, offset)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Store up to `length` bytes read from stream at `offset`. A chunk cut
+    short (client disconnect) keeps what arrived.
+    returns: the new offset
+    raises: OffsetMismatch if offset is not where the stored file ends;
+            ValueError for a finalized session or a chunk that does not fit
+    """
+    if session.status != UploadSession.UPLOADING:
+        raise AlreadyFinalized()
+    if length <= 0:
+        raise ValueError("empty chunk (Content-Length required)")
+    if length > chunk_bytes():
+        raise ValueError(f"chunk too large (max {chunk_bytes()} bytes)")
+    with _locked(session) as fh:
+        # the row may have moved on while this request waited for its body
+        session.refresh_from_db(fields=["received", "status"])
+        if session.status != UploadSession.UPLOADING:
+            raise AlreadyFinalized()
+        if offset != session.received:
+            raise OffsetMismatch(session.received)
+        if offset + length > session.size:
+            raise ValueError(f"chunk ends past the declared size ({session.size} bytes)")
+
+        before = os.fstat(fh.fileno()).st_size
+        # None: the bytes before offset were hashed elsewhere, finalize hashes the whole part
+        h = _hasher(session, offset)
+        # drop anything past the last recorded offset (a write that failed half-way)
+        fh.truncate(offset)
+        fh.seek(offset)
+        written, left = 0, length
+        while left:
+            try:
+                block = stream.read(min(READ_BLOCK, left))
+            except OSError:
+                logger.info("Upload %s: client went away after %d bytes of a chunk", session.id, written)
+                break
+            if not block:
+                break
+            fh.write(block)
+            if h is not None:
+                h.update(block)
+            written += len(block)
+            left -= len(block)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+        session.received = offset + written
+        UploadSession.objects.filter(id=session.id).update(received=session.received, updated_at=timezone.now())
+        if h is not None:
+            _remember(session, h, session.received)
+        storage_usage.record_path(fh.name, session.received - before)
+    return session.received
+
+
+def finalize(session):
+    """
+    Turn a complete upload into a DCRMFile (its digest checked against the
+    one given at start), stored as a content-addressed blob (api.blobs).
+    returns: (dcrm_file, created, new_blob); created is False when the
+             session was already finalized (a retried request)
+    raises: ValueError if the upload is incomplete or its digest does not match;
+            OffsetMismatch while a chunk or another finalize holds the session
+    """
+    if session.status == UploadSession.COMPLETE:
+        return session.dcrm_file, False, False
+    try:
+        with _locked(session) as fh:
+            session.refresh_from_db()
+            if session.status == UploadSession.COMPLETE:
+                return session.dcrm_file, False, False
+            if session.received != session.size:
+                raise ValueError(f"upload incomplete: {session.received} of {session.size} bytes")
+            h = _hasher(session, session.received)
+            digest = h.hexdigest() if h is not None else _digest(fh, session.received)
+            if session.sha256 and digest != session.sha256:
+                raise ValueError("sha256 mismatch: the stored bytes differ from the file; abort and start again")
+
+            size = os.fstat(fh.fileno()).st_size
+            with blobs.claim([digest]):
+                # the part file stays until the row is committed, so a failure leaves a session to retry
+                name, new_blob = blobs.adopt(fh.name, digest, keep=True)
+                try:
+                    with transaction.atomic():
+                        dcrm = DCRMFile.objects.create(
+                            file=name, sha256=digest, original_name=session.filename,
+                            breaker=session.breaker, tested_at=session.tested_at,
+                        )
+                        session.status, session.dcrm_file = UploadSession.COMPLETE, dcrm
+                        session.save(update_fields=["status", "dcrm_file", "updated_at"])
+                except BaseException:
+                    if new_blob:
+                        blobs.discard(name)
+                    raise
+            # the part was counted chunk by chunk; adopt() counted the blob only if it is new
+            os.remove(fh.name)
+            storage_usage.record_path(fh.name, -size, -1)
+    except AlreadyFinalized:
+        # a concurrent finalize won the race; this is a retry of it
+        return session.dcrm_file, False, False
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    return dcrm, True, new_blob
+
+
+def abort(session):
+    """Delete a session and its partial file."""
+    path = part_path(session)
+    try:
+        size = path.stat().st_size
+        path.unlink()
+        storage_usage.record_path(path, -size, -1)
+    except FileNotFoundError:
+        pass
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    session.delete()
+
+
+def expire(now=None):
+    """
+    Abort sessions idle for CIRCAD_UPLOAD_SESSION_HOURS and forget old finished ones.
+    returns: (aborted, forgotten)
+    """
+    cutoff = (now or timezone.now()) - _ttl()
+    idle = UploadSession.objects.filter(updated_at__lt=cutoff)
+    aborted = 0
+    for session in idle.filter(status=UploadSession.UPLOADING):
+        abort(session)
+        aborted += 1
+    forgotten, _ = idle.filter(status=UploadSession.COMPLETE).delete()
+    return aborted, forgotten
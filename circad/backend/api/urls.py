@@ -7,18 +7,29 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
     path("upload/", views.upload_dcrm, name="upload_dcrm"),
+    path("upload/chunked/", views.start_chunked_upload, name="start_chunked_upload"),
+    path("upload/chunked/<uuid:upload_id>/", views.chunked_upload, name="chunked_upload"),
+    path("upload/chunked/<uuid:upload_id>/finalize/", views.finalize_chunked_upload, name="finalize_chunked_upload"),
+    path("upload/bulk/", views.upload_bulk, name="upload_bulk"),
+    path("upload/bulk/<int:batch_id>/", views.bulk_upload_status, name="bulk_upload_status"),
     path("task/<str:task_id>/", views.task_status, name="task-status"),
     path("analyze/<int:file_id>/", views.analyze_dcrm_file, name="analyze_dcrm_file"),
     path("results/", views.list_results, name="list_results"),
+    path("results/<int:analysis_id>/", views.result_detail, name="result_detail"),
+    path("breakers/", views.list_breakers, name="list_breakers"),
+    path("breakers/<str:asset_id>/trend/", views.breaker_trend, name="breaker_trend"),
     path("admin/system_status/", views_admin.system_status),
     path("admin/reset_all/", views_admin.reset_all),
     path("admin/reanalyze/<int:file_id>/", views_admin.reanalyze_file, name="reanalyze_file"),
     path("admin/bulk_reanalyze/", views_admin.bulk_reanalyze, name="bulk_reanalyze"),
+    path("admin/models/", views_admin.model_registry, name="model_registry"),
     path("admin/reset_db_only/", views_admin.reset_db_only),
     path("admin/clear_uploads/", views_admin.clear_uploads),
     path("admin/delete_file/<int:file_id>/", views_admin.delete_file),
     path("admin/delete_analysis/<int:analysis_id>/", views_admin.delete_analysis),
     path("reports/pdf/", reports.generate_pdf_report),
+    path("reports/pdf/<int:report_id>/", reports.pdf_report_status),
+    path("reports/pdf/<int:report_id>/download/", reports.pdf_report_download),
     path("reports/csv/", reports.generate_csv_report),
     path("auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
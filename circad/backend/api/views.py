@@ -1,22 +1,30 @@
+import base64
+import binascii
+from datetime import datetime, timezone as dt_timezone
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, parser_classes, permission_classes, authentication_classes
 from rest_framework.response import Response
 from django.core.files.storage import default_storage
-from .models import DCRMFile, AnalysisResult
-from .serializers import DCRMFileSerializer, AnalysisResultSerializer
-from . import ai_model
+from .models import Breaker, DCRMFile, AnalysisResult, UploadBatch, UploadSession
+from .serializers import BreakerSerializer, DCRMFileSerializer, AnalysisResultSerializer, AnalysisResultDetailSerializer
+from . import ai_model, archive, blobs, breakers, bulk_upload, fleet_stats, forecasting, upload_sessions
 from .ai_model import analyze_dcrm
 from pathlib import Path
+from django.http import Http404
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param
 from django_ratelimit.decorators import ratelimit
-from .tasks import analyze_file_task
+from .tasks import analyze_file_task, reuse_cached
 from celery.result import AsyncResult
 from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.models import User
@@ -56,22 +64,164 @@ def upload_dcrm(request):
         return Response({"error": "No file provided"}, status=400)
     if not file_obj.name.lower().endswith(".csv"):
         return Response({"error": "Only CSV files allowed"}, status=400)
-    if file_obj.size > 5 * 1024 * 1024:
-        return Response({"error": "File too large (max 5 MB)"}, status=400)
-    
-    dcrm = DCRMFile.objects.create(file=file_obj)
-    serializer = DCRMFileSerializer(dcrm)
+    max_bytes = getattr(settings, "CIRCAD_MAX_UPLOAD_BYTES", 5 * 1024 * 1024)
+    if file_obj.size > max_bytes:
+        return Response({"error": f"File too large (max {max_bytes // (1024 * 1024)} MB)"}, status=400)
+    try:
+        # optional: the breaker tested (asset id) and when, so its history spans uploads
+        tested_at = breakers.parse_when(request.data.get("tested_at"))
+        breaker = breakers.resolve(request.data.get("asset_id"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
+    # hashed while it is written; the same bytes uploaded before share one stored blob (api.blobs)
+    path, digest = blobs.spool(file_obj.chunks())
+    with blobs.claim([digest]):
+        name, new_blob = blobs.adopt(path, digest)
+        dcrm = DCRMFile.objects.create(
+            file=name, sha256=digest, original_name=file_obj.name[:255], breaker=breaker, tested_at=tested_at,
+        )
+    return _queued(dcrm, new_blob)
+
+def _queued(dcrm, new_blob):
+    """
+    The upload response for a new DCRMFile: 200 with its analysis when these
+    bytes were analyzed before (api.result_cache), else 202 with it queued.
+    """
+    serializer = DCRMFileSerializer(dcrm)
+    data = {
+        "message": "File uploaded successfully",
+        "file_id": serializer.data.get("id"),
+        "file_path": serializer.data.get("file"),
+        "asset_id": serializer.data.get("asset_id"),
+        "duplicate": not new_blob,
+    }
+    record = reuse_cached(dcrm)
+    if record is not None:
+        return Response(dict(data, analysis_id=record.id, task_id=None), status=status.HTTP_200_OK)
     # Enqueue Celery analysis task; we pass no past_means here and let task compute if needed
     task = analyze_file_task.delay(dcrm.id)
+    return Response(dict(data, task_id=task.id), status=status.HTTP_202_ACCEPTED)
+
+@ratelimit(key='ip', rate='10/m', block=True)
+@api_view(["POST"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def start_chunked_upload(request):
+    """
+    Start a resumable upload (api.upload_sessions) for recordings too large
+    or links too flaky for upload/. POST JSON:
+    { "filename": "run.csv", "size": 734003200,
+      "sha256": "<hex>",                   (optional; checked at finalize)
+      "asset_id": "...", "tested_at": "..." }   (optional, as for upload/)
+    Then PUT each chunk's raw bytes to upload/chunked/<upload_id>/?offset=N
+    (or an Upload-Offset header), GET that URL for the offset to resume from,
+    and POST upload/chunked/<upload_id>/finalize/ to enqueue the analysis.
+    """
+    try:
+        tested_at = breakers.parse_when(request.data.get("tested_at"))
+        breaker = breakers.resolve(request.data.get("asset_id"))
+        session = upload_sessions.start(
+            request.data.get("filename"), request.data.get("size"), request.data.get("sha256"),
+            breaker=breaker, tested_at=tested_at,
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(upload_sessions.describe(session), status=status.HTTP_201_CREATED)
+
+@api_view(["GET", "PUT", "DELETE"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def chunked_upload(request, upload_id):
+    """
+    GET: the session's status and offset. PUT: store the raw body as the
+    chunk starting at ?offset= (409 with the expected offset if it does not
+    match). DELETE: abort the upload.
+    """
+    session = get_object_or_404(UploadSession, id=upload_id)
+    if request.method == "GET":
+        return Response(upload_sessions.describe(session))
+    if request.method == "DELETE":
+        upload_sessions.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
+    try:
+        offset = int(request.query_params.get("offset", request.headers.get("Upload-Offset", "")))
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return Response({"error": "offset must be an integer byte offset"}, status=400)
+    try:
+        upload_sessions.write_chunk(session, offset, request.stream, length)
+    except upload_sessions.OffsetMismatch as e:
+        return Response({"error": str(e), **upload_sessions.describe(session), "offset": e.expected}, status=409)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response(upload_sessions.describe(session))
+
+@api_view(["POST"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def finalize_chunked_upload(request, upload_id):
+    """Check the stored bytes and enqueue the analysis, as upload/ does (retrying is safe)."""
+    session = get_object_or_404(UploadSession, id=upload_id)
+    try:
+        dcrm, created, new_blob = upload_sessions.finalize(session)
+    except upload_sessions.OffsetMismatch:
+        # a chunk or another finalize of this upload is in progress; retry
+        return Response({"error": "upload busy; retry", **upload_sessions.describe(session)}, status=409)
+    except ValueError as e:
+        return Response({"error": str(e), **upload_sessions.describe(session)}, status=409)
+    if dcrm is None:
+        return Response({"error": "The uploaded file was deleted"}, status=410)
+    if created:
+        response = _queued(dcrm, new_blob)
+        response.data["upload_id"] = str(session.id)
+        return response
+    serializer = DCRMFileSerializer(dcrm)
     return Response({
         "message": "File uploaded successfully",
+        "upload_id": str(session.id),
         "file_id": serializer.data.get("id"),
         "file_path": serializer.data.get("file"),
-        "task_id": task.id
+        "asset_id": serializer.data.get("asset_id"),
+        "task_id": None,
+    }, status=status.HTTP_200_OK)
+
+@ratelimit(key='ip', rate='10/m', block=True)
+@api_view(["POST"])
+@parser_classes([MultiPartParser, FormParser])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_bulk(request):
+    """
+    Upload a .zip or .tar(.gz) of CSVs as one batch (api.bulk_upload):
+    every CSV becomes a DCRMFile and the analyses run as one Celery group.
+    Optional asset_id / tested_at apply to every file, as for upload/.
+    Poll upload/bulk/<batch_id>/ for the aggregate progress.
+    """
+    file_obj = request.FILES.get("file")
+    if not file_obj:
+        return Response({"error": "No file provided"}, status=400)
+    try:
+        tested_at = breakers.parse_when(request.data.get("tested_at"))
+        breaker = breakers.resolve(request.data.get("asset_id"))
+        batch = bulk_upload.ingest(file_obj, file_obj.name, breaker=breaker, tested_at=tested_at)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    bulk_upload.dispatch(batch)
+    return Response({
+        "message": f"{batch.total} files uploaded",
+        **bulk_upload.describe(batch),
     }, status=status.HTTP_202_ACCEPTED)
 
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def bulk_upload_status(request, batch_id):
+    """Aggregate analysis progress of a bulk upload."""
+    batch = get_object_or_404(UploadBatch, id=batch_id)
+    return Response(bulk_upload.describe(batch))
+
 @ratelimit(key='ip', rate='5/m', block=True)
 @api_view(["POST"])
 def analyze_dcrm_file(request, file_id):
@@ -82,12 +232,10 @@ def analyze_dcrm_file(request, file_id):
         dcrm = get_object_or_404(DCRMFile, id=file_id)
         file_path = dcrm.file.path
 
-        # Collect past mean values (last N analyses for same breaker or globally)
-        # Here we take last 10 AnalysisResult.mean values for forecasting.
-        past_records = AnalysisResult.objects.filter(dcrm_file=dcrm).order_by("created_at")  # older->newer
-        past_means = [r.result_json.get("mean_resistance") for r in past_records if r.result_json.get("mean_resistance") is not None]
+        # History for the forecast: the breaker's (or file's) running least-squares sums (one row read)
+        past_sums = forecasting.history_sums(dcrm.id, dcrm.breaker_id)
 
-        result = ai_model.analyze_dcrm(file_path, past_means=past_means)
+        result = ai_model.analyze_dcrm(file_path, past_sums=past_sums)
 
         if "status" in result and result.get("status") == "Invalid data":
             return Response(result, status=400)
@@ -98,7 +246,7 @@ def analyze_dcrm_file(request, file_id):
             result_json=result
         )
 
-        return Response(AnalysisResultSerializer(record).data, status=200)
+        return Response(AnalysisResultDetailSerializer(record).data, status=200)
     except DCRMFile.DoesNotExist:
         return Response({"error": "File not found"}, status=404)
     except Exception as e:
@@ -107,32 +255,180 @@ def analyze_dcrm_file(request, file_id):
 class ResultPagination(PageNumberPagination):
     page_size = 10
 
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (created_at, id), newest first. A page is one
+    index range scan that starts right after the cursor's row, with no
+    OFFSET and no COUNT(*), so page 10,000 costs the same as page 1.
+    Cursors are opaque (base64 of the boundary row's created_at and id);
+    the response has next / previous links and no count.
+    """
+    page_size = 10
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        rows = self.fetch(queryset, position, reverse)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def fetch(self, queryset, position, reverse):
+        """returns: up to page_size + 1 rows past position, in walking order"""
+        if position is None:
+            queryset = queryset.order_by("-created_at", "-id")
+        else:
+            created_at, pk = position
+            # the redundant created_at bound gives the planner an index range to seek to
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).filter(
+                    Q(created_at__gt=created_at) | Q(id__gt=pk)
+                ).order_by("created_at", "id")
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).filter(
+                    Q(created_at__lt=created_at) | Q(id__lt=pk)
+                ).order_by("-created_at", "-id")
+        return list(queryset[:self.page_size + 1])
+
+    def decode_cursor(self, request):
+        """returns: ((created_at, id) or None for the first page, reverse)"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            created_at, pk, reverse = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii").split("|")
+            created_at = datetime.fromisoformat(created_at)
+            if timezone.is_naive(created_at):
+                # cursors we issue always carry an offset; take a bare one as UTC
+                created_at = timezone.make_aware(created_at, dt_timezone.utc)
+            return (created_at, int(pk)), reverse == "1"
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def cursor_for(row, reverse=False):
+        """returns: the opaque cursor for the page after (or, reversed, before) row"""
+        raw = f"{row.created_at.isoformat()}|{row.id}|{int(reverse)}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def encode_cursor(self, row, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.cursor_for(row, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+class ArchiveKeysetPagination(KeysetPagination):
+    """
+    KeysetPagination over the hot table and the monthly archive (api.archive)
+    together, for created_at ranges that reach back into the archive.
+    """
+    def __init__(self, start, end, status=None):
+        self.start, self.end, self.status = start, end, status
+
+    def fetch(self, queryset, position, reverse):
+        hot = super().fetch(queryset, position, reverse)
+        archived = [
+            archive.instance(row) for row in archive.rows(
+                self.start, self.end, self.status, newest_first=not reverse,
+                before=None if reverse else position, after=position if reverse else None,
+                limit=self.page_size + 1,
+            )
+        ]
+        # rows of an interrupted archive run are still hot too; the hot copy wins
+        hot_ids = {r.id for r in hot} | set(
+            queryset.filter(id__in=[r.id for r in archived]).order_by().values_list("id", flat=True)
+        )
+        rows = hot + [r for r in archived if r.id not in hot_ids]
+        rows.sort(key=lambda r: (r.created_at, r.id), reverse=not reverse)
+        return rows[:self.page_size + 1]
+
+
 @api_view(["GET"])
 def list_results(request):
+    """
+    Paginated analyses, newest first, without waveforms (see result_detail).
+      ?page=3                   → page numbers with a total count (default)
+      ?cursor= / ?cursor=<next> → keyset pages (KeysetPagination), constant cost at any depth
+      ?status=Faulty            → filter on the status column
+      ?from=2024-01-01&to=...   → created_at range (ISO date or datetime); a range reaching
+                                  archived months also lists them, with keyset pages
+      ?fields=id,status,...     → only return these fields
+    """
     status_filter = request.query_params.get("status")
-    queryset = AnalysisResult.objects.all().order_by("-created_at")
+    queryset = AnalysisResult.objects.all().order_by("-created_at", "-id")
     if status_filter:
-        queryset = queryset.filter(result_json__status=status_filter)
-    paginator = ResultPagination()
+        queryset = queryset.filter(status=status_filter)
+    try:
+        date_from = breakers.parse_when(request.query_params.get("from"), "from")
+        date_to = breakers.parse_when(request.query_params.get("to"), "to", end=True)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__lte=date_to)
+
+    fields = None
+    if request.query_params.get("fields"):
+        fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+        allowed = set(AnalysisResultSerializer().fields)
+        unknown = sorted(set(fields) - allowed)
+        if unknown:
+            return Response({"error": f"Unknown fields: {', '.join(unknown)}", "allowed": sorted(allowed)}, status=400)
+        if "result_json" not in fields:
+            queryset = queryset.defer("result_json")
+
+    if archive.covers(date_from, date_to):
+        # no cheap total across both sources: always keyset pages
+        paginator = ArchiveKeysetPagination(date_from, date_to, status_filter)
+    else:
+        paginator = KeysetPagination() if "cursor" in request.query_params else ResultPagination()
     results = paginator.paginate_queryset(queryset, request)
-    serializer = AnalysisResultSerializer(results, many=True)
+    serializer = AnalysisResultSerializer(results, many=True, fields=fields)
     return paginator.get_paginated_response(serializer.data)
 
+@api_view(["GET"])
+def result_detail(request, analysis_id):
+    """One analysis including its waveform (result_json.data_points); archived ones too."""
+    record = AnalysisResult.objects.select_related("waveform").filter(id=analysis_id).first()
+    if record is not None:
+        return Response(AnalysisResultDetailSerializer(record).data)
+    row = archive.find(analysis_id)
+    if row is None:
+        raise Http404("No AnalysisResult matches the given query.")
+    data = AnalysisResultSerializer(archive.instance(row)).data
+    data["result_json"] = {**data["result_json"], "data_points": archive.data_points(row)}
+    return Response(data)
+
 @api_view(["GET"])
 def system_health_index(request):
     """
-    Return health index computed from recent analyses (default last 50).
+    Return health index computed from recent analyses (default last 50,
+    CIRCAD_HEALTH_WINDOW), read from the rolling window in FleetStats.
     """
-    records = AnalysisResult.objects.all().order_by("-created_at")[:50]
-    if not records:
-        return Response({"health_index": 0.0})
-    score_map = {"Healthy": 2, "Warning": 1, "Faulty": 0, "High Contact Resistance": 0}
-    total_score = 0
-    for r in records:
-        status = r.result_json.get("status")
-        total_score += score_map.get(status, 0)
-    health_index = (total_score / (2 * len(records))) * 100
-    return Response({"health_index": round(health_index, 2)})
+    return Response({"health_index": fleet_stats.health_index(fleet_stats.snapshot())})
 
 @api_view(["GET"])
 def forecast_for_analysis(request, analysis_id):
@@ -140,19 +436,42 @@ def forecast_for_analysis(request, analysis_id):
     Return forecast details for a given analysis id (or file id if needed).
     """
     try:
-        analysis = AnalysisResult.objects.get(id=analysis_id)
-        # Use stored historical means for forecast (last N for same dcrm_file)
-        dcrm = analysis.dcrm_file
-        past_records = AnalysisResult.objects.filter(dcrm_file=dcrm).order_by("created_at")
-        past_means = [r.result_json.get("mean_resistance") for r in past_records if r.result_json.get("mean_resistance") is not None]
-        # call ai_model forecast helper
-        forecast_next = ai_model.forecast_mean(past_means + [])
-        return Response({"forecast_next_mean": forecast_next})
+        analysis = AnalysisResult.objects.select_related("dcrm_file__breaker").get(id=analysis_id)
+        breaker = analysis.dcrm_file.breaker
+        # Forecast from the breaker's (or, unlinked, the file's) stored history sums
+        forecast_next = forecasting.forecast_next(analysis.dcrm_file_id, breaker.id if breaker else None)
+        return Response({"forecast_next_mean": forecast_next, "asset_id": breaker.asset_id if breaker else None})
     except AnalysisResult.DoesNotExist:
         return Response({"error": "Analysis not found"}, status=404)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
+@api_view(["GET"])
+def list_breakers(request):
+    """Breaker assets with their number of uploads."""
+    rows = Breaker.objects.annotate(uploads=Count("files")).order_by("asset_id")
+    return Response(BreakerSerializer(rows, many=True).data)
+
+@api_view(["GET"])
+def breaker_trend(request, asset_id):
+    """
+    A breaker's test history across all its uploads, oldest first, and its forecast.
+      ?from=2025-01-01&to=2025-06-30 → tested_at range (ISO date or datetime)
+      ?limit=500                     → newest N points of the range (max 5000)
+    """
+    breaker = get_object_or_404(Breaker, asset_id=asset_id)
+    try:
+        start = breakers.parse_when(request.query_params.get("from"), "from")
+        end = breakers.parse_when(request.query_params.get("to"), "to", end=True)
+        limit = min(int(request.query_params.get("limit", 500)), 5000)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    return Response({
+        "asset_id": breaker.asset_id,
+        "forecast_next_mean": forecasting.forecast_next(None, breaker.id),
+        "points": breakers.trend(breaker, start, end, max(limit, 1)),
+    })
+
 @api_view(["GET"])
 def task_status(request, task_id):
     res = AsyncResult(task_id)
@@ -1,7 +1,7 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from api.models import DCRMFile, AnalysisResult
+from api.models import DCRMFile, AnalysisResult, ReportArtifact, UploadSession
 from django.conf import settings
 import os, shutil
 from .ai_model import forecast_mean
@@ -10,6 +10,10 @@ from .permissions import IsTechnician
 from celery.result import AsyncResult
 from circad_backend.celery import app
 from . import ai_model
+from . import model_utils
+from . import fleet_stats
+from . import archive, blobs, report_jobs, resets
+from . import storage_usage
 
 # =======================================================================
 # === SYSTEM STATUS & MAINTENANCE =======================================
@@ -19,31 +23,22 @@ from . import ai_model
 @permission_classes([IsAdminUser])
 def system_status(request):
     """Get summary of current CIRCAD data"""
-    total_files = DCRMFile.objects.count()
-    total_analyses = AnalysisResult.objects.count()
-    health_map = {"Healthy": 0, "Warning": 0, "Faulty": 0}
-    mean_values = []
-
-    for r in AnalysisResult.objects.all():
-        st = r.result_json.get("status")
-        mean = r.result_json.get("mean_resistance")
-        if st in health_map:
-            health_map[st] += 1
-        if mean:
-            mean_values.append(float(mean))
-
-    avg_mean = round(sum(mean_values) / len(mean_values), 2) if mean_values else 0
-    media_path = getattr(settings, "MEDIA_ROOT", None)
-    size_mb = get_folder_size(media_path) / (1024 * 1024)
+    # one row, maintained on every create/delete (api.fleet_stats)
+    stats = fleet_stats.snapshot()
+    # tracked on every write/delete under MEDIA_ROOT (api.storage_usage)
+    usage = storage_usage.snapshot()
 
     return Response({
-        "total_files": total_files,
-        "total_analyses": total_analyses,
-        "healthy": health_map["Healthy"],
-        "warning": health_map["Warning"],
-        "faulty": health_map["Faulty"],
-        "avg_mean": avg_mean,
-        "storage_used": round(size_mb, 2)
+        "total_files": stats.files,
+        "total_analyses": stats.analyses,
+        "archived_analyses": archive.count(),
+        "healthy": stats.healthy,
+        "warning": stats.warning,
+        "faulty": stats.faulty,
+        "avg_mean": fleet_stats.avg_mean(stats),
+        "storage_used": storage_usage.used_mb(usage),
+        "storage_files": usage.files,
+        "storage_reconciled_at": usage.reconciled_at,
     })
 
 
@@ -51,8 +46,9 @@ def system_status(request):
 @permission_classes([IsAdminUser])
 def reset_all(request):
     """Full reset: DB + media"""
-    AnalysisResult.objects.all().delete()
-    DCRMFile.objects.all().delete()
+    resets.delete_all()
+    report_jobs.clear()
+    archive.clear()
     clear_media_folder()
     return Response({"message": "Full reset complete."}, status=status.HTTP_200_OK)
 
@@ -61,8 +57,9 @@ def reset_all(request):
 @permission_classes([IsAdminUser])
 def reset_db_only(request):
     """Delete DB records, keep uploads"""
-    AnalysisResult.objects.all().delete()
-    DCRMFile.objects.all().delete()
+    resets.delete_all()
+    report_jobs.clear()
+    archive.clear()
     return Response({"message": "Database reset (files retained)."}, status=status.HTTP_200_OK)
 
 
@@ -77,13 +74,13 @@ def clear_uploads(request):
 @api_view(["DELETE"])
 @permission_classes([IsAdminUser])
 def delete_file(request, file_id):
-    """Delete one file + linked analyses"""
+    """Delete one file + linked analyses (the stored blob goes with its last reference)"""
     try:
         file = DCRMFile.objects.get(id=file_id)
-        AnalysisResult.objects.filter(dcrm_file=file).delete()
-        if os.path.exists(file.file.path):
-            os.remove(file.file.path)
+        resets.delete_file_analyses(file)
+        name, digest = file.file.name, file.sha256
         file.delete()
+        blobs.release(name, digest)
         return Response({"message": f"Deleted file {file_id} and linked analyses."})
     except DCRMFile.DoesNotExist:
         return Response({"error": "File not found"}, status=404)
@@ -108,6 +105,7 @@ def delete_analysis(request, analysis_id):
 def reanalyze_file(request, file_id):
     """
     Requeue a file for analysis (Technician or Admin) -- uses Celery if available.
+    Body (optional): { "force": true } to bypass the analysis result cache.
     """
     try:
         file = DCRMFile.objects.get(id=file_id)
@@ -116,7 +114,7 @@ def reanalyze_file(request, file_id):
 
     try:
         from .tasks import analyze_file_task
-        task = analyze_file_task.delay(file.id)
+        task = analyze_file_task.delay(file.id, force=bool(request.data.get("force", False)))
         return Response({
             "message": f"Re-analysis queued for file {file_id}",
             "task_id": task.id
@@ -139,25 +137,29 @@ def reanalyze_file(request, file_id):
 def bulk_reanalyze(request):
     """
     Bulk requeue multiple files for analysis (Admin only).
-    Body example: { "file_ids": [1,2,3] }
+    Body example: { "file_ids": [1,2,3], "force": false }
+    force=true bypasses the analysis result cache.
     """
     ids = request.data.get("file_ids", [])
     if not isinstance(ids, list) or not ids:
         return Response({"error": "file_ids must be a non-empty list"}, status=400)
 
-    from .tasks import analyze_file_task
+    from .tasks import analyze_files_batch_task
     queued = []
-    failed = []
 
-    for fid in ids:
+    # files are scored in batches: one task (and one model call) per batch
+    numeric = [fid for fid in ids if str(fid).isdigit()]
+    existing = set(DCRMFile.objects.filter(id__in=numeric).values_list("id", flat=True))
+    failed = [fid for fid in ids if not str(fid).isdigit() or int(fid) not in existing]
+    valid = [int(fid) for fid in numeric if int(fid) in existing]
+    batch_size = getattr(settings, "CIRCAD_BATCH_ANALYSIS_SIZE", 256)
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
         try:
-            if DCRMFile.objects.filter(id=fid).exists():
-                task = analyze_file_task.delay(fid)
-                queued.append({"file_id": fid, "task_id": task.id})
-            else:
-                failed.append(fid)
+            task = analyze_files_batch_task.delay(batch, force=bool(request.data.get("force", False)))
+            queued.extend({"file_id": fid, "task_id": task.id} for fid in batch)
         except Exception as e:
-            failed.append(fid)
+            failed.extend(batch)
 
     return Response({
         "queued": queued,
@@ -183,6 +185,21 @@ def get_task_status(request, task_id):
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
+# =======================================================================
+# === MODEL REGISTRY ====================================================
+# =======================================================================
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAdminUser])
+def model_registry(request):
+    """
+    GET: loaded model packages with version, load time and memory footprint.
+    POST: check the model files now and reload any that changed.
+    """
+    if request.method == "POST":
+        model_utils.registry.preload()
+    return Response({"models": model_utils.registry.describe()})
+
 # =======================================================================
 # === HELPERS ===========================================================
 # =======================================================================
@@ -197,14 +214,8 @@ def clear_media_folder():
             shutil.rmtree(item_path, ignore_errors=True)
         else:
             os.remove(item_path)
-
-def get_folder_size(folder):
-    if not folder or not os.path.exists(folder):
-        return 0
-    total_size = 0
-    for dirpath, _, filenames in os.walk(folder):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if os.path.isfile(fp):
-                total_size += os.path.getsize(fp)
-    return total_size
+    # stored PDF reports went with the folder
+    ReportArtifact.objects.all().delete()
+    UploadSession.objects.filter(status=UploadSession.UPLOADING).delete()
+    # re-walk what is left (usually nothing) rather than trusting the delete
+    storage_usage.reconcile()
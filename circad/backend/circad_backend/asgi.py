@@ -9,6 +9,12 @@ from api import routing as api_routing
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "circad_backend.settings")
 django.setup()
 
+from django.conf import settings
+if getattr(settings, "CIRCAD_PRELOAD_MODELS", True):
+    # warm the model registry without delaying the server's startup
+    from api.model_utils import registry
+    registry.preload(background=True)
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
@@ -1,6 +1,7 @@
 # circad_backend/celery.py
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "circad_backend.settings")
 
@@ -18,6 +19,17 @@ app.conf.update(
     result_serializer="json",
 )
 
+@worker_init.connect
+@worker_process_init.connect
+def preload_models(**kwargs):
+    # unpickle models before the first task: the prefork parent loads them
+    # once (children inherit the pages), each child then only re-checks the
+    # file stamps; solo/threads pools are covered by worker_init alone
+    from django.conf import settings
+    if getattr(settings, "CIRCAD_PRELOAD_MODELS", True):
+        from api.model_utils import registry
+        registry.preload()
+
 if __name__ == "__main__":
     app.start()
 
@@ -101,6 +101,26 @@ DATABASES = {
     }
 }
 
+# High-concurrency SQLite profile (Celery workers writing while ASGI reads):
+# WAL lets readers run alongside the single writer, IMMEDIATE transactions
+# take the write lock at BEGIN so waiting writers queue on the busy timeout
+# instead of failing with "database is locked" on a read->write upgrade.
+# CIRCAD_SQLITE_WAL=0 keeps SQLite's defaults (rollback journal, 5 s timeout).
+CIRCAD_SQLITE_OPTIONS = {
+    "timeout": 30,                                    # busy timeout, seconds
+    "transaction_mode": "IMMEDIATE",
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"                  # WAL stays consistent; fsync at checkpoints only
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-32000;"                   # 32 MB page cache per connection
+        "PRAGMA mmap_size=268435456;"                 # 256 MB of the file memory-mapped for reads
+        "PRAGMA wal_autocheckpoint=1000;"
+    ),
+}
+if os.getenv("CIRCAD_SQLITE_WAL", "1") == "1":
+    DATABASES['default']['OPTIONS'] = CIRCAD_SQLITE_OPTIONS
+
 
 # ---------- Celery (Broker + Backend) ----------
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
@@ -113,6 +133,7 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Kolkata"
+CELERY_BEAT_SCHEDULE = {}                             # periodic jobs are added next to their settings below
 
 # ---------- Logging ----------
 LOGGING = {
@@ -215,9 +236,93 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = "auth.User"  # default; fine for now
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024   # 5 MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024   # 5 MB; larger uploads spool to a temp file
 DATA_UPLOAD_MAX_MEMORY_SIZE = 6 * 1024 * 1024
 
+# ---------- DCRM ingest ----------
+CIRCAD_MAX_UPLOAD_BYTES = 2 * 1024 * 1024 * 1024      # 2 GB per CSV
+CIRCAD_STREAMING_INGEST_BYTES = 32 * 1024 * 1024      # above this, analyze_dcrm folds the CSV in chunks
+CIRCAD_COLUMNAR_SIDECAR = True                        # keep a typed .npy copy of each analyzed CSV for mmap reads
+CIRCAD_CHART_POINTS = 300                             # data_points per analysis (min/max per bucket)
+CIRCAD_ARCING_FACTOR = 2.0                            # arcing region: resistance > factor x min resistance
+CIRCAD_SPIKE_SIGMA = 3.0                              # spike: sample-to-sample jump > sigma x std dev
+CIRCAD_BATCH_ANALYSIS_SIZE = 256                      # files per analyze_files_batch_task in bulk_reanalyze
+
+# ---------- Chunked uploads (api.upload_sessions) ----------
+CIRCAD_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024           # largest chunk per PUT (streamed to disk, never held in memory)
+CIRCAD_UPLOAD_SESSION_HOURS = 24                      # unfinished uploads idle this long are deleted
+CIRCAD_UPLOAD_EXPIRE_SECONDS = 60 * 60                # expire_upload_sessions_task (beat)
+CELERY_BEAT_SCHEDULE["expire-upload-sessions"] = {
+    "task": "api.tasks.expire_upload_sessions_task",
+    "schedule": CIRCAD_UPLOAD_EXPIRE_SECONDS,
+}
+
+# ---------- Bulk uploads (api.bulk_upload) ----------
+CIRCAD_BULK_UPLOAD_MAX_FILES = 1000                   # CSVs per zip/tar
+CIRCAD_BULK_UPLOAD_MAX_BYTES = 4 * 1024 * 1024 * 1024 # uncompressed CSV bytes per zip/tar
+CIRCAD_BULK_UPLOAD_TASK_FILES = 16                    # files per analyze_files_batch_task in the batch's Celery group
+
+# ---------- Fleet statistics (api.fleet_stats) ----------
+CIRCAD_HEALTH_WINDOW = 50                             # newest results scored by the system health index
+
+# ---------- Storage accounting (api.storage_usage) ----------
+CIRCAD_STORAGE_RECONCILE_SECONDS = 60 * 60            # walk MEDIA_ROOT and correct the tracked totals (beat)
+CELERY_BEAT_SCHEDULE["reconcile-storage"] = {
+    "task": "api.tasks.reconcile_storage_task",
+    "schedule": CIRCAD_STORAGE_RECONCILE_SECONDS,
+}
+
+# ---------- Archive of old analyses (api.archive) ----------
+CIRCAD_ARCHIVE_DIR = BASE_DIR / "data" / "archive"    # results-YYYY-MM.npz + manifest.json
+CIRCAD_ARCHIVE_AFTER_DAYS = 365                       # whole months older than this leave the hot table
+CIRCAD_ARCHIVE_BATCH = 2000                           # rows deleted per transaction
+CIRCAD_ARCHIVE_SECONDS = 24 * 60 * 60                 # archive_results_task (beat)
+CELERY_BEAT_SCHEDULE["archive-results"] = {
+    "task": "api.tasks.archive_results_task",
+    "schedule": CIRCAD_ARCHIVE_SECONDS,
+}
+
+# ---------- PDF reports (api.report_jobs) ----------
+CIRCAD_REPORT_VECTOR_CHARTS = True                    # charts/QR as PDF paths (api.report_charts), not matplotlib PNGs
+# raster charts only: processes rendering page PNGs per report; a prefork
+# worker child cannot start them and renders serially (use -P threads/solo)
+CIRCAD_REPORT_WORKERS = 4
+CIRCAD_REPORT_CACHE_MAX_ENTRIES = 100                 # finished PDFs kept under MEDIA_ROOT/reports
+
+# ---------- Single database writer (api.db_writer) ----------
+# workers hand AnalysisResult inserts to `manage.py run_db_writer`, which
+# commits many rows per transaction; without a running writer they write directly
+CIRCAD_DB_WRITER = os.getenv("CIRCAD_DB_WRITER", "0") == "1"
+CIRCAD_DB_WRITER_ADDRESS = os.getenv("CIRCAD_DB_WRITER_ADDRESS", str(BASE_DIR / "data" / "db_writer.sock"))
+CIRCAD_DB_WRITER_BATCH = 500                          # max rows per transaction
+CIRCAD_DB_WRITER_MAX_WAIT_MS = 2.0                    # wait for company before committing
+CIRCAD_DB_WRITER_TIMEOUT = 30                         # seconds a worker waits for its ids
+
+# ---------- Model registry (api.model_utils) ----------
+# name -> joblib package; files are re-read when their mtime/size change
+CIRCAD_MODELS = {
+    "contact_health": BASE_DIR / "data" / "model" / "contact_health.pkl",
+}
+CIRCAD_PRELOAD_MODELS = True                          # load in Celery worker_process_init and at ASGI startup
+CIRCAD_MODEL_TRACE_MEMORY = False                     # tracemalloc the unpickle (exact memory_mb, slow); RSS delta otherwise
+# single-row predictions from concurrent callers share one predict_proba call.
+# Off by default: a prefork Celery child runs one analysis at a time, so the
+# collector thread only adds latency. Turn it on (CIRCAD_INFERENCE_BATCHING=1)
+# for processes that run several analyses at once: celery -P threads/gevent, ASGI.
+CIRCAD_INFERENCE_BATCHING = os.getenv("CIRCAD_INFERENCE_BATCHING", "0") == "1"
+CIRCAD_INFERENCE_BATCH_SIZE = 64                      # max rows per predict_proba
+CIRCAD_INFERENCE_MAX_WAIT_MS = 5.0                    # max time the first request waits for company
+CIRCAD_FLAT_FOREST = True                             # score forests via api.flat_forest (parity-checked at load)
+
+# ---------- Startup import budget (circad_benchmark imports) ----------
+CIRCAD_IMPORT_BUDGET_MS = 1000                        # web app / reset_circad --status import time
+CIRCAD_IMPORT_FORBIDDEN = ("pandas", "sklearn", "scipy", "joblib", "matplotlib", "reportlab", "qrcode")
+
+# ---------- Analysis result cache (api.result_cache) ----------
+CIRCAD_ANALYSIS_CACHE = True
+CIRCAD_ANALYSIS_CACHE_MAX_ENTRIES = 10_000
+CIRCAD_ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
 from decouple import config
 
 SECRET_KEY = config("SECRET_KEY", default="unsafe-secret")
@@ -1,13 +1,26 @@
 import axiosInstance from "./axiosInstance";
 
-export const requestPdfReport = async (analysisIds = [], options = {}) => {
-  const res = await axiosInstance.post("/reports/pdf/", {
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queues the PDF (or gets the stored one back), polls until it is built,
+// then downloads it. onProgress(done, total) is called on every poll.
+export const requestPdfReport = async (analysisIds = [], options = {}, onProgress = () => {}) => {
+  let { data: job } = await axiosInstance.post("/reports/pdf/", {
     analysis_ids: analysisIds,
     title: options.title || "CIRCAD_Report",
     include_signature: !!options.include_signature,
     technician_name: options.technician_name || ""
-  }, { responseType: "blob" });
-  return res;
+  });
+  while (job.status === "pending" || job.status === "running") {
+    onProgress(job.progress, job.total);
+    await sleep(1000);
+    ({ data: job } = await axiosInstance.get(`/reports/pdf/${job.report_id}/`));
+  }
+  if (job.status !== "ready") {
+    throw new Error(job.error || "Report generation failed");
+  }
+  onProgress(job.total, job.total);
+  return axiosInstance.get(`/reports/pdf/${job.report_id}/download/`, { responseType: "blob" });
 };
 
 export const requestCsvReport = async (analysisIds = []) => {
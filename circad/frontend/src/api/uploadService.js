@@ -4,10 +4,17 @@ import axiosInstance from "./axiosInstance";
 // ✅ Define base URL explicitly (or get from env)
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
 
+// Files above this go through the resumable chunked upload
+const CHUNKED_UPLOAD_BYTES = 5 * 1024 * 1024;
+const CHUNK_RETRIES = 5;
+
 // ==============================
 // 1️⃣ Upload DCRM file
 // ==============================
-export const uploadFile = async (file) => {
+export const uploadFile = async (file, onProgress = () => {}) => {
+  if (file.size > CHUNKED_UPLOAD_BYTES) {
+    return uploadFileChunked(file, onProgress);
+  }
   const formData = new FormData();
   formData.append("file", file);
   const response = await axiosInstance.post("/upload/", formData, {
@@ -16,6 +23,52 @@ export const uploadFile = async (file) => {
   return response.data;
 };
 
+// Resumable upload: init, PUT chunks at the server's offset, finalize.
+// A failed chunk is retried from the offset the server reports.
+// onProgress(sentBytes, totalBytes) is called after every chunk.
+export const uploadFileChunked = async (file, onProgress = () => {}) => {
+  const { data: session } = await axiosInstance.post("/upload/chunked/", {
+    filename: file.name,
+    size: file.size,
+  });
+  let offset = session.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + session.chunk_size);
+    try {
+      const { data } = await axiosInstance.put(`/upload/chunked/${session.upload_id}/?offset=${offset}`, chunk, {
+        headers: { "Content-Type": "application/octet-stream" },
+      });
+      offset = data.offset;
+      failures = 0;
+    } catch (err) {
+      if (++failures > CHUNK_RETRIES) throw err;
+      // 409 carries the offset to resume from; otherwise ask for it
+      const resume = err.response?.status === 409 ? err.response.data : (await axiosInstance.get(`/upload/chunked/${session.upload_id}/`)).data;
+      offset = resume.offset;
+    }
+    onProgress(offset, file.size);
+  }
+  const { data } = await axiosInstance.post(`/upload/chunked/${session.upload_id}/finalize/`);
+  return data;
+};
+
+// Zip / tar of CSVs as one batch; returns { batch_id, total, skipped, ... }
+export const uploadBulk = async (archive) => {
+  const formData = new FormData();
+  formData.append("file", archive);
+  const response = await axiosInstance.post("/upload/bulk/", formData, {
+    headers: { "Content-Type": "multipart/form-data" },
+  });
+  return response.data;
+};
+
+// Aggregate progress: { status, total, analyzed, failed, pending, progress }
+export const fetchBulkStatus = async (batchId) => {
+  const response = await axiosInstance.get(`/upload/bulk/${batchId}/`);
+  return response.data;
+};
+
 // ==============================
 // 2️⃣ Trigger file analysis
 // ==============================
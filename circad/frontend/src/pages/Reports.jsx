@@ -9,6 +9,7 @@ export default function ReportsPage() {
   const [title, setTitle] = useState("CIRCAD Batch Report");
   const [includeSignature, setIncludeSignature] = useState(false);
   const [technicianName, setTechnicianName] = useState("");
+  const [pdfProgress, setPdfProgress] = useState(null);
 
   useEffect(() => {
     fetchAllResults().then(setResults).catch(() => toast.error("Failed to load results"));
@@ -32,16 +33,19 @@ export default function ReportsPage() {
   const handlePdf = async () => {
     try {
       const ids = Array.from(selected);
+      setPdfProgress({ done: 0, total: 0 });
       const res = await requestPdfReport(ids, {
         title,
         include_signature: includeSignature,
         technician_name: technicianName,
-      });
+      }, (done, total) => setPdfProgress({ done, total }));
       const blob = new Blob([res.data], { type: "application/pdf" });
       downloadBlob(blob, `${title.replace(/\s+/g, "_")}.pdf`);
       toast.success("PDF downloaded!");
     } catch {
       toast.error("Failed to generate PDF");
+    } finally {
+      setPdfProgress(null);
     }
   };
 
@@ -83,9 +87,12 @@ export default function ReportsPage() {
         />
         <button
           onClick={handlePdf}
-          className="bg-blue-600 hover:bg-blue-700 text-white px-4 py-2 rounded"
+          disabled={pdfProgress !== null}
+          className="bg-blue-600 hover:bg-blue-700 disabled:opacity-60 text-white px-4 py-2 rounded"
         >
-          Download PDF
+          {pdfProgress === null
+            ? "Download PDF"
+            : `Generating PDF${pdfProgress.total ? ` ${pdfProgress.done}/${pdfProgress.total}` : "..."}`}
         </button>
         <button
           onClick={handleCsv}